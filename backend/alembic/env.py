@@ -11,9 +11,12 @@ from app.database import Base
 from app.models.user import UserInfo
 from app.models.project import ProjectInfo
 from app.models.api_test import APIInfo,APIBusinessFlow,APIReport
-from app.models.ui_test import UIInfo,UIBusinessFlow,UIReport
+from app.models.ui_test import UIInfo,UIBusinessFlow,UIReport,UIProjectSettings
 from app.models.business_flow import BusinessFlow
 from app.models.test_reports import TestReports
+from app.models.case_run_history import CaseRunHistory
+from app.models.job import Job
+from app.models.report_artifact import ReportArtifact
 
 config = context.config
 
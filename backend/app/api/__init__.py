@@ -3,5 +3,8 @@ from . import projects
 from . import users
 from . import ui_tests
 from . import performance
+from . import case_history
+from . import reports
+from . import jobs
 
-__all__ = ["api_tests", "projects", "users", "ui_tests", "performance"]
\ No newline at end of file
+__all__ = ["api_tests", "projects", "users", "ui_tests", "performance", "case_history", "reports", "jobs"]
\ No newline at end of file
@@ -1,16 +1,34 @@
 # app/api/api_tests.py
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
 from typing import List, Optional
-from app.database import get_db
+from datetime import datetime
+import uuid
+from app.database import get_db, SessionLocal
 from app.models import APIInfo, ProjectInfo, UserInfo, BusinessFlow, TestReports
 from app.schemas import (
     APITestCaseCreate,
     APITestCaseResponse,
     BusinessFlowCreate,
-    BusinessFlowResponse
+    BusinessFlowResponse,
+    TestReportResponse,
+    APITestRunRequest
 )
 from app.auth import get_current_user
+from app.core.api_test_runner import APITestRunner, DEFAULT_POOL_SIZE, DEFAULT_KEEPALIVE, DEFAULT_HTTP2
+from app.core.scheduler import SHARD_STRATEGIES
+from app.core import job_queue
+from app.utils.file_utils import report_dir_of
+from app.core.allure_results import load_results
+from app.core.artifacts import build_artifact_index
+from app.core.case_history import (
+    RUN_MODES,
+    record_case_runs,
+    load_case_durations,
+    content_hashes,
+    select_failed_or_changed
+)
 
 router = APIRouter()
 
@@ -147,8 +165,7 @@ def delete_api_test_case(
 @router.post("/projects/{project_id}/api-test-cases/run")
 def run_api_tests(
         project_id: int,
-        background_tasks: BackgroundTasks,
-        test_case_ids: Optional[List[int]] = None,
+        request_data: dict,
         current_user: UserInfo = Depends(get_current_user),
         db: Session = Depends(get_db)
 ):
@@ -161,6 +178,33 @@ def run_api_tests(
     if project is None:
         raise HTTPException(status_code=404, detail="Project not found")
 
+    # 校验执行参数的类型和范围，避免错误的值在运行器内部才报错
+    try:
+        params = APITestRunRequest.model_validate(request_data)
+    except ValidationError as e:
+        error = e.errors()[0]
+        field = ".".join(str(part) for part in error["loc"])
+        raise HTTPException(status_code=400, detail=f"Invalid {field}: {error['msg']}")
+
+    test_case_ids = params.test_case_ids
+    # 执行方式：pytest（生成测试文件）或 inline（服务进程内异步执行）
+    executor = params.executor
+    if executor not in ("pytest", "inline"):
+        raise HTTPException(status_code=400, detail="Invalid executor")
+
+    # 并行分片：parallelism 个 pytest 工作进程，按 round_robin 或历史耗时 duration 分配用例
+    parallelism = request_data.get("parallelism", 1)
+    shard_strategy = request_data.get("shard_strategy", "round_robin")
+    if not isinstance(parallelism, int) or isinstance(parallelism, bool) or parallelism < 1:
+        raise HTTPException(status_code=400, detail="parallelism must be a positive integer")
+    if shard_strategy not in SHARD_STRATEGIES:
+        raise HTTPException(status_code=400, detail="Invalid shard strategy")
+
+    # 运行模式：all 全部运行；failed_or_changed 只运行上次失败或之后被修改过的用例
+    mode = request_data.get("mode", "all")
+    if mode not in RUN_MODES:
+        raise HTTPException(status_code=400, detail="Invalid run mode")
+
     # 获取测试用例
     query = db.query(APIInfo).filter(APIInfo.project_id == project_id)
     if test_case_ids:
@@ -170,8 +214,139 @@ def run_api_tests(
     if not test_cases:
         raise HTTPException(status_code=404, detail="No test cases found")
 
-    # 这里应该调用测试运行器，为了简化，我们直接返回
-    return {"message": "Tests started", "test_count": len(test_cases)}
+    if mode == "failed_or_changed":
+        selected_count = len(test_cases)
+        test_cases = select_failed_or_changed(db, "api", test_cases)
+        print(f"🔁 增量运行: {selected_count} 个用例中 {len(test_cases)} 个失败或已修改")
+        if not test_cases:
+            return {"message": "No failed or changed test cases", "test_count": 0}
+
+    if executor == "inline":
+        hashes = content_hashes("api", test_cases)
+        runner = APITestRunner(
+            pool_size=params.pool_size or DEFAULT_POOL_SIZE,
+            keepalive=DEFAULT_KEEPALIVE if params.keepalive is None else params.keepalive,
+            http2=DEFAULT_HTTP2 if params.http2 is None else params.http2
+        )
+        results = runner.run_inline(test_cases, concurrency=params.concurrency)
+        record_case_runs(db, "api", project_id, results["results"], hashes=hashes)
+        print(f"✅ 内联执行完成: {results['passed']}/{results['total']} 通过，耗时 {results['duration']}ms")
+        return {"message": "Tests finished", "test_count": len(test_cases), **results}
+
+    # 创建测试报告记录
+    report = TestReports(
+        report_name=f"API_Test_{uuid.uuid4().hex[:8]}",
+        project_id=project_id,
+        test_type="api",
+        status="queued",
+        created_at=datetime.now()
+    )
+    db.add(report)
+    db.commit()
+
+    # 放入任务队列，由工作线程执行
+    options = {key: value for key, value in request_data.items() if key != "test_case_ids"}
+    job = job_queue.enqueue(
+        db,
+        "api",
+        project_id,
+        {"test_case_ids": [case.id for case in test_cases], "options": options},
+        report_id=report.id,
+        priority=params.priority
+    )
+
+    return {"message": "Tests started", "test_count": len(test_cases), "report_id": report.id, "job_id": job.id}
+
+
+def run_api_tests_job(job, db):
+    """任务队列处理函数：在工作线程中使用任务自己的数据库会话执行API测试"""
+    payload = job.payload or {}
+    options = payload.get("options", {})
+    test_cases = db.query(APIInfo).filter(APIInfo.id.in_(payload.get("test_case_ids", []))).all()
+    if not test_cases:
+        raise ValueError("No test cases found")
+
+    runner = APITestRunner(
+        pool_size=options.get("pool_size") or DEFAULT_POOL_SIZE,
+        keepalive=DEFAULT_KEEPALIVE if options.get("keepalive") is None else options["keepalive"],
+        http2=DEFAULT_HTTP2 if options.get("http2") is None else options["http2"]
+    )
+    strategy = options.get("shard_strategy", "round_robin")
+    durations = None
+    if strategy == "duration":
+        durations = load_case_durations(db, "api", [case.id for case in test_cases])
+
+    hashes = content_hashes("api", test_cases)
+    report_paths = []
+
+    def on_report_dir(report_path):
+        report_paths.append(report_path)
+        job_queue.save_report_path(job.report_id, report_path)
+
+    try:
+        results = runner.run_tests(
+            test_cases,
+            parallelism=options.get("parallelism", 1),
+            strategy=strategy,
+            durations=durations,
+            report_id=job.report_id,
+            on_progress=lambda progress: update_report_progress(job.report_id, progress),
+            on_report_dir=on_report_dir
+        )
+    except Exception:
+        # 运行中途失败：已产生的附件同样建立索引
+        if report_paths:
+            build_artifact_index(db, job.report_id, report_dir_of(report_paths[0]))
+        raise
+
+    # 更新测试报告
+    report = db.query(TestReports).filter(TestReports.id == job.report_id).first()
+    if report:
+        report.status = "completed"
+        report.report_path = results.get("report_path")
+        report.summary = results.get("summary")
+        db.commit()
+
+        # 记录每个用例的耗时历史
+        record_case_runs(db, "api", report.project_id, load_results(results["results_dir"]), report.id, hashes)
+
+        # 附件存入附件存储并建立索引
+        build_artifact_index(db, report.id, report_dir_of(report.report_path))
+
+
+def update_report_progress(report_id, progress):
+    """进度回调在监视线程中执行，使用独立的数据库会话"""
+    db = SessionLocal()
+    try:
+        db.query(TestReports).filter(TestReports.id == report_id).update(
+            {"progress": progress}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+job_queue.register_handler("api", run_api_tests_job)
+
+
+# 查询单次运行的状态、进度和耗时 - GET /api-test-cases/reports/{report_id}
+@router.get("/api-test-cases/reports/{report_id}", response_model=TestReportResponse)
+def get_api_test_report(
+        report_id: int,
+        current_user: UserInfo = Depends(get_current_user),
+        db: Session = Depends(get_db)
+):
+    """轮询API测试运行状态，只返回报告记录，不读取报告文件"""
+    report = db.query(TestReports).join(
+        ProjectInfo, ProjectInfo.id == TestReports.project_id
+    ).filter(
+        TestReports.id == report_id,
+        TestReports.test_type == "api",
+        ProjectInfo.user_id == current_user.id
+    ).first()
+    if report is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    return report
 
 
 # 获取测试报告
@@ -0,0 +1,66 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.models import ProjectInfo, UserInfo, CaseRunHistory
+from app.schemas import CaseRunHistoryResponse
+from app.auth import get_current_user
+from app.core.case_history import summarize_slowest
+from typing import List, Optional
+
+router = APIRouter()
+
+CASE_TYPES = ("api", "ui")
+
+
+# 获取用例耗时历史 - GET /projects/{project_id}/case-history
+@router.get("/projects/{project_id}/case-history", response_model=List[CaseRunHistoryResponse])
+def get_case_history(
+        project_id: int,
+        case_type: str = "api",
+        case_id: Optional[int] = None,
+        skip: int = 0,
+        limit: int = 100,
+        current_user: UserInfo = Depends(get_current_user),
+        db: Session = Depends(get_db)
+):
+    # 验证项目所有权
+    project = db.query(ProjectInfo).filter(
+        ProjectInfo.id == project_id,
+        ProjectInfo.user_id == current_user.id
+    ).first()
+    if project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if case_type not in CASE_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid case type")
+
+    query = db.query(CaseRunHistory).filter(
+        CaseRunHistory.project_id == project_id,
+        CaseRunHistory.case_type == case_type
+    )
+    if case_id is not None:
+        query = query.filter(CaseRunHistory.case_id == case_id)
+
+    return query.order_by(CaseRunHistory.id.desc()).offset(skip).limit(limit).all()
+
+
+# 获取最慢用例及耗时趋势 - GET /projects/{project_id}/case-history/slowest
+@router.get("/projects/{project_id}/case-history/slowest")
+def get_slowest_cases(
+        project_id: int,
+        case_type: str = "api",
+        window: int = 10,
+        limit: int = 20,
+        current_user: UserInfo = Depends(get_current_user),
+        db: Session = Depends(get_db)
+):
+    # 验证项目所有权
+    project = db.query(ProjectInfo).filter(
+        ProjectInfo.id == project_id,
+        ProjectInfo.user_id == current_user.id
+    ).first()
+    if project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+    if case_type not in CASE_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid case type")
+
+    return summarize_slowest(db, case_type, project_id, window=max(1, window), limit=limit)
@@ -0,0 +1,69 @@
+from fastapi import APIRouter, Depends, HTTPException
+from sqlalchemy.orm import Session
+from app.database import get_db
+from app.models import ProjectInfo, UserInfo, Job
+from app.schemas import JobResponse
+from app.auth import get_current_user
+from app.core import job_queue
+from typing import List, Optional
+
+router = APIRouter()
+
+
+def _get_owned_job(db: Session, job_id: int, user_id: int) -> Job:
+    job = db.query(Job).join(
+        ProjectInfo, ProjectInfo.id == Job.project_id
+    ).filter(
+        Job.id == job_id,
+        ProjectInfo.user_id == user_id
+    ).first()
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job
+
+
+# 获取项目的任务队列 - GET /projects/{project_id}/jobs
+@router.get("/projects/{project_id}/jobs", response_model=List[JobResponse])
+def get_project_jobs(
+        project_id: int,
+        status: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 100,
+        current_user: UserInfo = Depends(get_current_user),
+        db: Session = Depends(get_db)
+):
+    # 验证项目所有权
+    project = db.query(ProjectInfo).filter(
+        ProjectInfo.id == project_id,
+        ProjectInfo.user_id == current_user.id
+    ).first()
+    if project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    query = db.query(Job).filter(Job.project_id == project_id)
+    if status:
+        query = query.filter(Job.status == status)
+    return query.order_by(Job.id.desc()).offset(skip).limit(limit).all()
+
+
+# 获取任务状态 - GET /jobs/{job_id}
+@router.get("/jobs/{job_id}", response_model=JobResponse)
+def get_job(
+        job_id: int,
+        current_user: UserInfo = Depends(get_current_user),
+        db: Session = Depends(get_db)
+):
+    return _get_owned_job(db, job_id, current_user.id)
+
+
+# 取消任务 - POST /jobs/{job_id}/cancel
+@router.post("/jobs/{job_id}/cancel", response_model=JobResponse)
+def cancel_job(
+        job_id: int,
+        current_user: UserInfo = Depends(get_current_user),
+        db: Session = Depends(get_db)
+):
+    job = _get_owned_job(db, job_id, current_user.id)
+    if job.status in job_queue.FINISHED_STATUSES:
+        raise HTTPException(status_code=400, detail=f"Job already {job.status}")
+    return job_queue.cancel(db, job)
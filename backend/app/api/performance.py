@@ -1,15 +1,22 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException, Query
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.models import ProjectInfo, UserInfo, TestReports
+from app.models import ProjectInfo, UserInfo, TestReports, APIInfo, BusinessFlow, Job
 from app.schemas import TestReportCreate, TestReportResponse
 from app.auth import get_current_user
-from app.core.performance_runner import PerformanceRunner
-from typing import List
+from app.core.performance_runner import PerformanceRunner, validate_load_profile
+from app.core import job_queue
+from app.core.output_stream import terminate_stream
+from app.core.latency_histogram import LatencyHistogram, query_histograms, HISTOGRAM_FILE, DEFAULT_PERCENTILES
+from app.utils.file_utils import report_dir_of
+from typing import List, Optional
 import uuid
 
 router = APIRouter()
 
+# 停止压测时先发送 SIGTERM 让 Locust 写出已有统计，超过这个时间（秒）仍未退出则强制结束
+STOP_GRACE_SECONDS = 10
+
 
 @router.post("/projects/{project_id}/performance-tests")
 def create_performance_test(
@@ -44,7 +51,6 @@ def create_performance_test(
 def run_performance_test(
         project_id: int,
         test_config: dict,
-        background_tasks: BackgroundTasks,
         current_user: UserInfo = Depends(get_current_user),
         db: Session = Depends(get_db)
 ):
@@ -56,44 +62,81 @@ def run_performance_test(
     if project is None:
         raise HTTPException(status_code=404, detail="Project not found")
 
+    # 压测对象：case_ids 指定的 API 用例（按 weights 随机选择），或 flow_id 指定的业务流程（按顺序执行）
+    case_ids = test_config.get("case_ids") or []
+    flow_id = test_config.get("flow_id")
+    if flow_id is not None:
+        flow = db.query(BusinessFlow).filter(
+            BusinessFlow.id == flow_id,
+            BusinessFlow.project_id == project_id
+        ).first()
+        if flow is None:
+            raise HTTPException(status_code=404, detail="Business flow not found")
+        case_ids = flow.case_ids or []
+    if not case_ids:
+        raise HTTPException(status_code=400, detail="Select API test cases or a business flow")
+
+    found = {case_id for (case_id,) in db.query(APIInfo.id).filter(
+        APIInfo.project_id == project_id,
+        APIInfo.id.in_(case_ids)
+    ).all()}
+    if set(case_ids) - found:
+        raise HTTPException(status_code=404, detail="No test cases found")
+
+    error = validate_load_profile(test_config)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+
     # 创建测试报告记录
     report = TestReports(
         report_name=f"Performance_Test_{uuid.uuid4().hex[:8]}",
         project_id=project_id,
         test_type="performance",
-        status="running"
+        status="queued"
     )
     db.add(report)
     db.commit()
 
-    # 在后台运行测试
-    background_tasks.add_task(
-        run_performance_test_background,
-        test_config,
-        report.id,
-        db
+    # 放入任务队列，由工作线程执行
+    job = job_queue.enqueue(
+        db,
+        "performance",
+        project_id,
+        {"test_config": test_config, "case_ids": case_ids, "sequential": flow_id is not None},
+        report_id=report.id,
+        priority=test_config.get("priority", 0)
     )
 
-    return {"message": "Performance test started", "report_id": report.id}
+    return {"message": "Performance test started", "report_id": report.id, "job_id": job.id}
 
 
-def run_performance_test_background(test_config, report_id, db):
-    try:
-        runner = PerformanceRunner()
-        results = runner.run_test(test_config)
-
-        # 更新测试报告
-        report = db.query(TestReports).filter(TestReports.id == report_id).first()
-        if report:
-            report.status = "completed"
-            report.report_path = results.get("report_path")
-            db.commit()
-    except Exception as e:
-        # 更新测试报告为失败
-        report = db.query(TestReports).filter(TestReports.id == report_id).first()
-        if report:
-            report.status = "failed"
-            db.commit()
+def run_performance_test_job(job, db):
+    """任务队列处理函数：在工作线程中使用任务自己的数据库会话执行性能测试"""
+    payload = job.payload or {}
+    test_config = payload.get("test_config", {})
+
+    # 按请求中的顺序加载用例，业务流程依赖这个顺序
+    case_ids = payload.get("case_ids") or []
+    cases = {case.id: case for case in db.query(APIInfo).filter(APIInfo.id.in_(case_ids)).all()}
+    test_cases = [cases[case_id] for case_id in case_ids if case_id in cases]
+    if not test_cases:
+        raise ValueError("No test cases found")
+
+    runner = PerformanceRunner()
+    results = runner.run_test(test_config, report_id=job.report_id, test_cases=test_cases,
+                              sequential=payload.get("sequential", False),
+                              on_report_dir=lambda report_path: job_queue.save_report_path(job.report_id, report_path))
+
+    # 更新测试报告
+    report = db.query(TestReports).filter(TestReports.id == job.report_id).first()
+    if report:
+        report.status = "stopped" if results["results"].get("stopped") else "completed"
+        report.report_path = results.get("report_path")
+        report.summary = results.get("summary")
+        db.commit()
+
+
+job_queue.register_handler("performance", run_performance_test_job)
 
 
 @router.get("/projects/{project_id}/performance-tests/reports")
@@ -124,5 +167,142 @@ def stop_performance_test(
         current_user: UserInfo = Depends(get_current_user),
         db: Session = Depends(get_db)
 ):
-    # 这里实现停止性能测试的逻辑
-    return {"message": "Performance test stopped"}
\ No newline at end of file
+    """停止性能测试，test_id 为运行时返回的 report_id"""
+    # 验证项目所有权
+    project = db.query(ProjectInfo).filter(
+        ProjectInfo.id == project_id,
+        ProjectInfo.user_id == current_user.id
+    ).first()
+    if project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    report = db.query(TestReports).filter(
+        TestReports.id == test_id,
+        TestReports.project_id == project_id,
+        TestReports.test_type == "performance"
+    ).first()
+    if report is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+    if report.status not in ("queued", "running"):
+        raise HTTPException(status_code=400, detail=f"Performance test is already {report.status}")
+
+    job = db.query(Job).filter(Job.report_id == report.id).order_by(Job.id.desc()).first()
+    if job is not None and job.status == "queued":
+        # 还没开始运行：直接从队列中取消
+        job_queue.cancel(db, job)
+        if job.status == "cancelled":
+            report.status = "stopped"
+            db.commit()
+            return {"message": "Performance test stopped", "report_id": report.id, "status": report.status}
+        if job.status not in ("running", "cancelling"):
+            db.refresh(report)
+            raise HTTPException(status_code=400, detail=f"Performance test is already {report.status}")
+        # 取消前已被工作线程取走，按运行中处理
+
+    # 运行中：Locust 收到 SIGTERM 后停止加压并写出已有统计，任务结束时报告标记为 stopped
+    terminate_stream(report.id, kill_after=STOP_GRACE_SECONDS)
+    return {"message": "Performance test stopping", "report_id": report.id, "status": "stopping"}
+
+
+def _parse_percentiles(value: Optional[str]):
+    if not value:
+        return DEFAULT_PERCENTILES
+    try:
+        result = tuple(float(p) for p in value.split(",") if p.strip())
+    except ValueError:
+        raise HTTPException(status_code=400, detail="percentiles must be comma separated numbers")
+    if not result or not all(0 <= p <= 100 for p in result):
+        raise HTTPException(status_code=400, detail="percentiles must be between 0 and 100")
+    return result
+
+
+def _histogram_paths(db: Session, project_id: int, user_id: int, report_ids: List[int]):
+    """校验报告所有权并返回各报告的直方图文件，没有直方图的报告（旧版本运行或未开始运行）返回 400"""
+    project = db.query(ProjectInfo).filter(
+        ProjectInfo.id == project_id,
+        ProjectInfo.user_id == user_id
+    ).first()
+    if project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    reports = {report.id: report for report in db.query(TestReports).filter(
+        TestReports.id.in_(report_ids),
+        TestReports.project_id == project_id,
+        TestReports.test_type == "performance"
+    ).all()}
+    paths = {}
+    for report_id in report_ids:
+        report = reports.get(report_id)
+        if report is None:
+            raise HTTPException(status_code=404, detail=f"Report {report_id} not found")
+        report_dir = report_dir_of(report.report_path)
+        if report_dir is None or not (report_dir / HISTOGRAM_FILE).exists():
+            raise HTTPException(status_code=400, detail=f"Report {report_id} has no latency histograms")
+        paths[report_id] = report_dir / HISTOGRAM_FILE
+    return paths
+
+
+# 按时间范围和接口计算延迟百分位 - GET /projects/{project_id}/performance-tests/{test_id}/latency
+@router.get("/projects/{project_id}/performance-tests/{test_id}/latency")
+def get_performance_latency(
+        project_id: int,
+        test_id: int,
+        start: Optional[float] = None,
+        end: Optional[float] = None,
+        endpoint: Optional[List[str]] = Query(None),
+        interval: Optional[float] = None,
+        percentiles: Optional[str] = None,
+        current_user: UserInfo = Depends(get_current_user),
+        db: Session = Depends(get_db)
+):
+    """合并 [start, end)（Unix 时间戳，秒）内各窗口的延迟直方图，返回总体和各接口的百分位；
+    endpoint（"方法 名称"，如 "GET 登录"）可重复传入以只统计部分接口，interval 大于 0 时另外返回按 interval 秒分组的时间序列"""
+    if interval is not None and interval <= 0:
+        raise HTTPException(status_code=400, detail="interval must be positive")
+    points = _parse_percentiles(percentiles)
+    paths = _histogram_paths(db, project_id, current_user.id, [test_id])
+
+    overall, by_endpoint, series = query_histograms(paths.values(), start, end, endpoint, interval)
+    result = {
+        "report_id": test_id,
+        "requests": overall.count,
+        "latency_ms": overall.percentiles(points),
+        "endpoints": [{"name": name, "requests": histogram.count, "latency_ms": histogram.percentiles(points)}
+                      for name, histogram in sorted(by_endpoint.items())]
+    }
+    if interval:
+        result["series"] = [{"start": bucket, "requests": histogram.count, "latency_ms": histogram.percentiles(points)}
+                            for bucket, histogram in sorted(series.items())]
+    return result
+
+
+# 对比多次运行的延迟分布 - GET /projects/{project_id}/performance-tests/latency/compare?report_ids=1&report_ids=2
+@router.get("/projects/{project_id}/performance-tests/latency/compare")
+def compare_performance_latency(
+        project_id: int,
+        report_ids: List[int] = Query(...),
+        endpoint: Optional[List[str]] = Query(None),
+        percentiles: Optional[str] = None,
+        current_user: UserInfo = Depends(get_current_user),
+        db: Session = Depends(get_db)
+):
+    """返回每次运行的百分位，以及把所有运行合并后的百分位"""
+    points = _parse_percentiles(percentiles)
+    paths = _histogram_paths(db, project_id, current_user.id, list(dict.fromkeys(report_ids)))
+
+    runs = []
+    merged = LatencyHistogram()
+    for report_id, path in paths.items():
+        overall, by_endpoint, _ = query_histograms([path], endpoints=endpoint)
+        merged.merge(overall)
+        runs.append({
+            "report_id": report_id,
+            "requests": overall.count,
+            "latency_ms": overall.percentiles(points),
+            "endpoints": [{"name": name, "requests": histogram.count, "latency_ms": histogram.percentiles(points)}
+                          for name, histogram in sorted(by_endpoint.items())]
+        })
+    return {
+        "runs": runs,
+        "merged": {"requests": merged.count, "latency_ms": merged.percentiles(points)}
+    }
@@ -0,0 +1,215 @@
+from fastapi import APIRouter, Depends, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi.responses import StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from sqlalchemy.orm import Session
+from app.database import get_db, SessionLocal
+from app.models import ProjectInfo, UserInfo, TestReports, ReportArtifact
+from app.auth import get_current_user, get_stream_user, user_from_token
+from app.core.output_stream import get_stream
+from app.core.artifact_store import ArtifactStore
+from app.core.live_metrics import get_feed, read_metrics_file
+from app.utils.file_utils import report_dir_of
+from collections import deque
+from urllib.parse import quote
+import asyncio
+
+router = APIRouter()
+
+# 等待后台任务注册输出流的最长时间（秒）
+STREAM_WAIT_SECONDS = 10
+POLL_INTERVAL = 0.5
+KEEPALIVE_INTERVAL = 15
+
+
+def _report_state(report_id: int, user_id: int = None):
+    """用新的会话读取报告当前状态，排队任务在后台开始运行后状态和报告路径才会更新
+
+    给了 user_id 时同时验证报告所属项目的所有权，报告不存在或不属于该用户时返回 (None, None)。
+    流式接口在线程池中调用，避免同步查询阻塞事件循环。
+    """
+    db = SessionLocal()
+    try:
+        query = db.query(TestReports).filter(TestReports.id == report_id)
+        if user_id is not None:
+            query = query.join(ProjectInfo, ProjectInfo.id == TestReports.project_id).filter(
+                ProjectInfo.user_id == user_id
+            )
+        report = query.first()
+        return (report.status, report.report_path) if report else (None, None)
+    finally:
+        db.close()
+
+
+def _token_report_state(token: str, report_id: int):
+    """WebSocket 连接的认证和所有权验证，用户或报告无效时返回 (None, None)"""
+    db = SessionLocal()
+    try:
+        user = user_from_token(token, db)
+    finally:
+        db.close()
+    if user is None:
+        return None, None
+    return _report_state(report_id, user.id)
+
+
+def _sse(data: str, event: str = None) -> str:
+    message = f"event: {event}\n" if event else ""
+    return message + f"data: {data}\n\n"
+
+
+# 实时查看运行输出（Server-Sent Events）- GET /reports/{report_id}/logs/stream?token=...
+@router.get("/reports/{report_id}/logs/stream")
+async def stream_report_logs(
+        report_id: int,
+        tail: int = 200,
+        current_user: UserInfo = Depends(get_stream_user)
+):
+    # 验证报告所属项目的所有权
+    status, report_path = await run_in_threadpool(_report_state, report_id, current_user.id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Report not found")
+
+    async def event_stream():
+        nonlocal status, report_path
+        stream = get_stream(report_id)
+        waited = 0.0
+        idle = 0.0
+        # 任务排队期间一直等待；开始运行后最多再等 STREAM_WAIT_SECONDS 注册输出流
+        while stream is None and (status == "queued" or (status == "running" and waited < STREAM_WAIT_SECONDS)):
+            await asyncio.sleep(POLL_INTERVAL)
+            if status == "running":
+                waited += POLL_INTERVAL
+            idle += POLL_INTERVAL
+            if idle >= KEEPALIVE_INTERVAL:
+                idle = 0.0
+                yield ": keepalive\n\n"
+            stream = get_stream(report_id)
+            if stream is None:
+                status, report_path = await run_in_threadpool(_report_state, report_id)
+
+        if stream is None:
+            # 运行已结束：只回放日志文件末尾，不把整个文件读入内存
+            report_dir = report_dir_of(report_path)
+            log_path = report_dir / "run.log" if report_dir else None
+            if log_path and log_path.exists():
+                with open(log_path, encoding="utf-8", errors="replace") as f:
+                    for line in deque(f, maxlen=max(0, tail)):
+                        yield _sse(line.rstrip("\n"))
+            yield _sse("", event="end")
+            return
+
+        seq = 0
+        idle = 0.0
+        while True:
+            lines, seq = stream.read_since(seq)
+            for line in lines:
+                yield _sse(line)
+            if lines:
+                idle = 0.0
+            elif stream.closed:
+                break
+            else:
+                idle += POLL_INTERVAL
+                if idle >= KEEPALIVE_INTERVAL:
+                    idle = 0.0
+                    yield ": keepalive\n\n"
+            await asyncio.sleep(POLL_INTERVAL)
+
+        yield _sse("", event="end")
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# 下载测试附件 - GET /reports/{report_id}/artifacts/{artifact_id}/download
+@router.get("/reports/{report_id}/artifacts/{artifact_id}/download")
+def download_report_artifact(
+        report_id: int,
+        artifact_id: int,
+        current_user: UserInfo = Depends(get_current_user),
+        db: Session = Depends(get_db)
+):
+    # 验证报告所属项目的所有权
+    artifact = db.query(ReportArtifact).join(
+        TestReports, TestReports.id == ReportArtifact.report_id
+    ).join(
+        ProjectInfo, ProjectInfo.id == TestReports.project_id
+    ).filter(
+        ReportArtifact.id == artifact_id,
+        ReportArtifact.report_id == report_id,
+        ProjectInfo.user_id == current_user.id
+    ).first()
+    if artifact is None:
+        raise HTTPException(status_code=404, detail="Artifact not found")
+
+    # 从附件存储中边解压边返回；重新压缩过的截图比原文件小，按实际返回的字节数设置 Content-Length
+    store = ArtifactStore()
+    try:
+        content = store.open(artifact.checksum)
+    except FileNotFoundError:
+        raise HTTPException(status_code=404, detail="Artifact file not found")
+    length = store.served_size(artifact.checksum, artifact.size)
+
+    def iter_content():
+        with content:
+            for chunk in iter(lambda: content.read(64 * 1024), b""):
+                yield chunk
+
+    headers = {"Content-Disposition": f"inline; filename*=UTF-8''{quote(artifact.name or 'artifact')}"}
+    if length is not None:
+        headers["Content-Length"] = str(length)
+    return StreamingResponse(
+        iter_content(),
+        media_type=artifact.content_type or "application/octet-stream",
+        headers=headers
+    )
+
+
+# 实时压测指标（WebSocket）- WS /reports/{report_id}/metrics/ws?token=...
+@router.websocket("/reports/{report_id}/metrics/ws")
+async def stream_report_metrics(websocket: WebSocket, report_id: int, token: str = "", tail: int = 60):
+    """每秒推送一个指标窗口（rps、p50/p95/p99、errors）；浏览器的 WebSocket 无法设置请求头，访问令牌通过 token 参数传递
+
+    客户端读得太慢时只会跳过内存中已淘汰的旧窗口，不会影响压测本身。运行结束后连接会回放 metrics.jsonl 的最后 tail 个窗口。
+    """
+    status, report_path = await run_in_threadpool(_token_report_state, token, report_id)
+    if status is None:
+        await websocket.close(code=1008)
+        return
+
+    await websocket.accept()
+    try:
+        feed = get_feed(report_id)
+        waited = 0.0
+        # 与日志流一致：排队期间一直等待，开始运行后最多再等 STREAM_WAIT_SECONDS 注册指标流
+        while feed is None and (status == "queued" or (status == "running" and waited < STREAM_WAIT_SECONDS)):
+            await asyncio.sleep(POLL_INTERVAL)
+            if status == "running":
+                waited += POLL_INTERVAL
+            feed = get_feed(report_id)
+            if feed is None:
+                status, report_path = await run_in_threadpool(_report_state, report_id)
+
+        if feed is None:
+            report_dir = report_dir_of(report_path)
+            for window in read_metrics_file(report_dir, tail) if report_dir else []:
+                await websocket.send_json(window)
+        else:
+            windows, seq = feed.read_since(0)
+            for window in windows[-tail:] if tail > 0 else []:
+                await websocket.send_json(window)
+            while True:
+                windows, seq = feed.read_since(seq)
+                for window in windows:
+                    await websocket.send_json(window)
+                if not windows and feed.closed:
+                    break
+                await asyncio.sleep(POLL_INTERVAL)
+
+        await websocket.send_json({"event": "end"})
+        await websocket.close()
+    except WebSocketDisconnect:
+        return
@@ -1,10 +1,26 @@
-from fastapi import APIRouter, Depends, HTTPException, BackgroundTasks
+from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.orm import Session
 from app.database import get_db
-from app.models import UIInfo, ProjectInfo, UserInfo, TestReports, BusinessFlow
-from app.schemas import UITestCaseCreate, UITestCaseResponse, BusinessFlowCreate, BusinessFlowResponse
+from app.models import UIInfo, ProjectInfo, UserInfo, TestReports, BusinessFlow, UIProjectSettings, ReportArtifact
+from app.schemas import (
+    UITestCaseCreate,
+    UITestCaseResponse,
+    BusinessFlowCreate,
+    BusinessFlowResponse,
+    UIProjectSettingsUpdate,
+    UIProjectSettingsResponse,
+    ReportArtifactPage
+)
 from app.auth import get_current_user
 from app.core.ui_test_runner import UITestRunner
+from app.core.storage_state import StorageStateCache
+from app.core.network_rules import RouteRules
+from app.core.ui_executor import DEFAULT_CONCURRENCY, DEFAULT_BROWSERS, DEFAULT_CAPTURE_POLICY, CAPTURE_POLICIES
+from app.core import job_queue
+from app.core.allure_results import load_results
+from app.core.artifacts import build_artifact_index, ARTIFACT_TYPES
+from app.utils.file_utils import report_dir_of
+from app.core.case_history import RUN_MODES, record_case_runs, content_hashes, select_failed_or_changed
 from typing import List, Optional
 from datetime import datetime
 import uuid
@@ -155,7 +171,6 @@ def delete_ui_test_case(
 def run_ui_tests(
         project_id: int,
         request_data: dict,
-        background_tasks: BackgroundTasks,
         current_user: UserInfo = Depends(get_current_user),
         db: Session = Depends(get_db)
 ):
@@ -169,6 +184,24 @@ def run_ui_tests(
 
     test_case_ids = request_data.get("test_case_ids", [])
 
+    # 执行方式：pytest（默认，把 script_content 生成为测试模块在子进程中执行）
+    # 或 inline（需显式指定，在服务进程的一个事件循环内并发执行，每个用例一个独立 context）
+    executor = request_data.get("executor", "pytest")
+    if executor not in ("pytest", "inline"):
+        raise HTTPException(status_code=400, detail="Invalid executor")
+    # 截图和录制策略：always / on-failure（默认，只保存失败用例的）/ off
+    if request_data.get("capture", DEFAULT_CAPTURE_POLICY) not in CAPTURE_POLICIES:
+        raise HTTPException(status_code=400, detail="Invalid capture policy")
+    for key in ("concurrency", "browsers", "memory_limit_mb"):
+        value = request_data.get(key)
+        if value is not None and (not isinstance(value, int) or value < 1):
+            raise HTTPException(status_code=400, detail=f"{key} must be a positive integer")
+
+    # 运行模式：all 全部运行；failed_or_changed 只运行上次失败或之后被修改过的用例
+    mode = request_data.get("mode", "all")
+    if mode not in RUN_MODES:
+        raise HTTPException(status_code=400, detail="Invalid run mode")
+
     # 获取测试用例
     test_cases = db.query(UIInfo).filter(
         UIInfo.project_id == project_id,
@@ -176,57 +209,234 @@ def run_ui_tests(
     ).all()
 
     # 为每个测试用例解析steps字段
-    for test_case in test_cases:
-        if test_case.steps and isinstance(test_case.steps, str):
-            try:
-                test_case.steps = json.loads(test_case.steps)
-            except json.JSONDecodeError:
-                test_case.steps = []
-        else:
-            test_case.steps = test_case.steps or []
+    parse_steps(test_cases)
+
+    if mode == "failed_or_changed":
+        test_cases = select_failed_or_changed(db, "ui", test_cases)
+        if not test_cases:
+            return {"message": "No failed or changed test cases", "test_count": 0}
 
     # 创建测试报告记录
     report = TestReports(
         report_name=f"UI_Test_{uuid.uuid4().hex[:8]}",
         project_id=project_id,
         test_type="ui",
-        status="running",
+        status="queued",
         created_at=datetime.now()
     )
     db.add(report)
     db.commit()
 
-    # 在后台运行测试
-    background_tasks.add_task(
-        run_ui_tests_background,
-        test_cases,
-        report.id,
-        db
+    # 放入任务队列，由工作线程执行
+    options = {key: value for key, value in request_data.items() if key != "test_case_ids"}
+    job = job_queue.enqueue(
+        db,
+        "ui",
+        project_id,
+        {"test_case_ids": [case.id for case in test_cases], "options": options},
+        report_id=report.id,
+        priority=request_data.get("priority", 0)
     )
 
-    return {"message": "UI tests started", "report_id": report.id}
+    return {"message": "UI tests started", "report_id": report.id, "job_id": job.id, "test_count": len(test_cases)}
 
 
-def run_ui_tests_background(test_cases, report_id, db):
+def parse_steps(test_cases):
+    """把 steps 字段从JSON字符串转换为列表"""
+    for test_case in test_cases:
+        if test_case.steps and isinstance(test_case.steps, str):
+            try:
+                test_case.steps = json.loads(test_case.steps)
+            except json.JSONDecodeError:
+                test_case.steps = []
+        else:
+            test_case.steps = test_case.steps or []
+
+
+def run_ui_tests_job(job, db):
+    """任务队列处理函数：在工作线程中使用任务自己的数据库会话执行UI测试"""
+    payload = job.payload or {}
+    test_cases = db.query(UIInfo).filter(UIInfo.id.in_(payload.get("test_case_ids", []))).all()
+    if not test_cases:
+        raise ValueError("No test cases found")
+
+    # 解析后的 steps 只用于本次运行，脱离会话避免被写回数据库
+    for test_case in test_cases:
+        db.expunge(test_case)
+    parse_steps(test_cases)
+    hashes = content_hashes("ui", test_cases)
+
+    options = payload.get("options", {})
+    settings = db.query(UIProjectSettings).filter(UIProjectSettings.project_id == job.project_id).first()
+    setup = load_setup(db, settings, options.get("refresh_storage_state", False))
+    route_rules = settings.route_rules if settings else None
+    if setup:
+        # 登录用例只用于生成 storage state，不作为普通用例重复执行
+        test_cases = [case for case in test_cases if case.id != setup["setup_case"].id]
+
+    runner = UITestRunner()
+    report_paths = []
+
+    def on_report_dir(report_path):
+        report_paths.append(report_path)
+        job_queue.save_report_path(job.report_id, report_path)
+
     try:
-        runner = UITestRunner()
-        results = runner.run_tests(test_cases)
-
-        # 更新测试报告
-        report = db.query(TestReports).filter(TestReports.id == report_id).first()
-        if report:
-            report.status = "completed"
-            report.report_path = results.get("report_path")
-            report.updated_at = datetime.now()
-            db.commit()
-    except Exception as e:
-        # 更新测试报告为失败
-        report = db.query(TestReports).filter(TestReports.id == report_id).first()
-        if report:
-            report.status = "failed"
-            report.updated_at = datetime.now()
-            db.commit()
-        print(f"UI tests failed: {e}")
+        if options.get("executor", "pytest") == "inline":
+            results = runner.run_inline(
+                test_cases,
+                report_id=job.report_id,
+                concurrency=options.get("concurrency", DEFAULT_CONCURRENCY),
+                browsers=options.get("browsers", DEFAULT_BROWSERS),
+                memory_limit_mb=options.get("memory_limit_mb"),
+                recycle_after=options.get("browser_recycle_after"),
+                capture_policy=options.get("capture", DEFAULT_CAPTURE_POLICY),
+                setup=setup,
+                route_rules=route_rules,
+                on_report_dir=on_report_dir
+            )
+        else:
+            results = runner.run_tests(
+                test_cases,
+                report_id=job.report_id,
+                pool_size=options.get("browser_pool_size"),
+                recycle_after=options.get("browser_recycle_after"),
+                capture_policy=options.get("capture", DEFAULT_CAPTURE_POLICY),
+                setup=setup,
+                route_rules=route_rules,
+                on_report_dir=on_report_dir
+            )
+    except Exception:
+        # 运行中途失败（例如浏览器无法启动）：已产生的截图和录制同样建立索引
+        if report_paths:
+            build_artifact_index(db, job.report_id, report_dir_of(report_paths[0]))
+        raise
+
+    # 更新测试报告
+    report = db.query(TestReports).filter(TestReports.id == job.report_id).first()
+    if report:
+        report.status = "completed"
+        report.report_path = results.get("report_path")
+        report.summary = results.get("summary")
+        db.commit()
+
+        # 记录每个用例的耗时历史
+        record_case_runs(db, "ui", report.project_id, load_results(results["results_dir"]), report.id, hashes)
+
+        # 建立附件索引，查询附件时不再遍历报告目录
+        build_artifact_index(db, report.id, report_dir_of(report.report_path))
+
+
+def load_setup(db, settings, refresh=False):
+    """根据项目UI设置读取登录用例配置，没有配置时返回 None"""
+    if settings is None or settings.setup_case_id is None:
+        return None
+    setup_case = db.query(UIInfo).filter(UIInfo.id == settings.setup_case_id).first()
+    if setup_case is None:
+        return None
+    db.expunge(setup_case)
+    parse_steps([setup_case])
+    return {
+        "setup_case": setup_case,
+        "project_id": settings.project_id,
+        "storage_state_ttl": settings.storage_state_ttl,
+        "refresh_storage_state": refresh
+    }
+
+
+job_queue.register_handler("ui", run_ui_tests_job)
+
+
+def _settings_response(project_id, settings):
+    return {
+        "project_id": project_id,
+        "setup_case_id": settings.setup_case_id if settings else None,
+        "storage_state_ttl": settings.storage_state_ttl if settings else 3600,
+        "route_rules": settings.route_rules if settings else None,
+        "storage_state_cached": StorageStateCache().state_path(project_id).exists()
+    }
+
+
+# 获取项目UI设置 - GET /projects/{project_id}/ui-settings
+@router.get("/{project_id}/ui-settings", response_model=UIProjectSettingsResponse)
+def get_ui_settings(
+        project_id: int,
+        current_user: UserInfo = Depends(get_current_user),
+        db: Session = Depends(get_db)
+):
+    # 验证项目所有权
+    project = db.query(ProjectInfo).filter(
+        ProjectInfo.id == project_id,
+        ProjectInfo.user_id == current_user.id
+    ).first()
+    if project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    settings = db.query(UIProjectSettings).filter(UIProjectSettings.project_id == project_id).first()
+    return _settings_response(project_id, settings)
+
+
+# 更新项目UI设置（登录用例、storage state 缓存有效期、请求路由规则）- PUT /projects/{project_id}/ui-settings
+@router.put("/{project_id}/ui-settings", response_model=UIProjectSettingsResponse)
+def update_ui_settings(
+        project_id: int,
+        settings_data: UIProjectSettingsUpdate,
+        current_user: UserInfo = Depends(get_current_user),
+        db: Session = Depends(get_db)
+):
+    # 验证项目所有权
+    project = db.query(ProjectInfo).filter(
+        ProjectInfo.id == project_id,
+        ProjectInfo.user_id == current_user.id
+    ).first()
+    if project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    if settings_data.setup_case_id is not None:
+        setup_case = db.query(UIInfo).filter(
+            UIInfo.id == settings_data.setup_case_id,
+            UIInfo.project_id == project_id
+        ).first()
+        if setup_case is None:
+            raise HTTPException(status_code=404, detail="Setup case not found")
+    if settings_data.storage_state_ttl < 0:
+        raise HTTPException(status_code=400, detail="storage_state_ttl must not be negative")
+    error = RouteRules.validate(settings_data.route_rules)
+    if error:
+        raise HTTPException(status_code=400, detail=error)
+
+    settings = db.query(UIProjectSettings).filter(UIProjectSettings.project_id == project_id).first()
+    if settings is None:
+        settings = UIProjectSettings(project_id=project_id)
+        db.add(settings)
+    if settings.setup_case_id != settings_data.setup_case_id:
+        # 换了登录用例，旧的 storage state 不再适用
+        StorageStateCache().invalidate(project_id)
+    settings.setup_case_id = settings_data.setup_case_id
+    settings.storage_state_ttl = settings_data.storage_state_ttl
+    settings.route_rules = settings_data.route_rules
+    db.commit()
+    db.refresh(settings)
+    return _settings_response(project_id, settings)
+
+
+# 清除缓存的登录状态 - DELETE /projects/{project_id}/ui-settings/storage-state
+@router.delete("/{project_id}/ui-settings/storage-state")
+def clear_storage_state(
+        project_id: int,
+        current_user: UserInfo = Depends(get_current_user),
+        db: Session = Depends(get_db)
+):
+    # 验证项目所有权
+    project = db.query(ProjectInfo).filter(
+        ProjectInfo.id == project_id,
+        ProjectInfo.user_id == current_user.id
+    ).first()
+    if project is None:
+        raise HTTPException(status_code=404, detail="Project not found")
+
+    removed = StorageStateCache().invalidate(project_id)
+    return {"message": "Storage state cleared" if removed else "No cached storage state"}
 
 # 创建工作流 - POST /projects/{project_id}/ui-business-flows
 @router.post("/{project_id}/ui-business-flows", response_model=BusinessFlowResponse)
@@ -277,10 +487,14 @@ def get_ui_test_reports(
     return reports
 
 # 获取测试附件 - GET /projects/{project_id}/ui-tests/reports/{report_id}/artifacts
-@router.get("/{project_id}/ui-tests/reports/{report_id}/artifacts")
+@router.get("/{project_id}/ui-tests/reports/{report_id}/artifacts", response_model=ReportArtifactPage)
 def get_ui_test_artifacts(
         project_id: int,
         report_id: int,
+        case_id: Optional[int] = None,
+        artifact_type: Optional[str] = None,
+        skip: int = 0,
+        limit: int = 50,
         current_user: UserInfo = Depends(get_current_user),
         db: Session = Depends(get_db)
 ):
@@ -298,10 +512,23 @@ def get_ui_test_artifacts(
     ).first()
     if report is None:
         raise HTTPException(status_code=404, detail="Report not found")
-
-    # 这里应该返回测试产生的截图、录制文件等路径
-    # 简化处理，返回一个空的列表
-    return {"screenshots": [], "videos": []}
+    if artifact_type is not None and artifact_type not in ARTIFACT_TYPES:
+        raise HTTPException(status_code=400, detail="Invalid artifact type")
+
+    # 从运行结束时建立的附件索引中分页查询
+    query = db.query(ReportArtifact).filter(ReportArtifact.report_id == report_id)
+    if case_id is not None:
+        query = query.filter(ReportArtifact.case_id == case_id)
+    if artifact_type is not None:
+        query = query.filter(ReportArtifact.artifact_type == artifact_type)
+
+    limit = max(1, min(limit, 500))
+    return {
+        "total": query.count(),
+        "skip": skip,
+        "limit": limit,
+        "items": query.order_by(ReportArtifact.case_id, ReportArtifact.id).offset(skip).limit(limit).all()
+    }
 
 # 获取业务流程列表 - GET /projects/{project_id}/ui-business-flows
 @router.get("/{project_id}/ui-business-flows", response_model=List[BusinessFlowResponse])
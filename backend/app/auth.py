@@ -3,6 +3,7 @@ from fastapi.security import HTTPBearer, HTTPAuthorizationCredentials
 from jose import JWTError, jwt
 from passlib.context import CryptContext
 from sqlalchemy.orm import Session
+from typing import Optional
 from app.database import get_db
 from app.models import UserInfo
 import os
@@ -15,6 +16,7 @@ ALGORITHM = "HS256"
 
 pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 security = HTTPBearer()
+optional_security = HTTPBearer(auto_error=False)
 
 
 def verify_password(plain_password, hashed_password):
@@ -32,21 +34,41 @@ def create_access_token(data: dict):
     return encoded_jwt
 
 
+def user_from_token(token: str, db: Session):
+    """解析访问令牌并返回对应用户，令牌无效时返回 None（WebSocket 等无法使用 Bearer 请求头的场景）"""
+    try:
+        payload = jwt.decode(token, SECRET_KEY, algorithms=[ALGORITHM])
+    except JWTError:
+        return None
+    username: str = payload.get("sub")
+    if username is None:
+        return None
+    return db.query(UserInfo).filter(UserInfo.username == username).first()
+
+
 def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security), db: Session = Depends(get_db)):
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    try:
-        payload = jwt.decode(credentials.credentials, SECRET_KEY, algorithms=[ALGORITHM])
-        username: str = payload.get("sub")
-        if username is None:
-            raise credentials_exception
-    except JWTError:
+    user = user_from_token(credentials.credentials, db)
+    if user is None:
         raise credentials_exception
+    return user
 
-    user = db.query(UserInfo).filter(UserInfo.username == username).first()
+
+def get_stream_user(
+        credentials: Optional[HTTPAuthorizationCredentials] = Depends(optional_security),
+        token: Optional[str] = None,
+        db: Session = Depends(get_db)
+):
+    """流式接口的用户认证：优先使用 Bearer 请求头，浏览器的 EventSource 无法设置请求头时通过 ?token= 传递"""
+    user = user_from_token(credentials.credentials if credentials else token or "", db)
     if user is None:
-        raise credentials_exception
-    return user
\ No newline at end of file
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Could not validate credentials",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return user
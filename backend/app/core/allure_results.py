@@ -0,0 +1,228 @@
+import json
+import shutil
+import subprocess
+import threading
+import uuid
+from pathlib import Path
+from typing import List, Dict, Any, Callable, Optional
+
+from app.core.artifact_store import restore_report_files
+
+
+# 摘要中最多保留的失败用例条数
+MAX_SUMMARY_FAILURES = 50
+
+# 运行期间扫描 allure-results 统计进度的间隔（秒）
+PROGRESS_INTERVAL = 2
+
+# 同一报告目录同时只允许一个 allure generate，值为 [锁, 使用者数]
+_generate_locks: Dict[str, list] = {}
+_generate_locks_guard = threading.Lock()
+
+
+def load_results(results_dir) -> List[Dict[str, Any]]:
+    """解析 allure-results 目录中的 *-result.json，返回每个用例的状态和耗时（毫秒）"""
+    results = []
+    results_dir = Path(results_dir)
+    if not results_dir.exists():
+        return results
+
+    for result_file in results_dir.glob("*-result.json"):
+        try:
+            with open(result_file, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+
+        labels = {label.get("name"): label.get("value") for label in data.get("labels", [])}
+        case_id = labels.get("as_id")
+        start, stop = data.get("start"), data.get("stop")
+        results.append({
+            "case_id": int(case_id) if case_id and str(case_id).isdigit() else None,
+            "name": data.get("name"),
+            "case_name": labels.get("story"),
+            "status": data.get("status"),
+            "start": start,
+            "stop": stop,
+            "duration": (stop - start) if start and stop else None,
+            "message": (data.get("statusDetails") or {}).get("message")
+        })
+
+    return results
+
+
+def write_result(results_dir, name: str, status: str, start: int, stop: int, labels: Dict[str, Any],
+                 message: Optional[str] = None, trace: Optional[str] = None,
+                 attachments: Optional[List[Dict[str, str]]] = None,
+                 steps: Optional[List[Dict[str, Any]]] = None) -> str:
+    """写入一个与 allure-pytest 格式兼容的 *-result.json，供不经过 pytest 的执行器使用
+
+    attachments 为 {"name", "path", "type"} 列表，文件会移动到 results 目录中；
+    steps 为步骤耗时列表（index / action / selector / value / status / start / stop），写成 allure 步骤；
+    返回结果文件的 uuid
+    """
+    results_dir = Path(results_dir)
+    result_uuid = str(uuid.uuid4())
+    result_attachments = []
+    for attachment in attachments or []:
+        path = Path(attachment["path"])
+        if not path.exists():
+            continue
+        source = f"{uuid.uuid4()}-attachment{path.suffix}"
+        shutil.move(str(path), str(results_dir / source))
+        result_attachments.append({"name": attachment["name"], "source": source, "type": attachment["type"]})
+
+    data = {
+        "uuid": result_uuid,
+        "historyId": str(uuid.uuid5(uuid.NAMESPACE_URL, name)),
+        "name": name,
+        "fullName": name,
+        "status": status,
+        "statusDetails": {"message": message, "trace": trace} if message or trace else {},
+        "start": start,
+        "stop": stop,
+        "labels": [{"name": key, "value": str(value)} for key, value in labels.items() if value is not None],
+        "attachments": result_attachments,
+        "steps": [
+            {
+                "name": " ".join(filter(None, [f"{step['index']}. {step['action']}", step.get("selector"), step.get("value")])),
+                "status": step.get("status"),
+                "statusDetails": {"message": step["message"]} if step.get("message") else {},
+                "start": step.get("start"),
+                "stop": step.get("stop")
+            }
+            for step in steps or []
+        ]
+    }
+    with open(results_dir / f"{result_uuid}-result.json", "w", encoding="utf-8") as f:
+        json.dump(data, f, ensure_ascii=False)
+    return result_uuid
+
+
+def summarize_results(results_dir) -> Dict[str, Any]:
+    """把 allure-results 汇总成轻量的 JSON 摘要：各状态数量、耗时和失败用例"""
+    results = load_results(results_dir)
+    counts = {status: 0 for status in ("passed", "failed", "broken", "skipped")}
+    for result in results:
+        counts[result["status"]] = counts.get(result["status"], 0) + 1
+
+    starts = [r["start"] for r in results if r["start"]]
+    stops = [r["stop"] for r in results if r["stop"]]
+    failures = [
+        {"case_id": r["case_id"], "case_name": r["case_name"], "name": r["name"], "status": r["status"],
+         "duration": r["duration"], "message": r["message"]}
+        for r in results if r["status"] in ("failed", "broken")
+    ]
+
+    return {
+        "total": len(results),
+        **counts,
+        # wall-clock 耗时与各用例耗时之和（毫秒），并行分片时两者会有明显差别
+        "duration": (max(stops) - min(starts)) if starts and stops else 0,
+        "total_duration": sum(r["duration"] or 0 for r in results),
+        "failures": failures[:MAX_SUMMARY_FAILURES]
+    }
+
+
+def write_summary(report_dir, results_dir) -> Dict[str, Any]:
+    """生成摘要并写入报告目录下的 summary.json"""
+    summary = summarize_results(results_dir)
+    with open(Path(report_dir) / "summary.json", "w", encoding="utf-8") as f:
+        json.dump(summary, f, ensure_ascii=False, indent=2)
+    return summary
+
+
+class ProgressWatcher:
+    """运行期间定时扫描 allure-results，统计已完成用例的状态并回调 on_progress
+
+    每个结果文件只解析一次，计数有变化时才回调；stop() 时会再扫描一遍保证最终计数完整。
+    """
+
+    def __init__(self, results_dir, total: int, on_progress: Callable[[Dict[str, int]], None],
+                 interval: float = PROGRESS_INTERVAL):
+        self.results_dir = Path(results_dir)
+        self.on_progress = on_progress
+        self.interval = interval
+        self.counts = {"total": total, "done": 0, "passed": 0, "failed": 0, "broken": 0, "skipped": 0}
+        self._seen = set()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._watch, daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        if self._thread.is_alive():
+            self._thread.join()
+        self._scan()
+
+    def _watch(self):
+        while not self._stop.wait(self.interval):
+            self._scan()
+
+    def _scan(self):
+        changed = False
+        for result_file in self.results_dir.glob("*-result.json"):
+            if result_file.name in self._seen:
+                continue
+            try:
+                with open(result_file, encoding='utf-8') as f:
+                    status = json.load(f).get("status")
+            except (OSError, ValueError):
+                # 文件可能还没写完，下次再读
+                continue
+            self._seen.add(result_file.name)
+            self.counts["done"] += 1
+            self.counts[status] = self.counts.get(status, 0) + 1
+            changed = True
+
+        if changed:
+            try:
+                self.on_progress(dict(self.counts))
+            except Exception as e:
+                print(f"✗ 更新运行进度失败: {e}")
+
+
+def ensure_allure_report(report_dir) -> bool:
+    """按需生成 allure HTML 报告，已生成过则直接复用，返回报告是否可用"""
+    report_dir = Path(report_dir)
+    results_dir = report_dir / "allure-results"
+    allure_report_dir = report_dir / "allure-report"
+    if (allure_report_dir / "index.html").exists():
+        return True
+    if not results_dir.is_dir():
+        return False
+
+    key = str(report_dir.resolve())
+    with _generate_locks_guard:
+        # 最后一个使用者离开时才移除，等待中的请求与新请求总是拿到同一把锁
+        entry = _generate_locks.setdefault(key, [threading.Lock(), 0])
+        entry[1] += 1
+        lock = entry[0]
+
+    try:
+        with lock:
+            # 等锁期间可能已由其他请求生成
+            if not (allure_report_dir / "index.html").exists():
+                # 附件已移入附件存储，生成期间临时还原到 allure-results，生成后删除
+                restored = restore_report_files(report_dir)
+                try:
+                    subprocess.run([
+                        "allure", "generate",
+                        str(results_dir),
+                        "-o", str(allure_report_dir),
+                        "--clean"
+                    ])
+                except OSError as e:
+                    # 未安装 allure 命令行时不生成 HTML，静态文件请求按文件不存在处理
+                    print(f"✗ 生成 allure 报告失败: {e}")
+                finally:
+                    for path in restored:
+                        path.unlink(missing_ok=True)
+    finally:
+        with _generate_locks_guard:
+            entry[1] -= 1
+            if entry[1] == 0:
+                _generate_locks.pop(key, None)
+    return (allure_report_dir / "index.html").exists()
@@ -2,77 +2,315 @@ import requests
 import pytest
 import allure
 import json
+import asyncio
+import hashlib
 from datetime import datetime
 from pathlib import Path
-import subprocess
 import sys
-from typing import List, Dict, Any
+import os
+from typing import List, Dict, Any, Tuple, Callable
 import time
+from app.core.http_pool import HostConnectionPool
+from app.core.scheduler import shard_cases
+from app.core.module_cache import ModuleCache
+from app.core.allure_results import write_summary, ProgressWatcher
+from app.utils.file_utils import make_report_dir
+from app.core.output_stream import (
+    OutputStream, register_stream, unregister_stream, start_process, stop_processes, wait_all_streaming
+)
+
+
+# 连接池默认配置，可在单次运行时覆盖
+DEFAULT_POOL_SIZE = int(os.getenv("API_POOL_SIZE", "10"))
+DEFAULT_KEEPALIVE = os.getenv("API_KEEPALIVE", "true").lower() == "true"
+DEFAULT_HTTP2 = os.getenv("API_HTTP2", "false").lower() == "true"
+
+# 参与模块缓存键计算的用例字段
+CACHE_KEY_FIELDS = ("id", "case_name", "method", "url", "headers", "params", "body", "expected_data")
+# 模板随本文件变化，文件内容变了缓存自动失效
+TEMPLATE_HASH = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()[:12]
+
+
+# 与生成的 pytest 用例保持一致的成功状态码
+SUCCESS_STATUS_CODES = (200, 201, 202)
+
+
+def check_response(status_code, actual_data, expected_data):
+    """按生成用例的断言规则校验响应，通过返回 None，否则返回失败原因"""
+    if status_code not in SUCCESS_STATUS_CODES:
+        return f"Expected success status code, got {status_code}"
+
+    for key, expected_value in (expected_data or {}).items():
+        if not isinstance(actual_data, dict) or key not in actual_data:
+            return f"Key '{key}' not found in response"
+        if actual_data[key] != expected_value:
+            return f"Value mismatch for key '{key}': expected {expected_value}, got {actual_data[key]}"
+
+    return None
+
+
+def merge_connection_stats(stats_list: List[Dict[str, Any]]):
+    """合并多个分片的连接统计，同一主机的计数相加"""
+    if not stats_list:
+        return None
+
+    hosts: Dict[str, Dict[str, Any]] = {}
+    for stats in stats_list:
+        for host in stats.get("hosts", []):
+            merged = hosts.setdefault(host["host"], {"host": host["host"], "requests": 0,
+                                                     "new_connections": 0, "reused_connections": 0})
+            for key in ("requests", "new_connections", "reused_connections"):
+                merged[key] += host.get(key, 0)
+
+    return {
+        **stats_list[0],
+        "requests": sum(h["requests"] for h in hosts.values()),
+        "new_connections": sum(h["new_connections"] for h in hosts.values()),
+        "reused_connections": sum(h["reused_connections"] for h in hosts.values()),
+        "hosts": list(hosts.values())
+    }
 
 
 class APITestRunner:
-    def __init__(self):
+    def __init__(self, pool_size: int = DEFAULT_POOL_SIZE, keepalive: bool = DEFAULT_KEEPALIVE,
+                 http2: bool = DEFAULT_HTTP2):
         self.report_base_dir = Path("reports/api")
         self.report_base_dir.mkdir(parents=True, exist_ok=True)
+        self.pool_size = pool_size
+        self.keepalive = keepalive
+        self.http2 = http2
+        self.module_cache = ModuleCache()
 
-    def run_tests(self, test_cases: List[Any]) -> Dict[str, Any]:
-        """运行API测试用例"""
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        report_dir = self.report_base_dir / timestamp
-        report_dir.mkdir(parents=True, exist_ok=True)
+    def run_tests(self, test_cases: List[Any], parallelism: int = 1, strategy: str = "round_robin",
+                  durations: Dict[int, float] = None, report_id: int = None,
+                  on_progress: Callable[[Dict[str, int]], None] = None,
+                  on_report_dir: Callable[[str], None] = None) -> Dict[str, Any]:
+        """运行API测试用例，parallelism > 1 时按分片策略分配到多个 pytest 工作进程
 
-        # 生成测试文件
-        test_file = self.generate_test_file(test_cases, report_dir)
+        durations 为各用例的历史耗时（毫秒），strategy 为 duration 时用于均衡分片；
+        传入 report_id 时运行输出可通过该报告ID实时查看；
+        on_progress 在运行期间随已完成用例数变化被调用，参数为各状态的计数；
+        on_report_dir 在报告目录创建后立即被调用，参数与返回值中的 report_path 相同
+        """
+        report_dir = make_report_dir(self.report_base_dir)
+        if on_report_dir:
+            on_report_dir(str(report_dir / "allure-report"))
+        timestamp = report_dir.name
 
-        # 运行 pytest 测试
+        # 所有分片写入同一个 allure-results 目录，结果文件以 uuid 命名，天然合并为一份报告
         allure_results_dir = report_dir / "allure-results"
         allure_results_dir.mkdir(exist_ok=True)
 
-        # 运行测试
-        cmd = [
-            sys.executable, "-m", "pytest",
-            str(test_file),
-            f"--alluredir={allure_results_dir}",
-            "--tb=short",
-            "-v"
-        ]
+        shards = shard_cases(test_cases, parallelism, strategy, durations)
+
+        # 所有分片的输出逐行写入同一个输出流：内存只保留最近的行，完整内容写入轮转日志
+        stream = OutputStream(report_dir / "run.log")
+        register_stream(report_id, stream)
+        watcher = ProgressWatcher(allure_results_dir, len(test_cases), on_progress) if on_progress else None
+
+        processes = []
+        stats_files = []
+        test_files = []
+        cache_hits = 0
+        try:
+            for index, shard in enumerate(shards):
+                test_file, cached = self.generate_test_file(shard)
+                test_files.append(str(test_file))
+                cache_hits += cached
+                cmd = [
+                    sys.executable, "-m", "pytest",
+                    str(test_file),
+                    f"--alluredir={allure_results_dir}",
+                    "--tb=short",
+                    "-v",
+                    "-p", "no:cacheprovider"
+                ]
+
+                # 生成的用例通过环境变量读取连接池配置，并把连接统计写回报告目录
+                stats_file = report_dir / self._shard_name("connection_stats", index, len(shards), ".json")
+                stats_files.append(stats_file)
+                env = ModuleCache.subprocess_env({
+                    **os.environ,
+                    "API_STATS_FILE": str(stats_file),
+                    "API_POOL_SIZE": str(self.pool_size),
+                    "API_KEEPALIVE": str(self.keepalive).lower()
+                })
+                prefix = "" if len(shards) == 1 else f"[shard {index}] "
+                stream.write(f"{prefix}running {len(shard)} cases: {test_file}")
+                processes.append((start_process(cmd, env=env), prefix))
+
+            if watcher:
+                watcher.start()
+            returncodes = wait_all_streaming(processes, stream)
+        except BaseException:
+            # 后面的分片生成或启动失败时，已启动的分片进程不会再被等待，需要结束它们
+            stop_processes([process for process, _ in processes])
+            raise
+        finally:
+            if watcher:
+                watcher.stop()
+            stream.close()
+            unregister_stream(report_id)
 
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        exit_code = max(returncodes)
+        shard_stats = []
+        for stats_file in stats_files:
+            if stats_file.exists():
+                with open(stats_file, encoding='utf-8') as f:
+                    shard_stats.append(json.load(f))
 
-        # 生成 allure 报告
+        # 只生成轻量摘要；allure HTML 报告在首次访问 /reports/... 时再生成
         allure_report_dir = report_dir / "allure-report"
-        subprocess.run([
-            "allure", "generate",
-            str(allure_results_dir),
-            "-o", str(allure_report_dir),
-            "--clean"
-        ])
+        summary = write_summary(report_dir, allure_results_dir)
 
         return {
             "report_path": str(allure_report_dir),
-            "exit_code": result.returncode,
-            "stdout": result.stdout,
-            "stderr": result.stderr,
+            "results_dir": str(allure_results_dir),
+            "summary": summary,
+            "exit_code": exit_code,
+            "stdout": stream.tail(),
+            "stderr": "",
+            "log_path": str(stream.log_path),
+            "parallelism": len(processes),
+            "strategy": strategy,
+            "test_files": test_files,
+            "module_cache_hits": cache_hits,
+            "connection_stats": merge_connection_stats(shard_stats),
             "timestamp": timestamp
         }
 
-    def generate_test_file(self, test_cases: List[Any], report_dir: Path) -> Path:
-        """生成 pytest 测试文件"""
-        test_file = report_dir / "test_api.py"
+    @staticmethod
+    def _shard_name(prefix: str, index: int, total: int, suffix: str) -> str:
+        return f"{prefix}{suffix}" if total == 1 else f"{prefix}_shard{index}{suffix}"
 
+    def run_inline(self, test_cases: List[Any], concurrency: int = 10) -> Dict[str, Any]:
+        """在服务进程内直接执行API用例，不生成 pytest 文件也不启动子进程"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        start = time.perf_counter()
+
+        results, connection_stats = asyncio.run(self._run_cases_async(test_cases, concurrency))
+
+        passed = sum(1 for r in results if r["status"] == "passed")
+        return {
+            "executor": "inline",
+            "total": len(results),
+            "passed": passed,
+            "failed": len(results) - passed,
+            "duration": round((time.perf_counter() - start) * 1000, 2),
+            "results": results,
+            "connection_stats": connection_stats,
+            "timestamp": timestamp
+        }
+
+    async def _run_cases_async(self, test_cases: List[Any], concurrency: int):
+        semaphore = asyncio.Semaphore(max(1, concurrency))
+        async with HostConnectionPool(self.pool_size, self.keepalive, self.http2) as pool:
+            results = await asyncio.gather(
+                *(self._execute_case(pool, case, semaphore) for case in test_cases)
+            )
+            return list(results), pool.get_stats()
+
+    async def _execute_case(self, pool: HostConnectionPool, case: Any, semaphore: asyncio.Semaphore) -> Dict[str, Any]:
+        """执行单个用例，status 取值与 allure 一致：passed / failed / broken"""
+        result = {
+            "case_id": case.id,
+            "case_name": case.case_name,
+            "method": case.method,
+            "url": case.url,
+            "status": "passed",
+            "status_code": None,
+            "duration": 0,
+            "message": None
+        }
+
+        async with semaphore:
+            start = time.perf_counter()
+            try:
+                response = await pool.request(
+                    method=case.method,
+                    url=case.url,
+                    headers=case.headers or {},
+                    params=case.params or {},
+                    json=case.body or {}
+                )
+                result["status_code"] = response.status_code
+                actual_data = response.json() if response.content else {}
+
+                message = check_response(response.status_code, actual_data, case.expected_data)
+                if message:
+                    result["status"] = "failed"
+                    result["message"] = message
+            except Exception as e:
+                # 请求异常或响应无法解析为JSON
+                result["status"] = "broken"
+                result["message"] = f"{type(e).__name__}: {e}"
+            finally:
+                result["duration"] = round((time.perf_counter() - start) * 1000, 2)
+
+        return result
+
+    def generate_test_file(self, test_cases: List[Any]) -> Tuple[Path, bool]:
+        """获取 pytest 测试文件，用例内容未变化时直接复用缓存中的模块，返回 (路径, 是否命中缓存)"""
+        key = ModuleCache.make_key("api", test_cases, CACHE_KEY_FIELDS, TEMPLATE_HASH)
+        return self.module_cache.get_or_create(key, "test_api.py", lambda: self.render_test_module(test_cases))
+
+    def render_test_module(self, test_cases: List[Any]) -> str:
+        """生成 pytest 测试模块源码"""
         test_content = '''
 import pytest
 import requests
 import allure
 import json
+import os
+from requests.adapters import HTTPAdapter
 from typing import Dict, Any
 
+# 所有用例共享同一个 Session，按 scheme/host/port 复用长连接
+_pool_size = int(os.environ.get("API_POOL_SIZE", "10"))
+_session = requests.Session()
+_adapter = HTTPAdapter(pool_connections=_pool_size, pool_maxsize=_pool_size)
+_session.mount("http://", _adapter)
+_session.mount("https://", _adapter)
+if os.environ.get("API_KEEPALIVE", "true") != "true":
+    _session.headers["Connection"] = "close"
+
+
+@pytest.fixture(scope="session", autouse=True)
+def connection_stats():
+    yield
+    # 运行结束后汇总每个主机连接池的新建连接数和请求数
+    hosts = []
+    pools = _adapter.poolmanager.pools
+    for key in list(pools.keys()):
+        pool = pools[key]
+        hosts.append({
+            "host": f"{pool.scheme}://{pool.host}:{pool.port}",
+            "requests": pool.num_requests,
+            "new_connections": pool.num_connections,
+            "reused_connections": max(0, pool.num_requests - pool.num_connections)
+        })
+    stats = {
+        "pool_size": _pool_size,
+        "keepalive": os.environ.get("API_KEEPALIVE", "true") == "true",
+        "http2": False,
+        "requests": sum(h["requests"] for h in hosts),
+        "new_connections": sum(h["new_connections"] for h in hosts),
+        "reused_connections": sum(h["reused_connections"] for h in hosts),
+        "handshake_time": None,
+        "hosts": hosts
+    }
+    stats_file = os.environ.get("API_STATS_FILE")
+    if stats_file:
+        with open(stats_file, "w", encoding="utf-8") as f:
+            json.dump(stats, f, indent=2)
+
 '''
 
         for i, case in enumerate(test_cases):
             test_content += f'''
 @allure.feature('API Tests')
 @allure.story('{case.case_name}')
+@allure.id('{case.id}')
 def test_case_{i}():
     """Test case: {case.case_name}"""
     with allure.step('Send {case.method} request to {case.url}'):
@@ -82,7 +320,7 @@ def test_case_{i}():
         json_data = {case.body or {} }
 
         # 发送请求
-        response = requests.request(
+        response = _session.request(
             method='{case.method}',
             url='{case.url}',
             headers=headers,
@@ -115,7 +353,4 @@ def test_case_{i}():
 
 '''
 
-        with open(test_file, 'w', encoding='utf-8') as f:
-            f.write(test_content)
-
-        return test_file
\ No newline at end of file
+        return test_content
\ No newline at end of file
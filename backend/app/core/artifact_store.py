@@ -0,0 +1,189 @@
+import gzip
+import hashlib
+import io
+import json
+import os
+import shutil
+import tempfile
+from pathlib import Path
+from typing import BinaryIO, Dict, Iterator, Optional, Tuple
+
+try:
+    import zstandard
+except ImportError:  # 未安装时退回 gzip
+    zstandard = None
+
+try:
+    from PIL import Image
+except ImportError:  # 未安装时截图按原样存储
+    Image = None
+
+
+ARTIFACT_STORE_DIR = os.getenv("ARTIFACT_STORE_DIR", "artifact_store")
+# 报告目录中记录附件与存储内容对应关系的清单文件
+MANIFEST_NAME = "artifacts.json"
+# 压缩后至少节省这个比例才保存压缩版本，已压缩过的格式（如 mp4）直接按原样存储
+MIN_COMPRESSION_SAVING = 0.1
+ZSTD_LEVEL = 10
+
+# png 为 Pillow 无损重新压缩后的截图：像素不变，但字节与原文件不同（大小见 stored_size，不再与 checksum 对应）
+ENCODINGS = ("zst", "gz", "png", "raw")
+
+
+def file_checksum(path) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ArtifactStore:
+    """按内容哈希存储附件：相同内容只存一份，存储时按类型压缩
+
+    - 截图（PNG）安装了 Pillow 时做无损重新压缩，像素不变，以 png 编码存储
+    - 其他文件（trace.zip、日志等）安装了 zstandard 时用 zstd 压缩，否则用 gzip
+    blob 路径为 <root>/<hash 前两位>/<hash>.<encoding>，哈希按原始内容计算。
+    """
+
+    def __init__(self, root: str = ARTIFACT_STORE_DIR):
+        self.root = Path(root)
+        self.root.mkdir(parents=True, exist_ok=True)
+
+    def _blob_path(self, checksum: str, encoding: str) -> Path:
+        return self.root / checksum[:2] / f"{checksum}.{encoding}"
+
+    def find(self, checksum: str) -> Optional[Tuple[Path, str]]:
+        for encoding in ENCODINGS:
+            path = self._blob_path(checksum, encoding)
+            if path.exists():
+                return path, encoding
+        return None
+
+    def put(self, path, content_type: Optional[str] = None) -> Dict[str, object]:
+        """存入一个文件，返回 checksum / encoding / size / stored_size / deduplicated"""
+        path = Path(path)
+        checksum = file_checksum(path)
+        size = path.stat().st_size
+        existing = self.find(checksum)
+        if existing:
+            blob, encoding = existing
+            # 刷新修改时间，清理孤立 blob 时不会删掉刚被新运行引用、索引还未提交的内容
+            os.utime(blob)
+            return {"checksum": checksum, "encoding": encoding, "size": size,
+                    "stored_size": blob.stat().st_size, "deduplicated": True}
+
+        data, encoding = self._encode(path, content_type)
+        blob = self._blob_path(checksum, encoding)
+        blob.parent.mkdir(parents=True, exist_ok=True)
+        # 先写临时文件再原子替换，并发写入同一内容时不会留下半截文件；
+        # 任务在同一进程的多个线程中执行，临时文件名必须每次唯一
+        fd, tmp_blob = tempfile.mkstemp(dir=blob.parent, prefix=f".{blob.name}.", suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_blob, blob)
+        except BaseException:
+            Path(tmp_blob).unlink(missing_ok=True)
+            raise
+        return {"checksum": checksum, "encoding": encoding, "size": size,
+                "stored_size": len(data), "deduplicated": False}
+
+    @staticmethod
+    def _encode(path: Path, content_type: Optional[str]) -> Tuple[bytes, str]:
+        raw = path.read_bytes()
+        if (content_type or "").startswith("image/"):
+            if Image is not None and content_type == "image/png":
+                try:
+                    buffer = io.BytesIO()
+                    with Image.open(path) as image:
+                        image.save(buffer, "PNG", optimize=True)
+                    if buffer.tell() < len(raw):
+                        return buffer.getvalue(), "png"
+                except Exception:
+                    pass
+            return raw, "raw"
+
+        if zstandard is not None:
+            data, encoding = zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(raw), "zst"
+        else:
+            data, encoding = gzip.compress(raw, compresslevel=6), "gz"
+        if len(data) <= len(raw) * (1 - MIN_COMPRESSION_SAVING):
+            return data, encoding
+        return raw, "raw"
+
+    def open(self, checksum: str) -> BinaryIO:
+        """以解压后的内容打开 blob"""
+        found = self.find(checksum)
+        if found is None:
+            raise FileNotFoundError(checksum)
+        blob, encoding = found
+        if encoding == "zst":
+            if zstandard is None:
+                raise RuntimeError("zstandard is required to read this artifact")
+            return zstandard.ZstdDecompressor().stream_reader(open(blob, "rb"), closefd=True)
+        if encoding == "gz":
+            return gzip.open(blob, "rb")
+        return open(blob, "rb")
+
+    def served_size(self, checksum: str, size: int) -> Optional[int]:
+        """open() 返回内容的字节数：压缩存储的解压后即原始大小 size，按原样或重新压缩存储的为 blob 大小"""
+        found = self.find(checksum)
+        if found is None:
+            return None
+        blob, encoding = found
+        return size if encoding in ("zst", "gz") else blob.stat().st_size
+
+    def restore(self, checksum: str, dest) -> Path:
+        dest = Path(dest)
+        dest.parent.mkdir(parents=True, exist_ok=True)
+        with self.open(checksum) as src, open(dest, "wb") as dst:
+            shutil.copyfileobj(src, dst)
+        return dest
+
+    def iter_blobs(self) -> Iterator[Tuple[str, Path]]:
+        """遍历存储中的 blob，返回 (checksum, 路径)"""
+        for blob in self.root.glob("*/*"):
+            if blob.is_file() and not blob.name.startswith("."):
+                yield blob.name.split(".", 1)[0], blob
+
+    def remove(self, checksum: str) -> int:
+        """删除 blob，返回释放的字节数"""
+        found = self.find(checksum)
+        if found is None:
+            return 0
+        size = found[0].stat().st_size
+        found[0].unlink()
+        return size
+
+
+def read_manifest(report_dir) -> Dict[str, Dict[str, object]]:
+    try:
+        with open(Path(report_dir) / MANIFEST_NAME, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def write_manifest(report_dir, manifest: Dict[str, Dict[str, object]]):
+    with open(Path(report_dir) / MANIFEST_NAME, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=2)
+
+
+def restore_report_files(report_dir, store: Optional[ArtifactStore] = None):
+    """把清单中的附件从存储中还原到报告目录（生成 allure HTML 报告前使用），返回还原的文件列表"""
+    report_dir = Path(report_dir)
+    manifest = read_manifest(report_dir)
+    if not manifest:
+        return []
+    store = store or ArtifactStore()
+    restored = []
+    for relative, entry in manifest.items():
+        dest = report_dir / relative
+        if dest.exists():
+            continue
+        try:
+            restored.append(store.restore(entry["checksum"], dest))
+        except FileNotFoundError:
+            continue
+    return restored
@@ -0,0 +1,119 @@
+import json
+import mimetypes
+import os
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.models import ReportArtifact
+from app.core.artifact_store import ArtifactStore, read_manifest, write_manifest, MANIFEST_NAME
+from app.utils.file_utils import REPORT_DIR_MARKER
+
+
+REPORTS_ROOT = Path("reports")
+ARTIFACT_TYPES = ("screenshot", "trace", "video", "other")
+# 报告目录中不属于附件的文件
+METADATA_FILES = ("summary.json", MANIFEST_NAME, REPORT_DIR_MARKER)
+METADATA_PREFIXES = ("run.log", "connection_stats")
+
+
+def classify(name: str, content_type: Optional[str]) -> str:
+    content_type = content_type or mimetypes.guess_type(name)[0] or ""
+    if content_type.startswith("image/"):
+        return "screenshot"
+    if content_type.startswith("video/"):
+        return "video"
+    if name.endswith(".zip") and "trace" in name:
+        return "trace"
+    return "other"
+
+
+def _result_attachments(item: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """用例及其各层步骤中的附件"""
+    attachments = list(item.get("attachments") or [])
+    for step in item.get("steps") or []:
+        attachments.extend(_result_attachments(step))
+    return attachments
+
+
+def collect_artifacts(report_dir) -> List[Dict[str, Any]]:
+    """收集一次运行的附件：allure-results 中的附件按结果文件的 as_id 标签对应到用例，
+    报告目录中其余的截图、录制文件等没有用例信息"""
+    report_dir = Path(report_dir)
+    results_dir = report_dir / "allure-results"
+    artifacts = []
+    seen = set()
+
+    for result_file in sorted(results_dir.glob("*-result.json")) if results_dir.is_dir() else []:
+        try:
+            with open(result_file, encoding="utf-8") as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            continue
+        labels = {label.get("name"): label.get("value") for label in data.get("labels", [])}
+        case_id = labels.get("as_id")
+        for attachment in _result_attachments(data):
+            path = results_dir / attachment.get("source", "")
+            if not attachment.get("source") or not path.is_file() or path in seen:
+                continue
+            seen.add(path)
+            artifacts.append({
+                "case_id": int(case_id) if case_id and str(case_id).isdigit() else None,
+                "name": attachment.get("name") or path.name,
+                "path": path,
+                "content_type": attachment.get("type")
+            })
+
+    for path in sorted(report_dir.rglob("*")):
+        relative = path.relative_to(report_dir)
+        if not path.is_file() or relative.parts[0] in ("allure-results", "allure-report"):
+            continue
+        if path.name in METADATA_FILES or path.name.startswith(METADATA_PREFIXES):
+            continue
+        artifacts.append({"case_id": None, "name": path.name, "path": path, "content_type": None})
+
+    return artifacts
+
+
+def build_artifact_index(db: Session, report_id: int, report_dir, store: Optional[ArtifactStore] = None) -> int:
+    """运行结束后建立附件索引（路径、类型、用例、大小、校验和），返回索引条数
+
+    附件按内容哈希存入附件存储（相同截图只存一份，trace 等压缩存储），报告目录中的原文件删除，
+    改由 artifacts.json 清单记录相对路径到存储内容的对应关系；生成 allure HTML 报告时再按清单还原。
+    """
+    report_dir = Path(report_dir)
+    store = store or ArtifactStore()
+    manifest = read_manifest(report_dir)
+    rows = []
+    stored_paths = []
+    for artifact in collect_artifacts(report_dir):
+        path = artifact["path"]
+        content_type = artifact["content_type"] or mimetypes.guess_type(path.name)[0]
+        stored = store.put(path, content_type)
+        manifest[str(path.relative_to(report_dir))] = {
+            "checksum": stored["checksum"], "encoding": stored["encoding"], "size": stored["size"]
+        }
+        stored_paths.append(path)
+        rows.append(ReportArtifact(
+            report_id=report_id,
+            case_id=artifact["case_id"],
+            name=artifact["name"],
+            path=os.path.relpath(path, REPORTS_ROOT),
+            artifact_type=classify(artifact["name"], content_type),
+            content_type=content_type,
+            size=stored["size"],
+            stored_size=stored["stored_size"],
+            encoding=stored["encoding"],
+            checksum=stored["checksum"]
+        ))
+
+    # 清单和索引都写入后再删除原文件：任一步失败时文件仍在报告目录中，孤立内容清理也不会删掉引用中的存储
+    write_manifest(report_dir, manifest)
+    db.query(ReportArtifact).filter(ReportArtifact.report_id == report_id).delete(synchronize_session=False)
+    db.add_all(rows)
+    db.commit()
+
+    for path in stored_paths:
+        path.unlink(missing_ok=True)
+    return len(rows)
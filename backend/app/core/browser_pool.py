@@ -0,0 +1,110 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from typing import Any, Dict, List, Optional
+
+from playwright.async_api import async_playwright, Browser, BrowserContext
+
+
+DEFAULT_POOL_SIZE = int(os.getenv("UI_BROWSER_POOL_SIZE", "2"))
+DEFAULT_RECYCLE_AFTER = int(os.getenv("UI_BROWSER_RECYCLE_AFTER", "50"))
+
+
+class _PooledBrowser:
+    def __init__(self, browser: Browser):
+        self.browser = browser
+        self.active = 0
+        self.used = 0
+
+
+class BrowserPool:
+    """预热的 Chromium 浏览器池：每个用例从池中取一个浏览器并新建隔离的 BrowserContext
+
+    浏览器只在池启动时启动一次，用例之间只创建/关闭 context；每个浏览器累计创建
+    recycle_after 个 context 后，在空闲时关闭并重新启动，避免长时间运行导致内存增长。
+    """
+
+    def __init__(self, size: int = DEFAULT_POOL_SIZE, recycle_after: int = DEFAULT_RECYCLE_AFTER,
+                 headless: bool = True, launch_options: Optional[Dict[str, Any]] = None):
+        self.size = max(1, size)
+        self.recycle_after = max(1, recycle_after)
+        self.launch_options = {"headless": headless, **(launch_options or {})}
+        self._playwright = None
+        self._browsers: List[_PooledBrowser] = []
+        self._available: Optional[asyncio.Queue] = None
+        self.stats = {"launched": 0, "recycled": 0, "contexts": 0}
+
+    async def start(self):
+        self._playwright = await async_playwright().start()
+        self._available = asyncio.Queue()
+        for _ in range(self.size):
+            pooled = _PooledBrowser(await self._launch())
+            self._browsers.append(pooled)
+            self._available.put_nowait(pooled)
+        return self
+
+    async def close(self):
+        for pooled in self._browsers:
+            try:
+                await pooled.browser.close()
+            except Exception:
+                pass
+        self._browsers.clear()
+        if self._playwright is not None:
+            await self._playwright.stop()
+            self._playwright = None
+
+    async def __aenter__(self):
+        return await self.start()
+
+    async def __aexit__(self, *exc):
+        await self.close()
+
+    async def _launch(self) -> Browser:
+        self.stats["launched"] += 1
+        return await self._playwright.chromium.launch(**self.launch_options)
+
+    @asynccontextmanager
+    async def context(self, **context_options) -> BrowserContext:
+        """取出一个浏览器并创建新的 context，退出时关闭 context 并把浏览器放回池中
+
+        同一个浏览器可以同时承载多个 context：取出后立即放回队列，
+        队列只用于在浏览器之间轮转分配，以及在回收期间暂停分配。
+        """
+        pooled = await self._available.get()
+        pooled.active += 1
+        pooled.used += 1
+        self.stats["contexts"] += 1
+        recycling = pooled.used >= self.recycle_after
+        if not recycling:
+            self._available.put_nowait(pooled)
+
+        context = None
+        try:
+            context = await pooled.browser.new_context(**context_options)
+            yield context
+        finally:
+            if context is not None:
+                try:
+                    await context.close()
+                except Exception:
+                    pass
+            pooled.active -= 1
+            if recycling:
+                await self._recycle(pooled)
+
+    async def _recycle(self, pooled: _PooledBrowser):
+        """浏览器达到回收次数后，等它上面的 context 全部关闭再重启"""
+        while pooled.active > 0:
+            await asyncio.sleep(0.05)
+        try:
+            await pooled.browser.close()
+        except Exception:
+            pass
+        try:
+            pooled.browser = await self._launch()
+            pooled.used = 0
+            self.stats["recycled"] += 1
+        finally:
+            # 重启失败也要放回池中，否则等待该浏览器的用例会一直阻塞
+            self._available.put_nowait(pooled)
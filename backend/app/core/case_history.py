@@ -0,0 +1,118 @@
+from typing import List, Dict, Any, Iterable, Optional
+from sqlalchemy.orm import Session
+from app.models import CaseRunHistory
+from app.core.module_cache import fingerprint
+from app.core.api_test_runner import CACHE_KEY_FIELDS as API_CASE_FIELDS
+from app.core.ui_test_runner import CACHE_KEY_FIELDS as UI_CASE_FIELDS
+
+
+RUN_MODES = ("all", "failed_or_changed")
+
+CASE_FIELDS = {"api": API_CASE_FIELDS, "ui": UI_CASE_FIELDS}
+
+
+def content_hashes(case_type: str, test_cases: List[Any]) -> Dict[int, str]:
+    """计算每个用例的内容哈希，与生成模块缓存使用相同的字段"""
+    return {case.id: fingerprint(case, CASE_FIELDS[case_type]) for case in test_cases}
+
+
+def record_case_runs(db: Session, case_type: str, project_id: int, results: Iterable[Dict[str, Any]],
+                     report_id: Optional[int] = None, hashes: Optional[Dict[int, str]] = None) -> int:
+    """把一次运行中每个用例的状态、耗时和内容哈希写入历史表，返回写入条数"""
+    hashes = hashes or {}
+    rows = [
+        CaseRunHistory(
+            case_type=case_type,
+            case_id=result["case_id"],
+            project_id=project_id,
+            report_id=report_id,
+            status=result.get("status"),
+            duration=result.get("duration"),
+            content_hash=hashes.get(result["case_id"])
+        )
+        for result in results
+        if result.get("case_id") is not None
+    ]
+    if rows:
+        db.add_all(rows)
+        db.commit()
+    return len(rows)
+
+
+def select_failed_or_changed(db: Session, case_type: str, test_cases: List[Any]) -> List[Any]:
+    """只保留上次运行未通过、从未运行过或运行后内容被修改的用例"""
+    if not test_cases:
+        return []
+
+    rows = db.query(CaseRunHistory.case_id, CaseRunHistory.status, CaseRunHistory.content_hash).filter(
+        CaseRunHistory.case_type == case_type,
+        CaseRunHistory.case_id.in_([case.id for case in test_cases])
+    ).order_by(CaseRunHistory.id.desc()).all()
+
+    # 每个用例只看最近一次运行
+    last_runs = {}
+    for case_id, status, content_hash in rows:
+        last_runs.setdefault(case_id, (status, content_hash))
+
+    hashes = content_hashes(case_type, test_cases)
+    selected = []
+    for case in test_cases:
+        last_run = last_runs.get(case.id)
+        if last_run is None or last_run[0] != "passed" or last_run[1] != hashes[case.id]:
+            selected.append(case)
+    return selected
+
+
+def load_case_durations(db: Session, case_type: str, case_ids: List[int], window: int = 10) -> Dict[int, float]:
+    """取每个用例最近 window 次运行的平均耗时，供按耗时分片使用"""
+    if not case_ids:
+        return {}
+
+    rows = db.query(CaseRunHistory.case_id, CaseRunHistory.duration).filter(
+        CaseRunHistory.case_type == case_type,
+        CaseRunHistory.case_id.in_(case_ids),
+        CaseRunHistory.duration.isnot(None)
+    ).order_by(CaseRunHistory.id.desc()).all()
+
+    samples: Dict[int, List[float]] = {}
+    for case_id, duration in rows:
+        values = samples.setdefault(case_id, [])
+        if len(values) < window:
+            values.append(duration)
+
+    return {case_id: sum(values) / len(values) for case_id, values in samples.items()}
+
+
+def summarize_slowest(db: Session, case_type: str, project_id: int, window: int = 10,
+                      limit: int = 20, max_rows: int = 5000) -> List[Dict[str, Any]]:
+    """按最近平均耗时排序的慢用例列表，并与再往前一个窗口对比给出耗时趋势"""
+    rows = db.query(CaseRunHistory).filter(
+        CaseRunHistory.case_type == case_type,
+        CaseRunHistory.project_id == project_id,
+        CaseRunHistory.duration.isnot(None)
+    ).order_by(CaseRunHistory.id.desc()).limit(max_rows).all()
+
+    grouped: Dict[int, List[CaseRunHistory]] = {}
+    for row in rows:
+        grouped.setdefault(row.case_id, []).append(row)
+
+    summary = []
+    for case_id, runs in grouped.items():
+        recent = [r.duration for r in runs[:window]]
+        previous = [r.duration for r in runs[window:window * 2]]
+        recent_avg = sum(recent) / len(recent)
+        previous_avg = sum(previous) / len(previous) if previous else None
+        summary.append({
+            "case_id": case_id,
+            "runs": len(runs),
+            "last_status": runs[0].status,
+            "last_duration": runs[0].duration,
+            "avg_duration": round(recent_avg, 2),
+            "max_duration": max(recent),
+            "previous_avg_duration": round(previous_avg, 2) if previous_avg is not None else None,
+            # 相对上一个窗口的变化比例，正数表示变慢
+            "trend": round((recent_avg - previous_avg) / previous_avg, 4) if previous_avg else None
+        })
+
+    summary.sort(key=lambda item: item["avg_duration"], reverse=True)
+    return summary[:limit]
@@ -0,0 +1,101 @@
+import time
+from typing import Dict, Any, Tuple
+from urllib.parse import urlsplit
+
+import httpx
+
+
+DEFAULT_PORTS = {"http": 80, "https": 443}
+
+
+class HostConnectionPool:
+    """运行级连接池：按 (scheme, host, port) 为每个目标主机维护一个长连接客户端"""
+
+    def __init__(self, pool_size: int = 10, keepalive: bool = True, http2: bool = False, timeout: float = 30):
+        self.pool_size = max(1, pool_size)
+        self.keepalive = keepalive
+        self.http2 = http2
+        self.timeout = timeout
+        self._clients: Dict[Tuple[str, str, int], httpx.AsyncClient] = {}
+        self._stats: Dict[Tuple[str, str, int], Dict[str, Any]] = {}
+
+    @staticmethod
+    def host_key(url: str) -> Tuple[str, str, int]:
+        parts = urlsplit(url)
+        scheme = parts.scheme.lower() or "http"
+        return scheme, (parts.hostname or "").lower(), parts.port or DEFAULT_PORTS.get(scheme, 80)
+
+    def _client_for(self, key: Tuple[str, str, int]) -> httpx.AsyncClient:
+        client = self._clients.get(key)
+        if client is None:
+            limits = httpx.Limits(
+                max_connections=self.pool_size,
+                # 关闭 keep-alive 时不保留空闲连接，每个请求都重新建连
+                max_keepalive_connections=self.pool_size if self.keepalive else 0
+            )
+            client = httpx.AsyncClient(limits=limits, http2=self.http2, timeout=self.timeout)
+            self._clients[key] = client
+            self._stats[key] = {
+                "host": f"{key[0]}://{key[1]}:{key[2]}",
+                "requests": 0,
+                "new_connections": 0,
+                "handshake_time": 0.0
+            }
+        return client
+
+    async def request(self, method: str, url: str, **kwargs) -> httpx.Response:
+        key = self.host_key(url)
+        client = self._client_for(key)
+        stats = self._stats[key]
+        stats["requests"] += 1
+
+        # 通过 httpcore 的 trace 事件统计新建连接数和 TCP/TLS 握手耗时
+        started = {}
+
+        async def trace(event_name, info):
+            if event_name.endswith(".started"):
+                started[event_name[:-len(".started")]] = time.perf_counter()
+            elif event_name.endswith(".complete"):
+                step = event_name[:-len(".complete")]
+                if step == "connection.connect_tcp":
+                    stats["new_connections"] += 1
+                if step in ("connection.connect_tcp", "connection.start_tls") and step in started:
+                    stats["handshake_time"] += (time.perf_counter() - started[step]) * 1000
+
+        extensions = dict(kwargs.pop("extensions", None) or {})
+        extensions["trace"] = trace
+        return await client.request(method, url, extensions=extensions, **kwargs)
+
+    def get_stats(self) -> Dict[str, Any]:
+        """返回本次运行的连接复用与握手统计，握手耗时单位为毫秒"""
+        hosts = []
+        for stats in self._stats.values():
+            hosts.append({
+                **stats,
+                "reused_connections": max(0, stats["requests"] - stats["new_connections"]),
+                "handshake_time": round(stats["handshake_time"], 2)
+            })
+
+        total_requests = sum(h["requests"] for h in hosts)
+        total_new = sum(h["new_connections"] for h in hosts)
+        return {
+            "pool_size": self.pool_size,
+            "keepalive": self.keepalive,
+            "http2": self.http2,
+            "requests": total_requests,
+            "new_connections": total_new,
+            "reused_connections": max(0, total_requests - total_new),
+            "handshake_time": round(sum(h["handshake_time"] for h in hosts), 2),
+            "hosts": hosts
+        }
+
+    async def aclose(self):
+        for client in self._clients.values():
+            await client.aclose()
+        self._clients.clear()
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
@@ -0,0 +1,288 @@
+import os
+import socket
+import threading
+import traceback
+import uuid
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import Job, TestReports
+from app.core.output_stream import terminate_stream, discard_termination
+
+
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_PROJECT_CONCURRENCY = int(os.getenv("JOB_PROJECT_CONCURRENCY", "2"))
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1"))
+# 执行中任务的心跳间隔（秒），超过 JOB_STALE_AFTER 秒没有心跳的任务视为所属进程已退出，重新放回队列
+JOB_HEARTBEAT_INTERVAL = float(os.getenv("JOB_HEARTBEAT_INTERVAL", "15"))
+JOB_STALE_AFTER = float(os.getenv("JOB_STALE_AFTER", "60"))
+
+FINISHED_STATUSES = ("completed", "failed", "cancelled")
+
+# 任务类型 -> 处理函数 handler(job, db)，每个任务使用自己的数据库会话
+_handlers: Dict[str, Callable[[Job, Session], None]] = {}
+
+
+def register_handler(job_type: str, handler: Callable[[Job, Session], None]):
+    _handlers[job_type] = handler
+
+
+def enqueue(db: Session, job_type: str, project_id: int, payload: dict,
+            report_id: Optional[int] = None, priority: int = 0) -> Job:
+    """把任务写入队列表，由工作线程按优先级取出执行"""
+    job = Job(
+        job_type=job_type,
+        project_id=project_id,
+        report_id=report_id,
+        payload=payload,
+        priority=priority,
+        status="queued"
+    )
+    db.add(job)
+    db.commit()
+    db.refresh(job)
+    if _pool is not None:
+        _pool.wake()
+    return job
+
+
+def cancel(db: Session, job: Job) -> Job:
+    """取消任务：排队中的直接取消，运行中的终止其子进程并在结束后标记为 cancelled"""
+    if job.status == "queued":
+        updated = db.query(Job).filter(Job.id == job.id, Job.status == "queued").update(
+            {"status": "cancelled", "finished_at": datetime.now()}, synchronize_session=False
+        )
+        if updated:
+            _set_report_status(db, job.report_id, "cancelled", finished_at=datetime.now())
+        db.commit()
+    elif job.status == "running":
+        db.query(Job).filter(Job.id == job.id, Job.status == "running").update(
+            {"status": "cancelling"}, synchronize_session=False
+        )
+        db.commit()
+        if job.report_id is not None:
+            terminate_stream(job.report_id)
+
+    db.refresh(job)
+    return job
+
+
+def save_report_path(report_id: Optional[int], report_path: str):
+    """运行一创建报告目录就记录 report_path（使用独立的会话），运行失败或被取消时日志和附件仍能通过报告找到"""
+    if report_id is None:
+        return
+    db = SessionLocal()
+    try:
+        db.query(TestReports).filter(TestReports.id == report_id).update(
+            {"report_path": report_path}, synchronize_session=False
+        )
+        db.commit()
+    finally:
+        db.close()
+
+
+def _set_report_status(db: Session, report_id: Optional[int], status: str, **fields):
+    if report_id is None:
+        return
+    report = db.query(TestReports).filter(TestReports.id == report_id).first()
+    if report:
+        report.status = status
+        for name, value in fields.items():
+            setattr(report, name, value)
+
+
+class JobWorkerPool:
+    """本地工作线程池：从 job_queue 表中领取任务，限制全局并发和单个项目的并发
+
+    领取的任务记录本进程的 worker_id，执行期间由心跳线程定时刷新 heartbeat_at。多个服务进程（多个 uvicorn worker、
+    滚动重启）共用一张任务表时，只有心跳超时的任务才会被放回队列，不会把其他进程仍在执行的任务重复执行。
+    """
+
+    def __init__(self, workers: int = JOB_WORKERS, project_concurrency: int = JOB_PROJECT_CONCURRENCY,
+                 poll_interval: float = JOB_POLL_INTERVAL, heartbeat_interval: float = JOB_HEARTBEAT_INTERVAL,
+                 stale_after: float = JOB_STALE_AFTER):
+        self.workers = max(1, workers)
+        self.project_concurrency = max(1, project_concurrency)
+        self.poll_interval = poll_interval
+        self.heartbeat_interval = heartbeat_interval
+        self.stale_after = max(stale_after, heartbeat_interval * 2)
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}:{uuid.uuid4().hex[:8]}"
+        self._running = set()
+        self._running_lock = threading.Lock()
+        self._threads = []
+        self._stop = threading.Event()
+        self._wakeup = threading.Event()
+        # 领取任务时串行化，保证项目并发上限的检查和领取是原子的
+        self._claim_lock = threading.Lock()
+
+    def start(self):
+        self._recover()
+        for index in range(self.workers):
+            thread = threading.Thread(target=self._work, name=f"job-worker-{index}", daemon=True)
+            thread.start()
+            self._threads.append(thread)
+        thread = threading.Thread(target=self._heartbeat_loop, name="job-heartbeat", daemon=True)
+        thread.start()
+        self._threads.append(thread)
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        self._wakeup.set()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def wake(self):
+        self._wakeup.set()
+
+    def _recover(self):
+        """把心跳超时（所属进程已退出）的未完成任务重新放回队列，运行中被取消的直接标记为 cancelled"""
+        db = SessionLocal()
+        try:
+            stale_before = datetime.now() - timedelta(seconds=self.stale_after)
+            stale = (Job.heartbeat_at.is_(None)) | (Job.heartbeat_at < stale_before)
+            jobs = db.query(Job).filter(Job.status.in_(("running", "cancelling")), stale).all()
+            recovered = 0
+            for job in jobs:
+                status = "queued" if job.status == "running" else "cancelled"
+                # 条件更新，其他进程同时恢复或任务刚刷新心跳时不会重复处理
+                updated = db.query(Job).filter(Job.id == job.id, Job.status == job.status, stale).update(
+                    {"status": status, "worker_id": None}, synchronize_session=False
+                )
+                if updated:
+                    _set_report_status(db, job.report_id, status)
+                    recovered += 1
+            db.commit()
+            if recovered:
+                print(f"🔁 恢复 {recovered} 个心跳超时的任务")
+        finally:
+            db.close()
+
+    def _heartbeat_loop(self):
+        while not self._stop.wait(self.heartbeat_interval):
+            try:
+                self._heartbeat()
+                self._recover()
+            except Exception as e:
+                print(f"✗ 任务心跳失败: {e}")
+
+    def _heartbeat(self):
+        with self._running_lock:
+            job_ids = list(self._running)
+        if not job_ids:
+            return
+        db = SessionLocal()
+        try:
+            db.query(Job).filter(Job.id.in_(job_ids), Job.worker_id == self.worker_id).update(
+                {"heartbeat_at": datetime.now()}, synchronize_session=False
+            )
+            db.commit()
+        finally:
+            db.close()
+
+    def _work(self):
+        while not self._stop.is_set():
+            job_id = None
+            try:
+                job_id = self._claim()
+            except Exception as e:
+                print(f"✗ 领取任务失败: {e}")
+
+            if job_id is None:
+                self._wakeup.wait(self.poll_interval)
+                self._wakeup.clear()
+                continue
+            self._run(job_id)
+
+    def _claim(self) -> Optional[int]:
+        db = SessionLocal()
+        try:
+            with self._claim_lock:
+                running = dict(db.query(Job.project_id, func.count(Job.id)).filter(
+                    Job.status.in_(("running", "cancelling"))
+                ).group_by(Job.project_id).all())
+
+                candidates = db.query(Job).filter(Job.status == "queued").order_by(
+                    Job.priority.desc(), Job.id
+                ).limit(50).all()
+                for job in candidates:
+                    if running.get(job.project_id, 0) >= self.project_concurrency:
+                        continue
+                    # 条件更新，多个服务进程同时领取时只有一个会成功
+                    claimed = db.query(Job).filter(Job.id == job.id, Job.status == "queued").update(
+                        {"status": "running", "started_at": datetime.now(), "worker_id": self.worker_id,
+                         "heartbeat_at": datetime.now()}, synchronize_session=False
+                    )
+                    if claimed:
+                        _set_report_status(db, job.report_id, "running", started_at=datetime.now())
+                        db.commit()
+                        with self._running_lock:
+                            self._running.add(job.id)
+                        return job.id
+                    db.rollback()
+                return None
+        finally:
+            db.close()
+
+    def _run(self, job_id: int):
+        db = SessionLocal()
+        try:
+            job = db.query(Job).filter(Job.id == job_id).first()
+            handler = _handlers.get(job.job_type)
+            if handler is None:
+                raise ValueError(f"No handler registered for job type '{job.job_type}'")
+            handler(job, db)
+            self._finish(db, job_id, "completed")
+        except Exception as e:
+            db.rollback()
+            traceback.print_exc()
+            self._finish(db, job_id, "failed", f"{type(e).__name__}: {e}")
+        finally:
+            db.close()
+            with self._running_lock:
+                self._running.discard(job_id)
+
+    @staticmethod
+    def _finish(db: Session, job_id: int, status: str, error: str = None):
+        job = db.query(Job).filter(Job.id == job_id).first()
+        if job is None:
+            return
+        db.refresh(job)
+        finished_at = datetime.now()
+        if job.status == "cancelling":
+            # 运行中被取消：不论处理函数结果如何，最终状态都是 cancelled
+            status = "cancelled"
+            _set_report_status(db, job.report_id, "cancelled", finished_at=finished_at)
+        elif status == "failed":
+            _set_report_status(db, job.report_id, "failed", finished_at=finished_at)
+        else:
+            report = db.query(TestReports).filter(TestReports.id == job.report_id).first()
+            if report:
+                report.finished_at = finished_at
+        job.status = status
+        job.error = error
+        job.finished_at = finished_at
+        db.commit()
+        discard_termination(job.report_id)
+
+
+_pool: Optional[JobWorkerPool] = None
+
+
+def start_workers() -> JobWorkerPool:
+    global _pool
+    if _pool is None:
+        _pool = JobWorkerPool()
+        _pool.start()
+        print(f"✓ 任务队列已启动: {_pool.workers} 个工作线程，单项目并发上限 {_pool.project_concurrency}")
+    return _pool
+
+
+def stop_workers():
+    global _pool
+    if _pool is not None:
+        _pool.stop()
+        _pool = None
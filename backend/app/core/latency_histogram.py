@@ -0,0 +1,211 @@
+import math
+import struct
+import zlib
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 本模块只依赖标准库：Locust 压测时会被复制到 locustfile 所在目录，由 locustfile 中的统计插件直接导入
+
+
+# 有效数字位数，2 表示每个桶的相对误差不超过 1%
+SIGNIFICANT_DIGITS = 2
+# 记录的最小单位：延迟以毫秒传入，按微秒取整后记录
+UNITS_PER_MS = 1000
+HISTOGRAM_FILE = "latency.hlog"
+DEFAULT_PERCENTILES = (50, 90, 95, 99, 99.9)
+
+_FILE_MAGIC = b"HLOG1\n"
+# 日志中每条记录的头：窗口开始时间（秒）、窗口长度（秒）、名称长度、数据长度
+_RECORD_HEADER = struct.Struct("<ddHI")
+# 编码后的直方图头：有效数字、记录数、最小值、最大值、总和（微秒）
+_HISTOGRAM_HEADER = struct.Struct("<BQQQQ")
+
+
+def _write_varint(value: int, out: bytearray):
+    while value >= 0x80:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+
+
+def _read_varint(data: bytes, pos: int) -> Tuple[int, int]:
+    value, shift = 0, 0
+    while True:
+        byte = data[pos]
+        pos += 1
+        value |= (byte & 0x7F) << shift
+        if byte < 0x80:
+            return value, pos
+        shift += 7
+
+
+class LatencyHistogram:
+    """HDR 风格的对数-线性延迟直方图
+
+    小于 sub_bucket_count 的值每个值一个桶；更大的值按 2 的幂分段，每段再线性分为 sub_bucket_count/2 个桶，
+    所以任何值的误差都不超过 10^-significant_digits，桶数只随最大值的对数增长。只保存非空桶，
+    两个直方图相加（merge）即得到合并后的分布，任意百分位都可以从合并结果计算，不需要原始样本。
+    """
+
+    def __init__(self, significant_digits: int = SIGNIFICANT_DIGITS):
+        if not 1 <= significant_digits <= 5:
+            raise ValueError("significant_digits must be between 1 and 5")
+        self.significant_digits = significant_digits
+        self._sub_bits = math.ceil(math.log2(2 * 10 ** significant_digits))
+        self._sub_count = 1 << self._sub_bits
+        self._half_count = self._sub_count >> 1
+        self.counts: Dict[int, int] = {}
+        self.count = 0
+        self.min = 0
+        self.max = 0
+        self.total = 0
+
+    def _index(self, value: int) -> int:
+        if value < self._sub_count:
+            return value
+        shift = value.bit_length() - self._sub_bits
+        return shift * self._half_count + (value >> shift)
+
+    def _range(self, index: int) -> Tuple[int, int]:
+        """桶对应的取值范围 [lower, upper]"""
+        if index < self._sub_count:
+            return index, index
+        shift = index // self._half_count - 1
+        sub = index - shift * self._half_count
+        return sub << shift, ((sub + 1) << shift) - 1
+
+    def record(self, value_ms: float, count: int = 1):
+        value = max(0, int(round(value_ms * UNITS_PER_MS)))
+        index = self._index(value)
+        self.counts[index] = self.counts.get(index, 0) + count
+        self.min = value if not self.count else min(self.min, value)
+        self.max = max(self.max, value)
+        self.count += count
+        self.total += value * count
+
+    def merge(self, other: "LatencyHistogram") -> "LatencyHistogram":
+        if other.significant_digits != self.significant_digits:
+            raise ValueError("Cannot merge histograms with different precision")
+        if not other.count:
+            return self
+        for index, count in other.counts.items():
+            self.counts[index] = self.counts.get(index, 0) + count
+        self.min = other.min if not self.count else min(self.min, other.min)
+        self.max = max(self.max, other.max)
+        self.count += other.count
+        self.total += other.total
+        return self
+
+    def value_at_percentile(self, percentile: float) -> Optional[float]:
+        """百分位对应的延迟（毫秒），取所在桶的上界，与 HdrHistogram 一致"""
+        if not self.count:
+            return None
+        target = max(1, math.ceil(min(100.0, max(0.0, percentile)) / 100 * self.count))
+        seen = 0
+        for index in sorted(self.counts):
+            seen += self.counts[index]
+            if seen >= target:
+                # 桶上界不超过实际记录到的最大值
+                return min(self._range(index)[1], self.max) / UNITS_PER_MS
+        return self.max / UNITS_PER_MS
+
+    def percentiles(self, percentiles: Iterable[float] = DEFAULT_PERCENTILES) -> Dict[str, float]:
+        if not self.count:
+            return {}
+        result = {f"p{p:g}": round(self.value_at_percentile(p), 2) for p in percentiles}
+        result["min"] = round(self.min / UNITS_PER_MS, 2)
+        result["max"] = round(self.max / UNITS_PER_MS, 2)
+        result["mean"] = round(self.total / self.count / UNITS_PER_MS, 2)
+        return result
+
+    def encode(self) -> bytes:
+        """紧凑的二进制编码：非空桶按 (下标差, 计数) 写成 varint 后用 zlib 压缩"""
+        body = bytearray()
+        previous = 0
+        for index in sorted(self.counts):
+            _write_varint(index - previous, body)
+            _write_varint(self.counts[index], body)
+            previous = index
+        header = _HISTOGRAM_HEADER.pack(self.significant_digits, self.count, self.min, self.max, self.total)
+        return header + zlib.compress(bytes(body))
+
+    @classmethod
+    def decode(cls, data: bytes) -> "LatencyHistogram":
+        digits, count, minimum, maximum, total = _HISTOGRAM_HEADER.unpack_from(data)
+        histogram = cls(digits)
+        body = zlib.decompress(data[_HISTOGRAM_HEADER.size:])
+        pos, index = 0, 0
+        while pos < len(body):
+            delta, pos = _read_varint(body, pos)
+            bucket_count, pos = _read_varint(body, pos)
+            index += delta
+            histogram.counts[index] = bucket_count
+        histogram.count, histogram.min, histogram.max, histogram.total = count, minimum, maximum, total
+        return histogram
+
+
+class HistogramLog:
+    """按时间窗口和接口追加保存直方图的二进制文件（报告目录中的 latency.hlog）
+
+    每条记录为 (窗口开始时间, 窗口长度, 接口名称, 直方图)，只追加写入，运行中断时已写入的窗口仍然可读。
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+
+    def append(self, start: float, interval: float, histograms: Dict[str, LatencyHistogram]):
+        if not histograms:
+            return
+        new_file = not self.path.exists()
+        with open(self.path, "ab") as f:
+            if new_file:
+                f.write(_FILE_MAGIC)
+            for name, histogram in sorted(histograms.items()):
+                encoded_name = name.encode("utf-8")[:0xFFFF]
+                payload = histogram.encode()
+                f.write(_RECORD_HEADER.pack(start, interval, len(encoded_name), len(payload)))
+                f.write(encoded_name)
+                f.write(payload)
+
+    def records(self) -> Iterator[Tuple[float, float, str, LatencyHistogram]]:
+        """依次读出 (窗口开始时间, 窗口长度, 接口名称, 直方图)，末尾写了一半的记录会被忽略"""
+        if not self.path.exists():
+            return
+        with open(self.path, "rb") as f:
+            if f.read(len(_FILE_MAGIC)) != _FILE_MAGIC:
+                raise ValueError(f"{self.path} is not a histogram log")
+            while True:
+                header = f.read(_RECORD_HEADER.size)
+                if len(header) < _RECORD_HEADER.size:
+                    return
+                start, interval, name_size, payload_size = _RECORD_HEADER.unpack(header)
+                name = f.read(name_size)
+                payload = f.read(payload_size)
+                if len(name) < name_size or len(payload) < payload_size:
+                    return
+                yield start, interval, name.decode("utf-8", errors="replace"), LatencyHistogram.decode(payload)
+
+
+def query_histograms(paths: Iterable, start: Optional[float] = None, end: Optional[float] = None,
+                     endpoints: Optional[List[str]] = None, interval: Optional[float] = None):
+    """合并一个或多个直方图日志中落在 [start, end) 内的窗口
+
+    返回 (总体直方图, 按接口的直方图, 按 interval 秒分组的总体直方图)；窗口按开始时间归入时间范围和分组。
+    """
+    overall = LatencyHistogram()
+    by_endpoint: Dict[str, LatencyHistogram] = {}
+    series: Dict[float, LatencyHistogram] = {}
+    for path in paths:
+        for window_start, _, name, histogram in HistogramLog(path).records():
+            if start is not None and window_start < start:
+                continue
+            if end is not None and window_start >= end:
+                continue
+            if endpoints and name not in endpoints:
+                continue
+            overall.merge(histogram)
+            by_endpoint.setdefault(name, LatencyHistogram(histogram.significant_digits)).merge(histogram)
+            if interval:
+                bucket = math.floor(window_start / interval) * interval
+                series.setdefault(bucket, LatencyHistogram(histogram.significant_digits)).merge(histogram)
+    return overall, by_endpoint, series
@@ -0,0 +1,252 @@
+import json
+import os
+import threading
+from collections import deque
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+
+# 内存中保留的最近窗口数（每秒一个），读得太慢的客户端会跳过更早的窗口，不会拖住压测
+METRICS_RING_SIZE = int(os.getenv("PERF_METRICS_RING_SIZE", "600"))
+METRICS_FILE = "metrics.jsonl"
+# 读取压测进程写出的指标文件的间隔（秒）
+TAIL_POLL_INTERVAL = 1
+
+# 正在运行的指标流，按报告ID索引
+_feeds: Dict[int, "MetricsFeed"] = {}
+_feeds_lock = threading.Lock()
+
+
+class MetricsFeed:
+    """一次压测的实时指标：每秒一个窗口（rps、p50/p95/p99、错误数），内存中只保留最近 ring_size 个；
+    给了 path 时同时逐行追加到报告目录的 metrics.jsonl，运行结束后仍可回放"""
+
+    def __init__(self, path=None, ring_size: int = METRICS_RING_SIZE):
+        self._windows = deque(maxlen=max(1, ring_size))
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._file = open(path, "a", encoding="utf-8") if path else None
+        self.closed = False
+
+    def publish(self, window: Dict[str, Any]):
+        with self._lock:
+            self._seq += 1
+            self._windows.append((self._seq, window))
+            if self._file is not None:
+                self._file.write(json.dumps(window, ensure_ascii=False) + "\n")
+                self._file.flush()
+
+    def read_since(self, seq: int) -> Tuple[List[Dict[str, Any]], int]:
+        """返回序号大于 seq 的窗口和最新序号"""
+        with self._lock:
+            return [window for window_seq, window in self._windows if window_seq > seq], self._seq
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            if self._file is not None:
+                self._file.close()
+
+
+def register_feed(report_id: Optional[int], feed: MetricsFeed):
+    if report_id is None:
+        return
+    with _feeds_lock:
+        _feeds[report_id] = feed
+
+
+def unregister_feed(report_id: Optional[int]):
+    if report_id is None:
+        return
+    with _feeds_lock:
+        _feeds.pop(report_id, None)
+
+
+def get_feed(report_id: int) -> Optional[MetricsFeed]:
+    with _feeds_lock:
+        return _feeds.get(report_id)
+
+
+def read_metrics_file(report_dir, tail: int = METRICS_RING_SIZE) -> List[Dict[str, Any]]:
+    """读取已结束运行的指标窗口（最后 tail 个）"""
+    path = Path(report_dir) / METRICS_FILE
+    if not path.exists():
+        return []
+    with open(path, encoding="utf-8") as f:
+        lines = deque(f, maxlen=max(0, tail))
+    windows = []
+    for line in lines:
+        try:
+            windows.append(json.loads(line))
+        except ValueError:
+            continue
+    return windows
+
+
+class MetricsFileTailer:
+    """在后台线程中跟踪压测进程追加写入的 metrics.jsonl，把新的窗口发布到 feed（此时 feed 不再写文件）"""
+
+    def __init__(self, path, feed: MetricsFeed, poll_interval: float = TAIL_POLL_INTERVAL):
+        self.path = Path(path)
+        self.feed = feed
+        self.poll_interval = poll_interval
+        self._stop = threading.Event()
+        self._thread = None
+        self._offset = 0
+        self._partial = b""
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="metrics-tailer", daemon=True)
+        self._thread.start()
+
+    def stop(self):
+        """停止跟踪，先把文件中剩余的窗口读完"""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join()
+        self._read()
+
+    def _loop(self):
+        while not self._stop.wait(self.poll_interval):
+            try:
+                self._read()
+            except Exception as e:
+                print(f"✗ 读取实时指标失败: {e}")
+
+    def _read(self):
+        if not self.path.exists():
+            return
+        with open(self.path, "rb") as f:
+            f.seek(self._offset)
+            data = f.read()
+            self._offset = f.tell()
+        lines = (self._partial + data).split(b"\n")
+        # 最后一段可能是写了一半的行，留到下次
+        self._partial = lines.pop()
+        for line in lines:
+            try:
+                self.feed.publish(json.loads(line))
+            except ValueError:
+                continue
+
+
+# 追加到生成的 locustfile 中：通过 request 事件按秒、按接口把延迟记录到直方图，每秒的汇总写入 LOCUST_METRICS_FILE，
+# 直方图写入 LOCUST_HISTOGRAM_FILE（依赖复制到 locustfile 旁边的 latency_histogram 模块）。
+# 分布式运行时 worker 把已结束的秒连同编码后的直方图随统计报告发给 master，由 master 合并后写入；
+# worker 默认每 3 秒上报一次，master 等这段时间过去后才写出某一秒，保证各 worker 的数据都已到达。
+# （Locust 的 --csv-full-history 每 10 秒才刷新一次文件，退出时还可能丢失最后的数据，不能用于每秒的实时指标）
+LOCUST_METRICS_PLUGIN = r'''
+import json as _json
+import os as _os
+import time as _time
+import gevent as _gevent
+from locust import events as _events
+from locust.runners import MasterRunner as _MasterRunner, WorkerRunner as _WorkerRunner
+from locust.runners import WORKER_REPORT_INTERVAL as _WORKER_REPORT_INTERVAL, STATE_STOPPING as _STATE_STOPPING, STATE_STOPPED as _STATE_STOPPED
+from latency_histogram import LatencyHistogram as _Histogram, HistogramLog as _HistogramLog
+
+_METRICS_FILE = _os.environ.get("LOCUST_METRICS_FILE")
+_HISTOGRAM_LOG = _HistogramLog(_os.environ["LOCUST_HISTOGRAM_FILE"]) if _os.environ.get("LOCUST_HISTOGRAM_FILE") else None
+_windows = {}
+_totals = {"requests": 0, "failures": 0}
+# 每秒的用户数，写出窗口时使用（master 写出时已过去几秒）
+_user_counts = {}
+
+
+def _bucket(second, name):
+    return _windows.setdefault(second, {}).setdefault(name, {"requests": 0, "failures": 0, "histogram": _Histogram()})
+
+
+@_events.request.add_listener
+def _record_request(request_type, name, response_time, exception=None, **kwargs):
+    bucket = _bucket(int(_time.time()), f"{request_type} {name}")
+    bucket["requests"] += 1
+    bucket["failures"] += 1 if exception else 0
+    bucket["histogram"].record(response_time)
+
+
+def _pop_finished(before):
+    return {second: _windows.pop(second) for second in sorted(_windows) if second < before}
+
+
+def _percentile(histogram, p):
+    value = histogram.value_at_percentile(p)
+    return round(value, 2) if value is not None else None
+
+
+def _write(windows, user_count):
+    if not windows:
+        return
+    if _HISTOGRAM_LOG is not None:
+        for second, names in sorted(windows.items()):
+            _HISTOGRAM_LOG.append(second, 1, {name: bucket["histogram"] for name, bucket in names.items()})
+    if not _METRICS_FILE:
+        return
+    with open(_METRICS_FILE, "a", encoding="utf-8") as f:
+        for second, names in sorted(windows.items()):
+            latencies = _Histogram()
+            for bucket in names.values():
+                latencies.merge(bucket["histogram"])
+            requests = sum(bucket["requests"] for bucket in names.values())
+            failures = sum(bucket["failures"] for bucket in names.values())
+            _totals["requests"] += requests
+            _totals["failures"] += failures
+            endpoints = []
+            for name, bucket in sorted(names.items()):
+                histogram = bucket["histogram"]
+                endpoints.append({"name": name, "requests": bucket["requests"], "errors": bucket["failures"],
+                                  "p50": _percentile(histogram, 50), "p95": _percentile(histogram, 95),
+                                  "p99": _percentile(histogram, 99)})
+            f.write(_json.dumps({
+                "timestamp": second, "users": _user_counts.pop(second, user_count), "rps": requests, "errors": failures,
+                "p50": _percentile(latencies, 50), "p95": _percentile(latencies, 95),
+                "p99": _percentile(latencies, 99),
+                "requests": _totals["requests"], "failures": _totals["failures"], "endpoints": endpoints
+            }) + "\n")
+
+
+@_events.init.add_listener
+def _setup_metrics(environment, **kwargs):
+    runner = environment.runner
+    if isinstance(runner, _WorkerRunner):
+        @_events.report_to_master.add_listener
+        def _report_windows(client_id, data):
+            # 停止后的最后一次上报带上当前这一秒
+            stopped = runner.state in (_STATE_STOPPING, _STATE_STOPPED)
+            windows = _pop_finished(float("inf") if stopped else int(_time.time()))
+            # 直方图编码后发送，master 合并桶计数即可，不需要原始样本
+            data["metric_windows"] = {second: {name: {"requests": bucket["requests"], "failures": bucket["failures"],
+                                                      "histogram": bucket["histogram"].encode()}
+                                               for name, bucket in names.items()}
+                                      for second, names in windows.items()}
+        return
+
+    delay = 1
+    if isinstance(runner, _MasterRunner):
+        delay = int(_WORKER_REPORT_INTERVAL) + 2
+
+        @_events.worker_report.add_listener
+        def _merge_windows(client_id, data):
+            for second, names in (data.get("metric_windows") or {}).items():
+                for name, bucket in names.items():
+                    merged = _bucket(int(second), name)
+                    merged["requests"] += bucket["requests"]
+                    merged["failures"] += bucket["failures"]
+                    merged["histogram"].merge(_Histogram.decode(bucket["histogram"]))
+
+    def _flush_loop():
+        while True:
+            _gevent.sleep(1)
+            _user_counts[int(_time.time())] = runner.user_count
+            flushed_before = int(_time.time()) - delay + 1
+            _write(_pop_finished(flushed_before), runner.user_count)
+            # 没有请求的秒不会被写出，对应的用户数在这里丢弃，空闲时不会累积
+            for second in [second for second in _user_counts if second < flushed_before]:
+                del _user_counts[second]
+
+    _gevent.spawn(_flush_loop)
+
+    @_events.quitting.add_listener
+    def _flush_all(environment, **kwargs):
+        _write(_pop_finished(float("inf")), runner.user_count)
+'''
@@ -0,0 +1,332 @@
+import asyncio
+import math
+import os
+import random
+import re
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterator, List, Optional
+
+from app.core.http_pool import HostConnectionPool
+from app.core.api_test_runner import check_response
+from app.core.latency_histogram import LatencyHistogram, HistogramLog
+
+
+OPEN_MODEL_MAX_IN_FLIGHT = int(os.getenv("OPEN_MODEL_MAX_IN_FLIGHT", "1000"))
+OPEN_MODEL_POOL_SIZE = int(os.getenv("OPEN_MODEL_POOL_SIZE", "100"))
+# 运行期间向输出流打印进度的间隔（秒）
+REPORT_INTERVAL = 5
+# 实时指标窗口长度（秒）
+WINDOW_INTERVAL = 1
+# 摘要中最多保留的错误种类
+MAX_ERRORS = 20
+
+_DURATION_PATTERN = re.compile(r"(\d+(?:\.\d+)?)(h|m|s)")
+
+
+def parse_duration(value) -> float:
+    """把 30、"30s"、"1m"、"1h30m" 这样的时长转换为秒，格式与 Locust 的 --run-time 一致"""
+    if isinstance(value, (int, float)) and not isinstance(value, bool):
+        return float(value)
+    text = str(value).strip().lower()
+    if re.fullmatch(r"\d+(\.\d+)?", text):
+        return float(text)
+    if not text or _DURATION_PATTERN.sub("", text):
+        raise ValueError(f"Invalid duration '{value}'")
+    units = {"h": 3600, "m": 60, "s": 1}
+    return sum(float(number) * units[unit] for number, unit in _DURATION_PATTERN.findall(text))
+
+
+class ArrivalSchedule:
+    """到达率计划：按阶段给出每秒发送的请求数，发送时间只由计划决定，与响应快慢无关
+
+    配置格式：
+        {"rate": 100, "run_time": "1m"}                       # 固定到达率
+        {"stages": [{"duration": "30s", "rate": 50},           # 分阶段
+                    {"duration": "1m", "rate": 200}],
+         "ramp": true}                                         # 阶段内从上一阶段速率线性过渡
+    """
+
+    def __init__(self, stages: List[Dict[str, float]], ramp: bool = False):
+        self.stages = stages
+        self.ramp = ramp
+
+    @classmethod
+    def from_config(cls, config: Dict[str, Any]) -> "ArrivalSchedule":
+        if config.get("stages"):
+            stages = [{"duration": parse_duration(stage["duration"]), "rate": float(stage["rate"])}
+                      for stage in config["stages"]]
+        else:
+            stages = [{"duration": parse_duration(config.get("run_time", "1m")), "rate": float(config["rate"])}]
+        return cls(stages, bool(config.get("ramp")))
+
+    @staticmethod
+    def validate(config: Dict[str, Any]) -> Optional[str]:
+        """检查配置，返回错误信息，配置有效时返回 None"""
+        stages = config.get("stages")
+        if stages is None:
+            if "rate" not in config:
+                return "The open model engine needs a rate or stages"
+            stages = [{"duration": config.get("run_time", "1m"), "rate": config["rate"]}]
+        if not isinstance(stages, list) or not stages:
+            return "stages must be a non-empty list"
+        for stage in stages:
+            if not isinstance(stage, dict) or "duration" not in stage or "rate" not in stage:
+                return "Each stage needs a duration and a rate"
+            try:
+                duration = parse_duration(stage["duration"])
+            except ValueError as e:
+                return str(e)
+            rate = stage["rate"]
+            if not isinstance(rate, (int, float)) or isinstance(rate, bool) or rate < 0 or duration <= 0:
+                return "Stage rate must be non-negative and duration positive"
+        return None
+
+    @property
+    def duration(self) -> float:
+        return sum(stage["duration"] for stage in self.stages)
+
+    @property
+    def expected_requests(self) -> float:
+        total, previous = 0.0, None
+        for stage in self.stages:
+            start_rate = previous if self.ramp and previous is not None else stage["rate"]
+            total += (start_rate + stage["rate"]) / 2 * stage["duration"]
+            previous = stage["rate"]
+        return total
+
+    def send_times(self) -> Iterator[float]:
+        """按计划依次产出每个请求相对开始时间的发送时刻（秒）"""
+        offset, previous = 0.0, None
+        for stage in self.stages:
+            duration, end_rate = stage["duration"], stage["rate"]
+            start_rate = previous if self.ramp and previous is not None else end_rate
+            # 阶段内前 t 秒应发送的请求数 N(t) = r0*t + (r1-r0)*t^2/(2d)，第 k 个请求在 N(t)=k 时发送
+            a = (end_rate - start_rate) / (2 * duration)
+            k = 0
+            while True:
+                if a == 0:
+                    if start_rate <= 0:
+                        break
+                    t = k / start_rate
+                else:
+                    discriminant = start_rate * start_rate + 4 * a * k
+                    if discriminant < 0:
+                        break
+                    t = (-start_rate + math.sqrt(discriminant)) / (2 * a)
+                if t >= duration:
+                    break
+                yield offset + t
+                k += 1
+            offset += duration
+            previous = end_rate
+
+
+class _Endpoint:
+    """单个接口的统计：延迟和服务时间记录在直方图中，内存占用不随请求数增长"""
+
+    def __init__(self, name: str, method: str):
+        self.name = name
+        self.method = method
+        self.latency = LatencyHistogram()
+        self.service_time = LatencyHistogram()
+        self.failures = 0
+
+    @property
+    def requests(self) -> int:
+        return self.latency.count
+
+    def summary(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "method": self.method,
+            "requests": self.requests,
+            "failures": self.failures,
+            "latency_ms": self.latency.percentiles(),
+            "service_time_ms": self.service_time.percentiles()
+        }
+
+
+class OpenModelGenerator:
+    """开放模型压测：按到达率计划发送请求，不等待上一个请求返回
+
+    每个请求记录计划发送时间和实际发送时间：latency 从计划发送时间算起，包含目标变慢时请求排队等待的时间，
+    不会像闭合模型那样因为少发请求而低估延迟（coordinated omission）；service_time 从实际发送时间算起。
+    同时在途的请求超过 max_in_flight 时新请求等待空位，等待时间计入 latency 和 send_lag。
+    """
+
+    def __init__(self, test_cases: List[Any], schedule: ArrivalSchedule, weights: Dict[int, int] = None,
+                 names: Dict[int, str] = None, max_in_flight: int = OPEN_MODEL_MAX_IN_FLIGHT,
+                 pool_size: int = OPEN_MODEL_POOL_SIZE, timeout: float = 30,
+                 on_window: Optional[Callable[[Dict[str, Any]], None]] = None,
+                 histogram_log: Optional[HistogramLog] = None):
+        """on_window 每秒收到一个实时指标窗口：该秒内完成的请求数、百分位（修正后的延迟）和错误数；
+        histogram_log 按窗口保存各接口修正后延迟的直方图"""
+        self.test_cases = test_cases
+        self.schedule = schedule
+        self.weights = [(weights or {}).get(case.id, 1) for case in test_cases]
+        self.names = names or {}
+        self.max_in_flight = max(1, max_in_flight)
+        self.pool_size = max(1, pool_size)
+        self.timeout = timeout
+        self._endpoints: Dict[str, _Endpoint] = {}
+        self._send_lag = LatencyHistogram()
+        self._errors: Counter = Counter()
+        self._in_flight = 0
+        self.on_window = on_window
+        self.histogram_log = histogram_log
+        self._window_histograms: Dict[str, LatencyHistogram] = {}
+        self._window_started = time.time()
+        self._window_errors = 0
+
+    def run(self, stream=None) -> Dict[str, Any]:
+        """执行压测并返回统计结果；stream 被终止（取消运行）时停止发送新请求"""
+        return asyncio.run(self._run(stream))
+
+    async def _run(self, stream) -> Dict[str, Any]:
+        slots = asyncio.Semaphore(self.max_in_flight)
+        pending = set()
+        started = time.perf_counter()
+        next_report = REPORT_INTERVAL
+        self._log(stream, f"🚀 开放模型压测: 计划 {self.schedule.expected_requests:.0f} 个请求，"
+                          f"时长 {self.schedule.duration:g}s")
+
+        self._window_started = time.time()
+        ticker = asyncio.create_task(self._publish_windows()) if self.on_window or self.histogram_log else None
+        async with HostConnectionPool(self.pool_size, timeout=self.timeout) as pool:
+            for offset in self.schedule.send_times():
+                if stream is not None and stream.terminated:
+                    self._log(stream, "⏹ 运行被停止，不再发送新请求")
+                    break
+                delay = started + offset - time.perf_counter()
+                # 落后于计划时也让出一次事件循环，已发出的请求才能继续执行
+                await asyncio.sleep(max(0.0, delay))
+                case = random.choices(self.test_cases, weights=self.weights)[0]
+                task = asyncio.create_task(self._send(pool, slots, case, started + offset))
+                pending.add(task)
+                task.add_done_callback(pending.discard)
+
+                if offset >= next_report:
+                    next_report += REPORT_INTERVAL
+                    self._log(stream, self._progress_line(time.perf_counter() - started))
+
+            if pending:
+                await asyncio.gather(*pending)
+
+        if ticker is not None:
+            ticker.cancel()
+            self._flush_window()
+        summary = self.summary(time.perf_counter() - started)
+        self._log(stream, f"✓ 完成 {summary['requests']} 个请求，失败 {summary['failures']}，"
+                          f"实际速率 {summary['achieved_rate']}/s，延迟 p50 {summary['latency_ms'].get('p50')}ms "
+                          f"p99 {summary['latency_ms'].get('p99')}ms（服务时间 p99 {summary['service_time_ms'].get('p99')}ms）")
+        return summary
+
+    async def _send(self, pool: HostConnectionPool, slots: asyncio.Semaphore, case: Any, intended: float):
+        name = self.names.get(case.id, case.case_name)
+        method = case.method.upper()
+        # 与 Locust 统计插件一致，接口按 "方法 名称" 区分，直方图日志中的名称在两种引擎间相同
+        key = f"{method} {name}"
+        failure = None
+        async with slots:
+            self._in_flight += 1
+            actual = time.perf_counter()
+            try:
+                response = await pool.request(
+                    method=method,
+                    url=case.url,
+                    headers=case.headers or {},
+                    params=case.params or {},
+                    json=case.body or None
+                )
+                actual_data = response.json() if case.expected_data and response.content else {}
+                failure = check_response(response.status_code, actual_data, case.expected_data)
+            except Exception as e:
+                failure = f"{type(e).__name__}: {e}"
+            finally:
+                finished = time.perf_counter()
+                self._in_flight -= 1
+
+        endpoint = self._endpoints.get(key)
+        if endpoint is None:
+            endpoint = self._endpoints[key] = _Endpoint(name, method)
+        latency = (finished - intended) * 1000
+        endpoint.latency.record(latency)
+        histogram = self._window_histograms.get(key)
+        if histogram is None:
+            histogram = self._window_histograms[key] = LatencyHistogram()
+        histogram.record(latency)
+        endpoint.service_time.record((finished - actual) * 1000)
+        self._send_lag.record(max(0.0, actual - intended) * 1000)
+        if failure:
+            endpoint.failures += 1
+            self._window_errors += 1
+            self._errors[f"{key}: {failure}"[:300]] += 1
+
+    async def _publish_windows(self):
+        while True:
+            await asyncio.sleep(WINDOW_INTERVAL)
+            self._flush_window()
+
+    def _flush_window(self):
+        histograms, errors, started = self._window_histograms, self._window_errors, self._window_started
+        now = time.time()
+        self._window_histograms, self._window_errors, self._window_started = {}, 0, now
+        if self.histogram_log is not None:
+            try:
+                self.histogram_log.append(started, now - started, histograms)
+            except OSError as e:
+                print(f"✗ 保存延迟直方图失败: {e}")
+        if not self.on_window:
+            return
+        window = LatencyHistogram()
+        for histogram in histograms.values():
+            window.merge(histogram)
+        latency = window.percentiles()
+        try:
+            self.on_window({
+                "timestamp": round(now, 3),
+                "in_flight": self._in_flight,
+                "rps": round(window.count / WINDOW_INTERVAL, 2),
+                "p50": latency.get("p50"),
+                "p95": latency.get("p95"),
+                "p99": latency.get("p99"),
+                "errors": errors,
+                "requests": sum(e.requests for e in self._endpoints.values()),
+                "failures": sum(e.failures for e in self._endpoints.values())
+            })
+        except Exception as e:
+            print(f"✗ 发布实时指标失败: {e}")
+
+    def summary(self, elapsed: float) -> Dict[str, Any]:
+        endpoints = [self._endpoints[name].summary() for name in sorted(self._endpoints)]
+        latency, service_time = LatencyHistogram(), LatencyHistogram()
+        for endpoint in self._endpoints.values():
+            latency.merge(endpoint.latency)
+            service_time.merge(endpoint.service_time)
+        requests = latency.count
+        return {
+            "engine": "open",
+            "duration": round(elapsed, 2),
+            "intended_requests": round(self.schedule.expected_requests),
+            "requests": requests,
+            "failures": sum(e["failures"] for e in endpoints),
+            "intended_rate": round(self.schedule.expected_requests / self.schedule.duration, 2),
+            "achieved_rate": round(requests / elapsed, 2) if elapsed > 0 else 0,
+            "latency_ms": latency.percentiles(),
+            "service_time_ms": service_time.percentiles(),
+            "send_lag_ms": self._send_lag.percentiles(),
+            "endpoints": endpoints,
+            "errors": [{"message": message, "count": count} for message, count in self._errors.most_common(MAX_ERRORS)]
+        }
+
+    def _progress_line(self, elapsed: float) -> str:
+        # 运行期间只做计数，不计算百分位，避免拖慢发送节奏
+        requests = sum(e.requests for e in self._endpoints.values())
+        failures = sum(e.failures for e in self._endpoints.values())
+        return f"[{elapsed:6.1f}s] 完成 {requests} 个请求，失败 {failures}，在途 {self._in_flight}"
+
+    @staticmethod
+    def _log(stream, line: str):
+        if stream is not None:
+            stream.write(line)
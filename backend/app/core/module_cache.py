@@ -0,0 +1,101 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Callable, Iterable, List, Tuple
+
+
+CACHE_DIR = os.getenv("MODULE_CACHE_DIR", "cache/modules")
+CACHE_MAX_MB = int(os.getenv("MODULE_CACHE_MAX_MB", "200"))
+# 最近使用过的条目不参与淘汰，避免删除正在被 pytest 使用的模块
+MIN_EVICT_AGE = 600
+
+LAST_USED_MARKER = ".last_used"
+
+
+def fingerprint(case: Any, fields: Iterable[str]) -> str:
+    """对用例的指定字段做内容哈希"""
+    data = {field: getattr(case, field, None) for field in fields}
+    raw = json.dumps(data, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class ModuleCache:
+    """生成的测试模块缓存，按用例内容哈希索引，磁盘上按最近使用时间做 LRU 淘汰
+
+    模块固定存放在 <cache_dir>/<key>/ 下，路径不变时 pytest 断言重写后的字节码
+    （__pycache__ 中的 pyc）也会被直接复用，重复运行无需重新编译。
+    """
+
+    def __init__(self, cache_dir: str = CACHE_DIR, max_bytes: int = CACHE_MAX_MB * 1024 * 1024):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_bytes = max_bytes
+
+    @staticmethod
+    def subprocess_env(env: dict) -> dict:
+        """pytest 子进程环境：确保断言重写后的字节码会写回缓存目录"""
+        env = dict(env)
+        env.pop("PYTHONDONTWRITEBYTECODE", None)
+        return env
+
+    @staticmethod
+    def make_key(namespace: str, cases: List[Any], fields: Iterable[str], template_hash: str) -> str:
+        fields = list(fields)
+        digest = hashlib.sha256(f"{namespace}:{template_hash}".encode("utf-8"))
+        for case in cases:
+            digest.update(fingerprint(case, fields).encode("utf-8"))
+        return f"{namespace}_{digest.hexdigest()[:32]}"
+
+    def get_or_create(self, key: str, filename: str, render: Callable[[], str]) -> Tuple[Path, bool]:
+        """返回缓存的模块路径和是否命中；未命中时调用 render 生成源码并写入缓存"""
+        entry_dir = self.cache_dir / key
+        module = entry_dir / filename
+
+        if module.exists():
+            self._touch(entry_dir)
+            return module, True
+
+        entry_dir.mkdir(parents=True, exist_ok=True)
+        # 先写临时文件再原子替换，并发生成同一模块时不会读到半截文件
+        tmp_file = entry_dir / f".{filename}.{os.getpid()}.tmp"
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            f.write(render())
+        os.replace(tmp_file, module)
+        self._touch(entry_dir)
+
+        self.evict(keep=entry_dir)
+        return module, False
+
+    def evict(self, keep: Path = None):
+        """总大小超过上限时，按最近使用时间从旧到新删除条目，keep 指定的条目不会被删除"""
+        entries = []
+        total = 0
+        for entry_dir in self.cache_dir.iterdir():
+            if not entry_dir.is_dir():
+                continue
+            size = sum(f.stat().st_size for f in entry_dir.rglob("*") if f.is_file())
+            entries.append((self._last_used(entry_dir), size, entry_dir))
+            total += size
+
+        now = time.time()
+        for last_used, size, entry_dir in sorted(entries, key=lambda e: e[0]):
+            if total <= self.max_bytes:
+                break
+            if now - last_used < MIN_EVICT_AGE:
+                break
+            if entry_dir == keep:
+                continue
+            shutil.rmtree(entry_dir, ignore_errors=True)
+            total -= size
+
+    @staticmethod
+    def _touch(entry_dir: Path):
+        (entry_dir / LAST_USED_MARKER).touch()
+
+    @staticmethod
+    def _last_used(entry_dir: Path) -> float:
+        marker = entry_dir / LAST_USED_MARKER
+        return marker.stat().st_mtime if marker.exists() else entry_dir.stat().st_mtime
@@ -0,0 +1,128 @@
+import fnmatch
+import os
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional
+
+
+STATIC_CACHE_MB = int(os.getenv("UI_STATIC_CACHE_MB", "100"))
+# 单个资源超过该大小不缓存，避免少数大文件挤掉其他资源
+STATIC_CACHE_MAX_ITEM_MB = 5
+
+RESOURCE_TYPES = ("document", "stylesheet", "image", "media", "font", "script", "texttrack",
+                  "xhr", "fetch", "eventsource", "websocket", "manifest", "other")
+# 可以跨用例复用的静态资源类型
+STATIC_RESOURCE_TYPES = ("stylesheet", "script", "font", "image", "media")
+# route.fetch() 得到的 body 已解压，这些头描述的是原始传输编码，缓存时去掉，由 fulfill 按实际 body 重新计算
+BODY_ENCODING_HEADERS = ("content-encoding", "content-length", "transfer-encoding")
+
+
+class StaticAssetCache:
+    """运行内共享的静态资源内存缓存，按最近使用淘汰，总大小不超过 max_bytes"""
+
+    def __init__(self, max_bytes: int = STATIC_CACHE_MB * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._size = 0
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, url: str) -> Optional[Dict[str, Any]]:
+        entry = self._entries.get(url)
+        if entry is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(url)
+        self.hits += 1
+        return entry
+
+    def put(self, url: str, status: int, headers: Dict[str, str], body: bytes):
+        if len(body) > min(self.max_bytes, STATIC_CACHE_MAX_ITEM_MB * 1024 * 1024):
+            return
+        old = self._entries.pop(url, None)
+        if old is not None:
+            self._size -= len(old["body"])
+        headers = {key: value for key, value in headers.items() if key.lower() not in BODY_ENCODING_HEADERS}
+        self._entries[url] = {"status": status, "headers": headers, "body": body}
+        self._size += len(body)
+        while self._size > self.max_bytes and self._entries:
+            _, evicted = self._entries.popitem(last=False)
+            self._size -= len(evicted["body"])
+
+
+class RouteRules:
+    """通过 Playwright 路由拦截页面请求：按资源类型或 URL 通配符屏蔽请求，并用运行内缓存响应静态资源
+
+    配置格式（保存在项目UI设置的 route_rules 中）：
+        {"block_resource_types": ["image", "font"],
+         "block_patterns": ["*google-analytics.com*", "*.mp4"],
+         "cache_static": true}
+    """
+
+    def __init__(self, block_resource_types: List[str] = None, block_patterns: List[str] = None,
+                 cache_static: bool = False, cache: Optional[StaticAssetCache] = None):
+        self.block_resource_types = set(block_resource_types or [])
+        self.block_patterns = list(block_patterns or [])
+        self.cache = (cache or StaticAssetCache()) if cache_static else None
+        self.blocked = 0
+
+    @classmethod
+    def from_config(cls, config: Optional[Dict[str, Any]]) -> Optional["RouteRules"]:
+        """没有任何规则时返回 None，不注册路由（路由会让浏览器跳过自身的 HTTP 缓存）"""
+        config = config or {}
+        rules = cls(config.get("block_resource_types"), config.get("block_patterns"),
+                    bool(config.get("cache_static")))
+        if not rules.block_resource_types and not rules.block_patterns and rules.cache is None:
+            return None
+        return rules
+
+    @staticmethod
+    def validate(config: Optional[Dict[str, Any]]) -> Optional[str]:
+        """检查配置，返回错误信息，配置有效时返回 None"""
+        config = config or {}
+        unknown = set(config) - {"block_resource_types", "block_patterns", "cache_static"}
+        if unknown:
+            return f"Unknown route rule keys: {', '.join(sorted(unknown))}"
+        invalid = set(config.get("block_resource_types") or []) - set(RESOURCE_TYPES)
+        if invalid:
+            return f"Invalid resource types: {', '.join(sorted(invalid))}"
+        if not all(isinstance(p, str) for p in config.get("block_patterns") or []):
+            return "block_patterns must be a list of strings"
+        return None
+
+    @property
+    def stats(self) -> Dict[str, int]:
+        stats = {"blocked": self.blocked}
+        if self.cache is not None:
+            stats.update({"cache_hits": self.cache.hits, "cache_misses": self.cache.misses})
+        return stats
+
+    async def apply(self, context):
+        await context.route("**/*", self._handle)
+
+    def _is_blocked(self, request) -> bool:
+        if request.resource_type in self.block_resource_types:
+            return True
+        return any(fnmatch.fnmatch(request.url, pattern) for pattern in self.block_patterns)
+
+    async def _handle(self, route):
+        request = route.request
+        if self._is_blocked(request):
+            self.blocked += 1
+            await route.abort("blockedbyclient")
+            return
+
+        if self.cache is None or request.method != "GET" or request.resource_type not in STATIC_RESOURCE_TYPES:
+            await route.continue_()
+            return
+
+        entry = self.cache.get(request.url)
+        if entry is not None:
+            await route.fulfill(status=entry["status"], headers=entry["headers"], body=entry["body"])
+            return
+
+        response = await route.fetch()
+        body = await response.body()
+        headers = response.headers
+        if response.status == 200 and "no-store" not in headers.get("cache-control", ""):
+            self.cache.put(request.url, response.status, headers, body)
+        await route.fulfill(response=response, body=body)
@@ -0,0 +1,182 @@
+import logging
+import os
+import signal
+import subprocess
+import threading
+from collections import deque
+from logging.handlers import RotatingFileHandler
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+
+RING_SIZE = int(os.getenv("RUN_OUTPUT_RING_LINES", "1000"))
+LOG_MAX_MB = int(os.getenv("RUN_LOG_MAX_MB", "10"))
+LOG_BACKUP_COUNT = int(os.getenv("RUN_LOG_BACKUP_COUNT", "3"))
+
+# 正在运行的输出流，按报告ID索引，供实时查看
+_streams: Dict[int, "OutputStream"] = {}
+# 输出流注册前就被要求终止的报告ID
+_pending_terminations = set()
+_streams_lock = threading.Lock()
+
+
+class OutputStream:
+    """子进程输出流：内存中只保留最近 ring_size 行，完整输出写入按大小轮转的日志文件"""
+
+    def __init__(self, log_path, ring_size: int = RING_SIZE,
+                 max_bytes: int = LOG_MAX_MB * 1024 * 1024, backup_count: int = LOG_BACKUP_COUNT):
+        self.log_path = Path(log_path)
+        self.log_path.parent.mkdir(parents=True, exist_ok=True)
+        self._lines = deque(maxlen=max(1, ring_size))
+        self._seq = 0
+        self._lock = threading.Lock()
+        self._handler = RotatingFileHandler(self.log_path, maxBytes=max_bytes,
+                                            backupCount=backup_count, encoding="utf-8")
+        self._handler.setFormatter(logging.Formatter("%(message)s"))
+        self._processes: List[subprocess.Popen] = []
+        self.closed = False
+        self.terminated = False
+
+    def write(self, line: str):
+        line = line.rstrip("\r\n")
+        with self._lock:
+            self._seq += 1
+            self._lines.append((self._seq, line))
+        # 多个分片/worker 的读取线程会同时写入，handle 持有处理器的锁，写入与日志轮转不会交错
+        self._handler.handle(logging.makeLogRecord({"msg": line, "args": None}))
+
+    def read_since(self, seq: int) -> Tuple[List[str], int]:
+        """返回序号大于 seq 的行和最新序号；读得太慢时早于缓冲区的行会被跳过"""
+        with self._lock:
+            lines = [line for line_seq, line in self._lines if line_seq > seq]
+            return lines, self._seq
+
+    def tail(self, lines: int = 200) -> str:
+        with self._lock:
+            return "\n".join(line for _, line in list(self._lines)[-lines:])
+
+    def pump(self, pipe, prefix: str = ""):
+        """逐行读取子进程输出直到结束"""
+        for line in iter(pipe.readline, ""):
+            self.write(f"{prefix}{line}")
+        pipe.close()
+
+    def attach(self, process: subprocess.Popen):
+        """记录写入本输出流的子进程，取消运行时统一终止"""
+        with self._lock:
+            self._processes.append(process)
+            terminated = self.terminated
+        if terminated:
+            _send_signal(process, signal.SIGTERM)
+
+    def terminate(self, kill_after: Optional[float] = None):
+        """终止所有仍在运行的子进程；给了 kill_after 时，超过这个秒数仍未退出的进程被强制结束"""
+        with self._lock:
+            self.terminated = True
+            processes = list(self._processes)
+        for process in processes:
+            if process.poll() is None:
+                _send_signal(process, signal.SIGTERM)
+        if kill_after is not None:
+            timer = threading.Timer(kill_after, self._kill, args=(processes,))
+            timer.daemon = True
+            timer.start()
+
+    @staticmethod
+    def _kill(processes: List[subprocess.Popen]):
+        for process in processes:
+            if process.poll() is None:
+                _send_signal(process, signal.SIGKILL)
+
+    def close(self):
+        self.closed = True
+        self._handler.close()
+
+
+def _send_signal(process: subprocess.Popen, sig: int):
+    """以 start_new_session 启动的子进程向整个进程组发送信号，其派生的进程一起结束"""
+    try:
+        if os.getpgid(process.pid) == process.pid:
+            os.killpg(process.pid, sig)
+        else:
+            process.send_signal(sig)
+    except ProcessLookupError:
+        pass
+
+
+def register_stream(report_id: Optional[int], stream: OutputStream):
+    if report_id is None:
+        return
+    with _streams_lock:
+        _streams[report_id] = stream
+        if report_id in _pending_terminations:
+            _pending_terminations.discard(report_id)
+            # 之后 attach 的子进程会被立即终止
+            stream.terminated = True
+
+
+def unregister_stream(report_id: Optional[int]):
+    if report_id is None:
+        return
+    with _streams_lock:
+        _streams.pop(report_id, None)
+
+
+def terminate_stream(report_id: int, kill_after: Optional[float] = None):
+    """终止报告对应运行的所有子进程；运行尚未注册输出流时，注册后立即终止"""
+    with _streams_lock:
+        stream = _streams.get(report_id)
+        if stream is None:
+            _pending_terminations.add(report_id)
+            return
+    stream.terminate(kill_after)
+
+
+def discard_termination(report_id: Optional[int]):
+    with _streams_lock:
+        _pending_terminations.discard(report_id)
+
+
+def get_stream(report_id: int) -> Optional[OutputStream]:
+    with _streams_lock:
+        return _streams.get(report_id)
+
+
+def start_process(cmd, **kwargs) -> subprocess.Popen:
+    """启动子进程，stdout 和 stderr 合并为按行读取的文本管道"""
+    return subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.STDOUT,
+                            text=True, bufsize=1, errors="replace", **kwargs)
+
+
+def run_streaming(cmd, stream: OutputStream, prefix: str = "", **kwargs) -> int:
+    """运行子进程并把输出逐行写入 stream，返回退出码"""
+    process = start_process(cmd, **kwargs)
+    stream.attach(process)
+    stream.pump(process.stdout, prefix)
+    return process.wait()
+
+
+def stop_processes(processes: List[subprocess.Popen]):
+    """强制结束仍在运行的子进程并回收，关闭其输出管道"""
+    for process in processes:
+        if process.poll() is None:
+            _send_signal(process, signal.SIGKILL)
+    for process in processes:
+        process.wait()
+        if process.stdout is not None:
+            process.stdout.close()
+
+
+def wait_all_streaming(processes: List[Tuple[subprocess.Popen, str]], stream: OutputStream) -> List[int]:
+    """并发读取多个子进程的输出（每个进程一个读取线程），返回各自的退出码"""
+    threads = []
+    for process, prefix in processes:
+        stream.attach(process)
+        thread = threading.Thread(target=stream.pump, args=(process.stdout, prefix), daemon=True)
+        thread.start()
+        threads.append(thread)
+
+    returncodes = [process.wait() for process, _ in processes]
+    for thread in threads:
+        thread.join()
+    return returncodes
@@ -1,7 +1,142 @@
+import csv
+import json
+import os
+import shutil
+import socket
 import subprocess
 import sys
-from datetime import datetime
+import threading
 from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional
+from urllib.parse import urlsplit
+from app.utils.file_utils import make_report_dir
+from app.core.api_test_runner import SUCCESS_STATUS_CODES
+from app.core import latency_histogram
+from app.core.latency_histogram import HistogramLog, HISTOGRAM_FILE
+from app.core.live_metrics import (
+    MetricsFeed,
+    MetricsFileTailer,
+    register_feed,
+    unregister_feed,
+    METRICS_FILE,
+    LOCUST_METRICS_PLUGIN
+)
+from app.core.load_generator import ArrivalSchedule, OpenModelGenerator, OPEN_MODEL_MAX_IN_FLIGHT, OPEN_MODEL_POOL_SIZE
+from app.core.output_stream import OutputStream, register_stream, unregister_stream, run_streaming, start_process
+
+
+# 压测引擎：locust 为闭合模型（固定用户数，每个用户等上一个请求返回后再发下一个），
+# open 为内置的开放模型（按到达率发送，与响应快慢无关）
+ENGINES = ("locust", "open")
+
+# 分布式模式下等待所有 worker 连上 master 的最长时间，以及 master 结束后等待 worker 退出的时间（秒）
+WORKER_CONNECT_TIMEOUT = 60
+WORKER_EXIT_TIMEOUT = 10
+
+
+# 默认按 CPU 核数启动 worker；设为 0 时单进程运行
+DEFAULT_WORKERS = "auto"
+
+
+def resolve_workers(workers, users: int = None) -> int:
+    """workers 为 "auto" 时使用本机 CPU 核数（不超过用户数），0 表示单进程运行
+
+    只有一个核或一个用户时 master + 1 个 worker 没有收益，"auto" 退回单进程运行。
+    """
+    if workers == "auto":
+        workers = os.cpu_count() or 1
+        if users:
+            workers = min(workers, users)
+        return workers if workers > 1 else 0
+    return workers or 0
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def load_locust_stats(csv_prefix) -> Optional[Dict[str, Any]]:
+    """从 Locust 的 <prefix>_stats.csv 中读取汇总行和各请求的统计，分布式运行时为 master 合并后的结果"""
+    try:
+        with open(f"{csv_prefix}_stats.csv", encoding="utf-8", newline="") as f:
+            rows = list(csv.DictReader(f))
+    except OSError:
+        return None
+
+    def parse(row):
+        def number(key):
+            try:
+                return round(float(row.get(key) or 0), 2)
+            except ValueError:
+                return None
+        return {
+            "name": row.get("Name"),
+            "method": row.get("Type") or None,
+            "requests": int(number("Request Count") or 0),
+            "failures": int(number("Failure Count") or 0),
+            "rps": number("Requests/s"),
+            "latency_ms": {"p50": number("50%"), "p90": number("90%"), "p95": number("95%"),
+                           "p99": number("99%"), "p99.9": number("99.9%"),
+                           "max": number("Max Response Time"), "mean": number("Average Response Time")}
+        }
+
+    endpoints = [parse(row) for row in rows if row.get("Name") != "Aggregated"]
+    total = next((parse(row) for row in rows if row.get("Name") == "Aggregated"), None)
+    if total is None:
+        return None
+    return {
+        "engine": "locust",
+        "requests": total["requests"],
+        "failures": total["failures"],
+        "achieved_rate": total["rps"],
+        "latency_ms": total["latency_ms"],
+        "endpoints": endpoints
+    }
+
+
+# 默认思考时间（秒），每个虚拟用户两次请求之间随机等待 min~max 秒
+DEFAULT_THINK_TIME = {"min": 1, "max": 2.5}
+
+
+def validate_load_profile(test_config: Dict[str, Any]) -> Optional[str]:
+    """检查 engine / weights / names / think_time 及到达率配置，返回错误信息，配置有效时返回 None"""
+    weights = test_config.get("weights") or {}
+    if not isinstance(weights, dict) or not all(
+            str(key).isdigit() and isinstance(value, int) and value > 0 for key, value in weights.items()):
+        return "weights must map case ids to positive integers"
+
+    names = test_config.get("names") or {}
+    if not isinstance(names, dict) or not all(
+            str(key).isdigit() and isinstance(value, str) and value for key, value in names.items()):
+        return "names must map case ids to non-empty strings"
+
+    engine = test_config.get("engine", "locust")
+    if engine not in ENGINES:
+        return "Invalid engine"
+    workers = test_config.get("workers", DEFAULT_WORKERS)
+    if workers != "auto" and (not isinstance(workers, int) or isinstance(workers, bool) or workers < 0):
+        return "workers must be \"auto\" or a non-negative integer"
+
+    if engine == "open":
+        for key in ("max_in_flight", "pool_size"):
+            value = test_config.get(key, 1)
+            if not isinstance(value, int) or isinstance(value, bool) or value < 1:
+                return f"{key} must be a positive integer"
+        return ArrivalSchedule.validate(test_config)
+
+    think_time = test_config.get("think_time", DEFAULT_THINK_TIME)
+    if not isinstance(think_time, dict):
+        return "think_time must be an object"
+    if "pacing" in think_time:
+        if not isinstance(think_time["pacing"], (int, float)) or think_time["pacing"] < 0:
+            return "think_time.pacing must be a non-negative number"
+        return None
+    low, high = think_time.get("min", 0), think_time.get("max", think_time.get("min", 0))
+    if not all(isinstance(v, (int, float)) and v >= 0 for v in (low, high)) or low > high:
+        return "think_time needs 0 <= min <= max"
+    return None
 
 
 class PerformanceRunner:
@@ -9,44 +144,178 @@ class PerformanceRunner:
         self.report_base_dir = Path("reports/performance")
         self.report_base_dir.mkdir(parents=True, exist_ok=True)
 
-    def run_test(self, test_config):
+    def run_test(self, test_config, report_id=None, test_cases: List[Any] = None, sequential: bool = False,
+                 on_report_dir: Callable[[str], None] = None):
+        """test_cases 为压测的 API 用例；sequential 为 True 时按业务流程顺序执行，否则按权重随机选择；
+        on_report_dir 在报告目录创建后立即被调用，参数与返回值中的 report_path 相同"""
         # 创建测试目录
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        report_dir = self.report_base_dir / timestamp
-        report_dir.mkdir(parents=True, exist_ok=True)
+        report_dir = make_report_dir(self.report_base_dir)
+        if on_report_dir:
+            on_report_dir(str(report_dir))
+
+        if test_config.get("engine", "locust") == "open":
+            results = self.run_open_model(test_config, test_cases or [], report_dir, report_id)
+            return {
+                "report_path": str(report_dir),
+                "results": results,
+                "summary": results["summary"]
+            }
 
         # 生成Locustfile
-        locustfile = self.generate_locustfile(test_config, report_dir)
+        locustfile = self.generate_locustfile(test_config, report_dir, test_cases or [], sequential)
 
         # 运行Locust测试
-        results = self.run_locust(locustfile, test_config, report_dir)
+        results = self.run_locust(locustfile, test_config, report_dir, report_id)
 
         return {
             "report_path": str(report_dir),
-            "results": results
+            "results": results,
+            "summary": results.get("summary")
         }
 
-    def generate_locustfile(self, test_config, report_dir):
-        locustfile = report_dir / "locustfile.py"
+    def run_open_model(self, test_config, test_cases: List[Any], report_dir, report_id=None):
+        """用内置的开放模型引擎压测，统计结果写入报告目录的 stats.json，每秒各接口的延迟直方图写入 latency.hlog
 
-        # 简化版的Locustfile模板
-        locust_content = """
-from locust import HttpUser, task, between
+        开放模型中每个请求独立到达，选择业务流程时流程中的用例也按权重随机选择，不保持顺序。
+        """
+        generator = OpenModelGenerator(
+            test_cases,
+            ArrivalSchedule.from_config(test_config),
+            weights={int(key): value for key, value in (test_config.get("weights") or {}).items()},
+            names={int(key): value for key, value in (test_config.get("names") or {}).items()},
+            max_in_flight=test_config.get("max_in_flight", OPEN_MODEL_MAX_IN_FLIGHT),
+            pool_size=test_config.get("pool_size", OPEN_MODEL_POOL_SIZE),
+            histogram_log=HistogramLog(report_dir / HISTOGRAM_FILE)
+        )
 
-class QuickstartUser(HttpUser):
-    wait_time = between(1, 2.5)
+        stream = OutputStream(report_dir / "run.log")
+        feed = MetricsFeed(report_dir / METRICS_FILE)
+        generator.on_window = feed.publish
+        register_stream(report_id, stream)
+        register_feed(report_id, feed)
+        try:
+            summary = generator.run(stream)
+        finally:
+            stream.close()
+            feed.close()
+            unregister_stream(report_id)
+            unregister_feed(report_id)
 
-    @task
-    def hello_world(self):
-        self.client.get("/")
-"""
+        summary["stopped"] = stream.terminated
+        stats_path = report_dir / "stats.json"
+        with open(stats_path, "w", encoding="utf-8") as f:
+            json.dump(summary, f, ensure_ascii=False, indent=2)
 
-        with open(locustfile, 'w') as f:
-            f.write(locust_content)
+        return {
+            "summary": summary,
+            "stopped": stream.terminated,
+            "stats_path": str(stats_path),
+            "histogram_path": str(report_dir / HISTOGRAM_FILE),
+            "stdout": stream.tail(),
+            "log_path": str(stream.log_path)
+        }
+
+    def generate_locustfile(self, test_config, report_dir, test_cases: List[Any] = None, sequential: bool = False):
+        locustfile = report_dir / "locustfile.py"
+
+        with open(locustfile, 'w', encoding='utf-8') as f:
+            f.write(self.render_locustfile(test_config, test_cases or [], sequential))
+        # 统计插件导入的直方图模块，Locust 会把 locustfile 所在目录加入 sys.path
+        shutil.copy(latency_histogram.__file__, report_dir / "latency_histogram.py")
 
         return locustfile
 
-    def run_locust(self, locustfile, test_config, report_dir):
+    def render_locustfile(self, test_config, test_cases: List[Any], sequential: bool = False) -> str:
+        """根据 API 用例生成 Locust 用户类
+
+        - 每个用例一个任务，请求默认以用例名称命名，统计按名称分组（URL 中带 ID 也不会分散成多行）；
+          names（用例 id -> 名称）可以改名，同名的请求合并统计
+        - 响应按 API 测试的规则校验（成功状态码和 expected_data），不符合时记为失败
+        - 随机模式下任务按 weights（用例 id -> 权重，默认 1）选择；流程模式下按业务流程顺序依次执行
+        - think_time：{"min": 1, "max": 2.5} 随机等待，{"pacing": 5} 每轮任务固定间隔
+        """
+        weights = {int(key): value for key, value in (test_config.get("weights") or {}).items()}
+        names = {int(key): value for key, value in (test_config.get("names") or {}).items()}
+        think_time = test_config.get("think_time", DEFAULT_THINK_TIME)
+        if "pacing" in think_time:
+            wait_time = f"constant_pacing({think_time['pacing']!r})"
+        else:
+            low = think_time.get("min", 0)
+            high = think_time.get("max", low)
+            wait_time = f"constant({low!r})" if low == high else f"between({low!r}, {high!r})"
+
+        # 用例的 URL 是完整地址，host 只用于满足 Locust 的要求和报告展示
+        host = test_config.get("host")
+        if not host and test_cases:
+            parts = urlsplit(test_cases[0].url)
+            host = f"{parts.scheme}://{parts.netloc}" if parts.scheme else None
+
+        content = f'''
+from locust import HttpUser, SequentialTaskSet, task, between, constant, constant_pacing
+
+SUCCESS_STATUS_CODES = {tuple(SUCCESS_STATUS_CODES)!r}
+
+
+def send(client, name, method, url, headers, params, body, expected_data):
+    with client.request(method, url, name=name, headers=headers, params=params, json=body,
+                        catch_response=True) as response:
+        if response.status_code not in SUCCESS_STATUS_CODES:
+            response.failure(f"Expected success status code, got {{response.status_code}}")
+            return
+        if not expected_data:
+            response.success()
+            return
+        try:
+            actual_data = response.json() if response.content else {{}}
+        except ValueError:
+            response.failure("Response is not valid JSON")
+            return
+        for key, expected_value in expected_data.items():
+            if not isinstance(actual_data, dict) or key not in actual_data:
+                response.failure(f"Key '{{key}}' not found in response")
+                return
+            if actual_data[key] != expected_value:
+                response.failure(f"Value mismatch for key '{{key}}'")
+                return
+        response.success()
+
+'''
+
+        tasks = ""
+        for i, case in enumerate(test_cases):
+            decorator = "@task" if sequential else f"@task({weights.get(case.id, 1)})"
+            tasks += f'''
+    {decorator}
+    def case_{i}(self):
+        send(self.client, {names.get(case.id, case.case_name)!r}, {case.method.upper()!r}, {case.url!r},
+             {case.headers or {}!r}, {case.params or {}!r}, {case.body or None!r}, {case.expected_data or {}!r})
+'''
+
+        if sequential:
+            content += f'''
+class FlowTasks(SequentialTaskSet):
+{tasks}
+
+class FlowUser(HttpUser):
+    host = {host!r}
+    wait_time = {wait_time}
+    tasks = [FlowTasks]
+'''
+        else:
+            content += f'''
+class APIUser(HttpUser):
+    host = {host!r}
+    wait_time = {wait_time}
+{tasks}'''
+        # 实时指标插件：按秒统计请求数、错误数和延迟直方图
+        return content + LOCUST_METRICS_PLUGIN
+
+    def run_locust(self, locustfile, test_config, report_dir, report_id=None):
+        """运行 Locust；workers 默认为 "auto"（按 CPU 核数），大于 0 时启动一个 master 和 workers 个 worker 进程，
+        压力由各 worker 产生，统计由 master 合并后写入报告和 CSV"""
+        workers = resolve_workers(test_config.get("workers", DEFAULT_WORKERS), test_config.get("users", 10))
+        csv_prefix = report_dir / "locust"
+
         # 运行Locust
         cmd = [
             "locust",
@@ -55,13 +324,92 @@ class QuickstartUser(HttpUser):
             "--users", str(test_config.get("users", 10)),
             "--spawn-rate", str(test_config.get("spawn_rate", 2)),
             "--run-time", str(test_config.get("run_time", "1m")),
-            "--html", str(report_dir / "report.html")
+            "--html", str(report_dir / "report.html"),
+            "--csv", str(csv_prefix)
         ]
 
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        # 输出逐行写入输出流：内存只保留最近的行，完整内容写入轮转日志
+        stream = OutputStream(report_dir / "run.log")
+        # locustfile 中的统计插件每秒向 metrics.jsonl 追加一个窗口，后台线程读取后发布为实时指标
+        metrics_path = report_dir / METRICS_FILE
+        histogram_path = report_dir / HISTOGRAM_FILE
+        env = {**os.environ, "LOCUST_METRICS_FILE": str(metrics_path), "LOCUST_HISTOGRAM_FILE": str(histogram_path)}
+        feed = MetricsFeed()
+        tailer = MetricsFileTailer(metrics_path, feed)
+        register_stream(report_id, stream)
+        register_feed(report_id, feed)
+        tailer.start()
+        try:
+            if workers:
+                exit_code = self._run_distributed(cmd, locustfile, workers, stream, env)
+            else:
+                exit_code = run_streaming(cmd, stream, start_new_session=True, env=env)
+        finally:
+            tailer.stop()
+            stream.close()
+            feed.close()
+            unregister_stream(report_id)
+            unregister_feed(report_id)
 
+        # 被停止时 Locust 收到 SIGTERM 后仍会写出已有的统计
+        summary = load_locust_stats(csv_prefix)
+        if summary is not None:
+            summary["stopped"] = stream.terminated
         return {
-            "exit_code": result.returncode,
-            "stdout": result.stdout,
-            "stderr": result.stderr
-        }
\ No newline at end of file
+            "exit_code": exit_code,
+            "workers": workers,
+            "stopped": stream.terminated,
+            "summary": summary,
+            "histogram_path": str(histogram_path),
+            "stdout": stream.tail(),
+            "stderr": "",
+            "log_path": str(stream.log_path)
+        }
+
+    @staticmethod
+    def _run_distributed(cmd, locustfile, workers: int, stream: OutputStream, env=None) -> int:
+        """启动 master 和 worker 并监督它们的生命周期，返回 master 的退出码
+
+        master 等所有 worker 连上后才开始加压；master 结束后 worker 会收到退出消息，
+        超时仍未退出（例如 master 异常退出）的 worker 会被终止。
+        """
+        port = _free_port()
+        master_cmd = cmd + [
+            "--master",
+            "--master-bind-host", "127.0.0.1",
+            "--master-bind-port", str(port),
+            "--expect-workers", str(workers),
+            "--expect-workers-max-wait", str(WORKER_CONNECT_TIMEOUT)
+        ]
+        worker_cmd = [
+            "locust",
+            "-f", str(locustfile),
+            "--worker",
+            "--master-host", "127.0.0.1",
+            "--master-port", str(port)
+        ]
+
+        stream.write(f"🚀 分布式运行: 1 个 master，{workers} 个 worker")
+        # 每个进程单独一个进程组，停止时连同其派生的进程一起结束
+        processes = [(start_process(master_cmd, start_new_session=True, env=env), "[master] ")]
+        processes += [(start_process(worker_cmd, start_new_session=True, env=env), f"[worker-{i}] ")
+                      for i in range(workers)]
+        threads = []
+        for process, prefix in processes:
+            stream.attach(process)
+            thread = threading.Thread(target=stream.pump, args=(process.stdout, prefix), daemon=True)
+            thread.start()
+            threads.append(thread)
+
+        master = processes[0][0]
+        exit_code = master.wait()
+        for process, prefix in processes[1:]:
+            try:
+                process.wait(WORKER_EXIT_TIMEOUT)
+            except subprocess.TimeoutExpired:
+                stream.write(f"{prefix}未按时退出，强制终止")
+                process.kill()
+                process.wait()
+        for thread in threads:
+            thread.join()
+        return exit_code
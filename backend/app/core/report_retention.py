@@ -0,0 +1,290 @@
+import os
+import shutil
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.database import SessionLocal
+from app.models import TestReports, ReportArtifact, CaseRunHistory, Job
+from app.core.artifacts import REPORTS_ROOT
+from app.core.artifact_store import ArtifactStore
+from app.utils.file_utils import report_dir_of, REPORT_DIR_MARKER
+
+
+# 保留策略，0 表示不限制
+REPORT_KEEP_LAST = int(os.getenv("REPORT_KEEP_LAST", "0"))  # 每个项目每种测试类型保留最近 N 份报告
+REPORT_KEEP_DAYS = int(os.getenv("REPORT_KEEP_DAYS", "0"))  # 保留最近 N 天内的报告
+REPORT_DISK_QUOTA_MB = int(os.getenv("REPORT_DISK_QUOTA_MB", "0"))  # 报告目录和附件存储的总磁盘配额
+
+REPORT_GC_INTERVAL = float(os.getenv("REPORT_GC_INTERVAL", "600"))
+# 每轮最多删除的报告数，以及每删除一份报告后的停顿（秒），避免长时间占用磁盘和数据库
+REPORT_GC_BATCH = int(os.getenv("REPORT_GC_BATCH", "50"))
+REPORT_GC_PAUSE = 0.2
+# 修改时间在这之内的孤立 blob 不删除，可能属于还在建立索引的运行
+ORPHAN_BLOB_GRACE = 3600
+# 修改时间在这之内的孤立报告目录不删除，可能刚创建、报告路径还未写入
+ORPHAN_DIR_GRACE = 3600
+# reports 目录下各测试类型的子目录，其中每个运行一个报告目录
+REPORT_TYPE_DIRS = ("api", "ui", "performance")
+
+# 仍在排队或运行的报告不会被清理
+ACTIVE_STATUSES = ("queued", "running")
+
+
+def dir_size(path: Path) -> int:
+    total = 0
+    for root, _, files in os.walk(path):
+        for name in files:
+            try:
+                total += os.lstat(os.path.join(root, name)).st_size
+            except OSError:
+                continue
+    return total
+
+
+def _safe_report_dir(report_path) -> Optional[Path]:
+    """报告目录必须位于 reports 目录下，防止异常的 report_path 删到其他目录"""
+    report_dir = report_dir_of(report_path)
+    if report_dir is None:
+        return None
+    root = os.path.realpath(REPORTS_ROOT)
+    resolved = os.path.realpath(report_dir)
+    if not resolved.startswith(root + os.sep):
+        return None
+    return Path(resolved)
+
+
+def delete_report(db: Session, report: TestReports) -> int:
+    """删除报告目录和报告记录，用例耗时历史和任务记录保留但不再指向该报告，返回释放的目录字节数"""
+    freed = 0
+    report_dir = _safe_report_dir(report.report_path)
+    if report_dir is not None and report_dir.is_dir():
+        freed = dir_size(report_dir)
+        shutil.rmtree(report_dir, ignore_errors=True)
+
+    db.query(ReportArtifact).filter(ReportArtifact.report_id == report.id).delete(synchronize_session=False)
+    db.query(CaseRunHistory).filter(CaseRunHistory.report_id == report.id).update(
+        {"report_id": None}, synchronize_session=False
+    )
+    db.query(Job).filter(Job.report_id == report.id).update({"report_id": None}, synchronize_session=False)
+    db.delete(report)
+    db.commit()
+    return freed
+
+
+class RetentionPolicy:
+    def __init__(self, keep_last: int = REPORT_KEEP_LAST, keep_days: int = REPORT_KEEP_DAYS,
+                 disk_quota_mb: int = REPORT_DISK_QUOTA_MB):
+        self.keep_last = max(0, keep_last)
+        self.keep_days = max(0, keep_days)
+        self.disk_quota_bytes = max(0, disk_quota_mb) * 1024 * 1024
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.keep_last or self.keep_days or self.disk_quota_bytes)
+
+    def expired_reports(self, db: Session, limit: int) -> List[int]:
+        """超过保留数量或保留天数的报告 id，按创建时间从旧到新"""
+        finished = db.query(TestReports).filter(~TestReports.status.in_(ACTIVE_STATUSES))
+        expired = set()
+        if self.keep_days:
+            cutoff = datetime.now() - timedelta(days=self.keep_days)
+            expired.update(id for (id,) in finished.filter(TestReports.created_at < cutoff).with_entities(
+                TestReports.id).order_by(TestReports.id).limit(limit).all())
+
+        if self.keep_last:
+            # 每个项目每种测试类型只保留最近 keep_last 份，报告数超出的分组才需要逐个查询
+            groups = db.query(TestReports.project_id, TestReports.test_type).group_by(
+                TestReports.project_id, TestReports.test_type
+            ).having(func.count(TestReports.id) > self.keep_last).all()
+            for project_id, test_type in groups:
+                if len(expired) >= limit:
+                    break
+                # 第 keep_last 新的报告 id，比它旧的都超出保留数量（MySQL 不支持 IN 子查询中的 LIMIT）
+                (threshold,) = db.query(TestReports.id).filter(
+                    TestReports.project_id == project_id, TestReports.test_type == test_type
+                ).order_by(TestReports.id.desc()).offset(self.keep_last - 1).first()
+                expired.update(id for (id,) in finished.filter(
+                    TestReports.project_id == project_id,
+                    TestReports.test_type == test_type,
+                    TestReports.id < threshold
+                ).with_entities(TestReports.id).order_by(TestReports.id).limit(limit).all())
+        return sorted(expired)[:limit]
+
+
+class ReportCollector:
+    """后台清理线程：按保留策略和磁盘配额分批删除旧报告，再清理不再被引用的附件 blob
+
+    每轮最多删除 batch 份报告，每删除一份后短暂停顿；删不完的留到下一轮，不会长时间阻塞服务。
+    """
+
+    def __init__(self, policy: Optional[RetentionPolicy] = None, interval: float = REPORT_GC_INTERVAL,
+                 batch: int = REPORT_GC_BATCH, store: Optional[ArtifactStore] = None):
+        self.policy = policy or RetentionPolicy()
+        self.interval = interval
+        self.batch = max(1, batch)
+        self.store = store or ArtifactStore()
+        self._stop = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._loop, name="report-collector", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def _loop(self):
+        while not self._stop.wait(self.interval):
+            try:
+                self.collect()
+            except Exception:
+                traceback.print_exc()
+
+    def disk_usage(self) -> int:
+        return dir_size(REPORTS_ROOT) + dir_size(self.store.root)
+
+    def collect(self) -> Dict[str, int]:
+        """执行一轮清理，返回删除的报告数、孤立目录数、孤立 blob 数和释放的字节数"""
+        stats = {"reports": 0, "dirs": 0, "blobs": 0, "freed_bytes": 0}
+        db = SessionLocal()
+        try:
+            dirs, dir_bytes = self.remove_orphan_dirs(db)
+            stats["dirs"] += dirs
+            stats["freed_bytes"] += dir_bytes
+
+            for report_id in self.policy.expired_reports(db, self.batch):
+                if self._stop.is_set():
+                    break
+                stats["freed_bytes"] += self._delete(db, report_id)
+                stats["reports"] += 1
+
+            if self.policy.disk_quota_bytes:
+                usage = self.disk_usage()
+                while usage > self.policy.disk_quota_bytes and stats["reports"] < self.batch \
+                        and not self._stop.is_set():
+                    # 超出配额时从最旧的已结束报告开始删除，没有报告目录的记录不占磁盘，不参与
+                    oldest = db.query(TestReports.id).filter(
+                        ~TestReports.status.in_(ACTIVE_STATUSES),
+                        TestReports.report_path.isnot(None)
+                    ).order_by(TestReports.id).first()
+                    if oldest is None:
+                        break
+                    freed = self._delete(db, oldest[0])
+                    stats["reports"] += 1
+                    stats["freed_bytes"] += freed
+                    usage -= freed
+                    # 被删除报告独占的 blob 立即清理，配额计算才准确
+                    blobs, blob_bytes = self.remove_orphan_blobs(db)
+                    stats["blobs"] += blobs
+                    stats["freed_bytes"] += blob_bytes
+                    usage -= blob_bytes
+                    if not freed and not blob_bytes:
+                        # 删除报告没有释放空间：占用来自报告记录之外（例如宽限期内的目录或 blob），
+                        # 继续删除只会清空报告而配额仍然超出
+                        print(f"⚠ 磁盘占用仍超出配额 {self.policy.disk_quota_bytes // 1024 // 1024} MB，"
+                              f"但删除报告已无法释放空间，停止本轮按配额清理")
+                        break
+
+            blobs, blob_bytes = self.remove_orphan_blobs(db)
+            stats["blobs"] += blobs
+            stats["freed_bytes"] += blob_bytes
+        finally:
+            db.close()
+
+        if stats["reports"] or stats["dirs"] or stats["blobs"]:
+            print(f"🧹 报告清理: 删除 {stats['reports']} 份报告、{stats['dirs']} 个孤立目录、{stats['blobs']} 个附件，"
+                  f"释放 {stats['freed_bytes'] / 1024 / 1024:.1f} MB")
+        return stats
+
+    def _delete(self, db: Session, report_id: int) -> int:
+        report = db.query(TestReports).filter(TestReports.id == report_id).first()
+        if report is None or report.status in ACTIVE_STATUSES:
+            return 0
+        freed = delete_report(db, report)
+        time.sleep(REPORT_GC_PAUSE)
+        return freed
+
+    def remove_orphan_dirs(self, db: Session, grace: float = ORPHAN_DIR_GRACE):
+        """删除没有任何报告记录引用的报告目录（例如报告记录已删除、或中途失败的运行），返回 (删除数量, 释放字节数)
+
+        只处理 make_report_dir 创建的（带标记文件的）目录，手动放入或随代码提交的目录不会被删除。
+        """
+        referenced = set()
+        for (report_path,) in db.query(TestReports.report_path).filter(TestReports.report_path.isnot(None)).all():
+            report_dir = report_dir_of(report_path)
+            if report_dir is not None:
+                referenced.add(os.path.realpath(report_dir))
+        now = time.time()
+        removed, freed = 0, 0
+        for type_dir in REPORT_TYPE_DIRS:
+            base = REPORTS_ROOT / type_dir
+            if not base.is_dir():
+                continue
+            for report_dir in base.iterdir():
+                if self._stop.is_set():
+                    return removed, freed
+                if not report_dir.is_dir() or report_dir.is_symlink():
+                    continue
+                if not (report_dir / REPORT_DIR_MARKER).is_file():
+                    continue
+                if os.path.realpath(report_dir) in referenced:
+                    continue
+                try:
+                    if now - report_dir.stat().st_mtime < grace:
+                        continue
+                except OSError:
+                    continue
+                freed += dir_size(report_dir)
+                shutil.rmtree(report_dir, ignore_errors=True)
+                removed += 1
+        return removed, freed
+
+    def remove_orphan_blobs(self, db: Session, grace: float = ORPHAN_BLOB_GRACE):
+        """删除没有任何附件索引引用的 blob，返回 (删除数量, 释放字节数)"""
+        referenced = {checksum for (checksum,) in db.query(ReportArtifact.checksum).distinct().all()}
+        now = time.time()
+        removed, freed = 0, 0
+        for checksum, blob in self.store.iter_blobs():
+            if checksum in referenced:
+                continue
+            try:
+                if now - blob.stat().st_mtime < grace:
+                    continue
+                freed += blob.stat().st_size
+                blob.unlink()
+                removed += 1
+            except OSError:
+                continue
+        return removed, freed
+
+
+_collector: Optional[ReportCollector] = None
+
+
+def start_collector() -> Optional[ReportCollector]:
+    global _collector
+    if _collector is None:
+        policy = RetentionPolicy()
+        if not policy.enabled:
+            return None
+        _collector = ReportCollector(policy)
+        _collector.start()
+        print(f"✓ 报告清理已启动: 保留最近 {policy.keep_last or '不限'} 份、{policy.keep_days or '不限'} 天，"
+              f"磁盘配额 {REPORT_DISK_QUOTA_MB or '不限'} MB")
+    return _collector
+
+
+def stop_collector():
+    global _collector
+    if _collector is not None:
+        _collector.stop()
+        _collector = None
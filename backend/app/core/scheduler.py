@@ -0,0 +1,37 @@
+import heapq
+from typing import List, Dict, Any, Optional
+
+
+SHARD_STRATEGIES = ("round_robin", "duration")
+
+
+def shard_cases(test_cases: List[Any], shards: int, strategy: str = "round_robin",
+                durations: Optional[Dict[int, float]] = None) -> List[List[Any]]:
+    """把用例分配到多个分片，空分片会被丢弃"""
+    if not isinstance(shards, int) or isinstance(shards, bool):
+        raise ValueError("shards must be an integer")
+    shards = max(1, min(shards, len(test_cases)))
+    if strategy == "duration":
+        buckets = _balance_by_duration(test_cases, shards, durations or {})
+    else:
+        buckets = [test_cases[i::shards] for i in range(shards)]
+
+    return [bucket for bucket in buckets if bucket]
+
+
+def _balance_by_duration(test_cases: List[Any], shards: int, durations: Dict[int, float]) -> List[List[Any]]:
+    """最长处理时间优先：按历史耗时降序，每次放入当前总耗时最小的分片"""
+    known = sorted(durations[case.id] for case in test_cases if case.id in durations)
+    # 没有历史记录的用例按已知耗时的中位数估算
+    default = known[len(known) // 2] if known else 1.0
+
+    ordered = sorted(test_cases, key=lambda case: durations.get(case.id, default), reverse=True)
+    buckets = [[] for _ in range(shards)]
+    loads = [(0.0, i) for i in range(shards)]
+    heapq.heapify(loads)
+    for case in ordered:
+        load, index = heapq.heappop(loads)
+        buckets[index].append(case)
+        heapq.heappush(loads, (load + durations.get(case.id, default), index))
+
+    return buckets
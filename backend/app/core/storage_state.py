@@ -0,0 +1,65 @@
+import json
+import os
+import time
+from pathlib import Path
+from typing import Optional
+
+
+STORAGE_STATE_DIR = os.getenv("STORAGE_STATE_DIR", "cache/storage_state")
+DEFAULT_STORAGE_STATE_TTL = int(os.getenv("UI_STORAGE_STATE_TTL", "3600"))
+
+
+class StorageStateCache:
+    """按项目缓存登录用例执行后的 Playwright storage state（cookies 和 localStorage）
+
+    state 文件本身可直接作为 new_context(storage_state=...) 的参数；旁边的 meta 文件记录
+    生成时间和登录用例的内容哈希，超过 TTL 或登录用例被修改后缓存失效。
+    文件中包含会话凭据，只允许服务进程所属用户读写。
+    """
+
+    def __init__(self, cache_dir: str = STORAGE_STATE_DIR):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+
+    def state_path(self, project_id: int) -> Path:
+        return self.cache_dir / f"project_{project_id}.json"
+
+    def _meta_path(self, project_id: int) -> Path:
+        return self.cache_dir / f"project_{project_id}.meta.json"
+
+    def load(self, project_id: int, fingerprint: str, ttl: int) -> Optional[Path]:
+        """返回仍然有效的 state 文件路径，没有缓存、已过期或登录用例已修改时返回 None"""
+        state_path = self.state_path(project_id)
+        try:
+            with open(self._meta_path(project_id), encoding="utf-8") as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if not state_path.exists() or meta.get("fingerprint") != fingerprint:
+            return None
+        if time.time() - meta.get("created_at", 0) > ttl:
+            return None
+        return state_path
+
+    def save(self, project_id: int, fingerprint: str, state: dict) -> Path:
+        state_path = self.state_path(project_id)
+        self._write(state_path, state)
+        self._write(self._meta_path(project_id), {"fingerprint": fingerprint, "created_at": time.time()})
+        return state_path
+
+    def invalidate(self, project_id: int) -> bool:
+        removed = False
+        for path in (self.state_path(project_id), self._meta_path(project_id)):
+            if path.exists():
+                path.unlink()
+                removed = True
+        return removed
+
+    @staticmethod
+    def _write(path: Path, data: dict):
+        # 先写临时文件再原子替换，并发运行读取时不会读到半截文件
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+        fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
@@ -0,0 +1,288 @@
+import asyncio
+import os
+import textwrap
+import time
+import traceback
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from app.core.allure_results import write_result
+from app.core.browser_pool import BrowserPool, DEFAULT_RECYCLE_AFTER
+from app.core.output_stream import OutputStream
+from app.core.ui_steps import StepInterpreter
+from app.core.module_cache import fingerprint
+from app.core.storage_state import StorageStateCache, DEFAULT_STORAGE_STATE_TTL
+from app.core.network_rules import RouteRules
+
+
+DEFAULT_CONCURRENCY = int(os.getenv("UI_CONCURRENCY", "4"))
+DEFAULT_BROWSERS = int(os.getenv("UI_BROWSERS", "1"))
+# 内存预算按经验值估算：每个浏览器进程的基础占用 + 每个并发 context（含一个页面）的占用
+BROWSER_MEMORY_MB = int(os.getenv("UI_BROWSER_MEMORY_MB", "300"))
+CONTEXT_MEMORY_MB = int(os.getenv("UI_CONTEXT_MEMORY_MB", "150"))
+# 可用内存低于该值时暂停启动新的用例，等正在运行的用例结束
+MEMORY_RESERVE_MB = int(os.getenv("UI_MEMORY_RESERVE_MB", "256"))
+MEMORY_WAIT_INTERVAL = 0.5
+
+# 截图和录制策略：always 每个用例都保存；on-failure 只保存失败用例的；off 不录制也不截图
+CAPTURE_POLICIES = ("always", "on-failure", "off")
+DEFAULT_CAPTURE_POLICY = os.getenv("UI_CAPTURE_POLICY", "on-failure")
+
+# 登录用例这些字段变化后，缓存的 storage state 失效
+SETUP_CASE_FIELDS = ("id", "base_url", "script_content", "steps")
+
+
+def total_memory_mb() -> Optional[int]:
+    try:
+        return os.sysconf("SC_PHYS_PAGES") * os.sysconf("SC_PAGE_SIZE") // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def available_memory_mb() -> Optional[int]:
+    """读取 /proc/meminfo 中的 MemAvailable，非 Linux 系统返回 None"""
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) // 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def default_memory_limit_mb() -> int:
+    """单次运行的内存上限：UI_MEMORY_LIMIT_MB，未配置时取物理内存的一半"""
+    configured = os.getenv("UI_MEMORY_LIMIT_MB")
+    if configured:
+        return int(configured)
+    total = total_memory_mb()
+    return total // 2 if total else 2048
+
+
+def plan_concurrency(concurrency: int, browsers: int, memory_limit_mb: int) -> Tuple[int, int]:
+    """在内存上限内确定实际的并发数和浏览器进程数，返回 (concurrency, browsers)"""
+    concurrency = max(1, concurrency)
+    browsers = max(1, min(browsers, concurrency))
+    max_browsers = max(1, memory_limit_mb // (BROWSER_MEMORY_MB + CONTEXT_MEMORY_MB))
+    browsers = min(browsers, max_browsers)
+    max_concurrency = max(1, (memory_limit_mb - browsers * BROWSER_MEMORY_MB) // CONTEXT_MEMORY_MB)
+    return min(concurrency, max_concurrency), browsers
+
+
+def compile_script(script_content: str) -> Callable:
+    """把用例的 script_content 编译为 async def (page, context) 函数，变量与生成的 pytest 模块一致"""
+    body = textwrap.indent(textwrap.dedent(script_content or "pass"), " " * 4)
+    source = f"async def ui_case(page, context):\n{body}\n"
+    namespace: Dict[str, Any] = {"asyncio": asyncio, "os": os}
+    exec(compile(source, "<ui_script>", "exec"), namespace)
+    return namespace["ui_case"]
+
+
+class UIInlineExecutor:
+    """在一个事件循环中并发执行UI用例：每个用例一个独立的 BrowserContext，分布在多个浏览器进程上
+
+    用例有 steps 时由 StepInterpreter 逐步执行并记录每步耗时，没有 steps 时回退为执行 script_content。
+    不经过 pytest，结果直接写成 allure-results 格式，报告、摘要和耗时历史的处理与 pytest 执行方式相同。
+    """
+
+    def __init__(self, concurrency: int = DEFAULT_CONCURRENCY, browsers: int = DEFAULT_BROWSERS,
+                 memory_limit_mb: Optional[int] = None, recycle_after: int = DEFAULT_RECYCLE_AFTER,
+                 capture_policy: str = DEFAULT_CAPTURE_POLICY, setup_case: Any = None, project_id: Optional[int] = None,
+                 storage_state_ttl: int = DEFAULT_STORAGE_STATE_TTL, refresh_storage_state: bool = False,
+                 route_rules: Optional[Dict[str, Any]] = None):
+        self.memory_limit_mb = memory_limit_mb or default_memory_limit_mb()
+        self.concurrency, self.browsers = plan_concurrency(concurrency, browsers, self.memory_limit_mb)
+        self.recycle_after = recycle_after
+        self.capture_policy = capture_policy
+        # 项目的登录用例：执行一次后缓存 storage state，本次及之后的运行都用它初始化 context
+        self.setup_case = setup_case
+        self.project_id = project_id
+        self.storage_state_ttl = storage_state_ttl
+        self.refresh_storage_state = refresh_storage_state
+        self.storage_state_cache = StorageStateCache()
+        self.context_options: Dict[str, Any] = {}
+        # 项目的请求路由规则：屏蔽资源、缓存静态资源；缓存在本次运行的所有 context 之间共享
+        self.route_rules = RouteRules.from_config(route_rules)
+        if self.route_rules:
+            # service worker 发出的请求不经过 context.route，需要禁用
+            self.context_options["service_workers"] = "block"
+
+    def run(self, test_cases: List[Any], report_dir: Path, results_dir: Path, stream: OutputStream) -> Dict[str, Any]:
+        return asyncio.run(self._run(test_cases, Path(report_dir), Path(results_dir), stream))
+
+    async def _run(self, test_cases, report_dir, results_dir, stream) -> Dict[str, Any]:
+        stream.write(f"running {len(test_cases)} cases: concurrency={self.concurrency}, "
+                     f"browsers={self.browsers}, memory_limit={self.memory_limit_mb}MB, capture={self.capture_policy}")
+        queue: asyncio.Queue = asyncio.Queue()
+        for index, case in enumerate(test_cases):
+            queue.put_nowait((index, case))
+
+        counts = {"passed": 0, "failed": 0, "broken": 0}
+        running = [0]
+
+        async def worker():
+            while not queue.empty():
+                # 取消运行时不再启动新的用例
+                if stream.terminated:
+                    return
+                await self._wait_for_memory(running)
+                try:
+                    index, case = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                running[0] += 1
+                try:
+                    status = await self._run_case(pool, index, case, report_dir, results_dir, stream)
+                    counts[status] += 1
+                finally:
+                    running[0] -= 1
+
+        async with BrowserPool(size=self.browsers, recycle_after=self.recycle_after) as pool:
+            if self.setup_case is not None:
+                state_path = await self._resolve_storage_state(pool, stream)
+                self.context_options["storage_state"] = str(state_path)
+            await asyncio.gather(*(worker() for _ in range(min(self.concurrency, len(test_cases)))))
+            pool_stats = dict(pool.stats)
+
+        route_stats = self.route_rules.stats if self.route_rules else None
+        if route_stats:
+            stream.write(f"route rules: {route_stats}")
+        return {"concurrency": self.concurrency, "browsers": self.browsers, "memory_limit_mb": self.memory_limit_mb,
+                "browser_pool": pool_stats, "route_stats": route_stats, **counts}
+
+    def storage_state_for(self, stream: OutputStream) -> Path:
+        """同步获取登录用例的 storage state 文件，缓存失效时临时启动一个浏览器执行登录用例"""
+        async def resolve():
+            async with BrowserPool(size=1, recycle_after=self.recycle_after) as pool:
+                return await self._resolve_storage_state(pool, stream)
+
+        return self._cached_storage_state(stream) or asyncio.run(resolve())
+
+    def _cached_storage_state(self, stream: OutputStream) -> Optional[Path]:
+        if self.refresh_storage_state:
+            return None
+        state_path = self.storage_state_cache.load(
+            self.project_id, fingerprint(self.setup_case, SETUP_CASE_FIELDS), self.storage_state_ttl
+        )
+        if state_path:
+            stream.write(f"[setup] reuse cached storage state of case {self.setup_case.id}")
+        return state_path
+
+    async def _resolve_storage_state(self, pool: BrowserPool, stream: OutputStream) -> Path:
+        """返回有效的 storage state 文件；没有缓存时执行登录用例并保存其结束时的 cookies 和 localStorage"""
+        state_path = self._cached_storage_state(stream)
+        if state_path:
+            return state_path
+
+        case = self.setup_case
+        start = time.time()
+        async with pool.context(**self.context_options) as context:
+            if self.route_rules:
+                await self.route_rules.apply(context)
+            page = await context.new_page()
+            try:
+                await self._execute(page, context, case)
+            except Exception as e:
+                stream.write(f"[setup] case {case.id} {case.case_name} failed: {type(e).__name__}: {e}")
+                raise RuntimeError(f"Setup case {case.id} failed: {e}") from e
+            state = await context.storage_state()
+
+        self.refresh_storage_state = False
+        stream.write(f"[setup] case {case.id} {case.case_name} passed ({int((time.time() - start) * 1000)}ms), "
+                     f"storage state cached for {self.storage_state_ttl}s")
+        return self.storage_state_cache.save(self.project_id, fingerprint(case, SETUP_CASE_FIELDS), state)
+
+    @staticmethod
+    async def _execute(page, context, case, interpreter: Optional[StepInterpreter] = None):
+        """执行一个用例：有 steps 时用 StepInterpreter 逐步执行，否则执行 script_content"""
+        if isinstance(case.steps, list) and case.steps:
+            interpreter = interpreter or StepInterpreter(page, case.base_url)
+            await interpreter.run(case.steps)
+        else:
+            script = compile_script(case.script_content)
+            await script(page, context)
+
+    @staticmethod
+    async def _wait_for_memory(running: List[int]):
+        """系统可用内存不足时等待；没有正在运行的用例时直接放行，保证总能向前推进
+
+        running 为共享的计数（[正在运行的用例数]），每次检查都重新读取，等待期间其他用例结束后即可放行。
+        """
+        while running[0] > 0:
+            available = available_memory_mb()
+            if available is None or available >= MEMORY_RESERVE_MB + CONTEXT_MEMORY_MB:
+                return
+            await asyncio.sleep(MEMORY_WAIT_INTERVAL)
+
+    async def _run_case(self, pool: BrowserPool, index: int, case: Any, report_dir: Path,
+                        results_dir: Path, stream: OutputStream) -> str:
+        screenshot_dir = report_dir / "screenshots"
+        attachments = []
+        message = trace = None
+        start = int(time.time() * 1000)
+
+        interpreter = None
+        status = None
+        try:
+            async with pool.context(**self.context_options) as context:
+                if self.route_rules:
+                    await self.route_rules.apply(context)
+                page = await context.new_page()
+                if self.capture_policy != "off":
+                    # on-failure 时录制只保存在浏览器内存中，用例通过后直接丢弃
+                    await context.tracing.start(screenshots=True, snapshots=True, sources=True)
+                if isinstance(case.steps, list) and case.steps:
+                    interpreter = StepInterpreter(page, case.base_url, screenshot_dir,
+                                                  name_prefix=f"case_{case.id}_step")
+                try:
+                    await self._execute(page, context, case, interpreter)
+                    status = "passed"
+                except Exception as e:
+                    status = "failed" if isinstance(e, AssertionError) else "broken"
+                    message, trace = f"{type(e).__name__}: {e}", traceback.format_exc()
+
+                if interpreter:
+                    attachments.extend(interpreter.attachments)
+                if self.capture_policy == "always" or (self.capture_policy == "on-failure" and status != "passed"):
+                    suffix = "success" if status == "passed" else "failure"
+                    screenshot = screenshot_dir / f"case_{case.id}_{suffix}.png"
+                    trace_path = report_dir / f"case_{case.id}_trace.zip"
+                    try:
+                        screenshot_dir.mkdir(parents=True, exist_ok=True)
+                        await page.screenshot(path=str(screenshot))
+                        attachments.append({"name": screenshot.name, "path": str(screenshot), "type": "image/png"})
+                        await context.tracing.stop(path=str(trace_path))
+                        attachments.append({"name": trace_path.name, "path": str(trace_path), "type": "application/zip"})
+                    except Exception as e:
+                        stream.write(f"[case {case.id}] capture failed: {e}")
+                elif self.capture_policy == "on-failure":
+                    await context.tracing.stop()
+        except Exception as e:
+            # 浏览器崩溃、context 创建或回收失败：记为 broken 并照常写入结果，不影响其余用例
+            stream.write(f"[case {case.id}] browser error: {type(e).__name__}: {e}")
+            if status is None:
+                status = "broken"
+                message, trace = f"{type(e).__name__}: {e}", traceback.format_exc()
+
+        stop = int(time.time() * 1000)
+        write_result(
+            results_dir,
+            name=f"test_case_{index}",
+            status=status,
+            start=start,
+            stop=stop,
+            labels={"feature": "UI Tests", "story": case.case_name, "as_id": case.id, "framework": "playwright"},
+            message=message,
+            trace=trace,
+            attachments=attachments,
+            steps=interpreter.timings if interpreter else None
+        )
+        if interpreter:
+            for timing in interpreter.timings:
+                stream.write(f"[case {case.id}]   step {timing['index']} {timing['action']} "
+                             f"{timing['status']} ({timing['duration']}ms)")
+        stream.write(f"[case {case.id}] {case.case_name} {status.upper()} ({stop - start}ms)")
+        if message:
+            stream.write(f"[case {case.id}] {message}")
+        return status
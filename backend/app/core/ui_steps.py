@@ -0,0 +1,106 @@
+import os
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+from urllib.parse import urljoin
+
+from playwright.async_api import expect
+
+
+DEFAULT_STEP_TIMEOUT = int(os.getenv("UI_STEP_TIMEOUT_MS", "30000"))
+
+# 与前端步骤编辑器一致的动作：{"action": ..., "selector": ..., "value": ...}
+STEP_ACTIONS = ("goto", "click", "fill", "press", "hover", "check", "select",
+                "waitForSelector", "wait", "assert", "expect", "screenshot")
+
+
+class StepError(AssertionError):
+    """步骤执行失败，message 中带上步骤序号和动作，便于在报告中定位"""
+
+
+class StepInterpreter:
+    """直接在页面上执行 UIInfo.steps 中的动作，不生成代码；每个步骤记录耗时和状态"""
+
+    def __init__(self, page, base_url: Optional[str] = None, screenshot_dir: Optional[Path] = None,
+                 name_prefix: str = "step", timeout: int = DEFAULT_STEP_TIMEOUT):
+        self.page = page
+        self.base_url = base_url
+        self.screenshot_dir = Path(screenshot_dir) if screenshot_dir else None
+        self.name_prefix = name_prefix
+        self.timeout = timeout
+        self.timings: List[Dict[str, Any]] = []
+        self.attachments: List[Dict[str, str]] = []
+
+    async def run(self, steps: List[Dict[str, Any]]):
+        # 与前端生成的脚本一致：先打开 base_url，除非第一步就是导航
+        if self.base_url and not (steps and steps[0].get("action") == "goto"):
+            steps = [{"action": "goto", "selector": "", "value": self.base_url}] + list(steps)
+
+        for index, step in enumerate(steps, start=1):
+            action = step.get("action")
+            start = int(time.time() * 1000)
+            timing = {"index": index, "action": action, "selector": step.get("selector") or "",
+                      "value": step.get("value") or "", "start": start}
+            self.timings.append(timing)
+            try:
+                await self._run_step(index, action, step.get("selector") or "", step.get("value") or "")
+                timing["status"] = "passed"
+            except Exception as e:
+                timing["status"] = "failed" if isinstance(e, AssertionError) else "broken"
+                timing["message"] = f"{type(e).__name__}: {e}"
+                if isinstance(e, AssertionError) and not isinstance(e, StepError):
+                    raise StepError(f"step {index} ({action}) failed: {e}") from e
+                raise
+            finally:
+                timing["stop"] = int(time.time() * 1000)
+                timing["duration"] = timing["stop"] - start
+
+    async def _run_step(self, index: int, action: str, selector: str, value: str):
+        page = self.page
+        if action not in STEP_ACTIONS:
+            raise ValueError(f"Unsupported step action '{action}'")
+
+        if action == "goto":
+            url = urljoin(self.base_url, value) if self.base_url else value
+            await page.goto(url, timeout=self.timeout)
+        elif action == "click":
+            await page.locator(selector).click(timeout=self.timeout)
+        elif action == "fill":
+            await page.locator(selector).fill(value, timeout=self.timeout)
+        elif action == "press":
+            await page.locator(selector).press(value, timeout=self.timeout)
+        elif action == "hover":
+            await page.locator(selector).hover(timeout=self.timeout)
+        elif action == "check":
+            await page.locator(selector).check(timeout=self.timeout)
+        elif action == "select":
+            await page.locator(selector).select_option(value, timeout=self.timeout)
+        elif action == "waitForSelector":
+            await page.locator(selector).wait_for(timeout=self.timeout)
+        elif action == "wait":
+            await page.wait_for_timeout(float(value or 0))
+        elif action in ("assert", "expect"):
+            await self._assert(selector, value)
+        elif action == "screenshot":
+            if self.screenshot_dir is None:
+                return
+            self.screenshot_dir.mkdir(parents=True, exist_ok=True)
+            path = self.screenshot_dir / f"{self.name_prefix}_{index}.png"
+            if selector:
+                await page.locator(selector).screenshot(path=str(path), timeout=self.timeout)
+            else:
+                await page.screenshot(path=str(path), full_page=value == "full")
+            self.attachments.append({"name": path.name, "path": str(path), "type": "image/png"})
+
+    async def _assert(self, selector: str, value: str):
+        """有选择器时断言元素可见（给了 value 则断言包含该文本），否则断言页面中出现 value 文本"""
+        if selector:
+            locator = expect(self.page.locator(selector))
+            if value:
+                await locator.to_contain_text(value, timeout=self.timeout)
+            else:
+                await locator.to_be_visible(timeout=self.timeout)
+        elif value:
+            await expect(self.page.locator("body")).to_contain_text(value, timeout=self.timeout)
+        else:
+            raise ValueError("assert step needs a selector or a value")
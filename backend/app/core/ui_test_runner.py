@@ -1,27 +1,45 @@
-import pytest
-import allure
-import asyncio
-from datetime import datetime
 from pathlib import Path
-import subprocess
 import sys
-from playwright.async_api import async_playwright
 import os
+import json
+import hashlib
+import textwrap
+from app.core.module_cache import ModuleCache
+from app.core.ui_executor import UIInlineExecutor, DEFAULT_CONCURRENCY, DEFAULT_BROWSERS, DEFAULT_CAPTURE_POLICY
+from app.core.allure_results import write_summary
+from app.utils.file_utils import make_report_dir
+from app.core.output_stream import OutputStream, register_stream, unregister_stream, run_streaming
+
+
+# 参与模块缓存键计算的用例字段
+CACHE_KEY_FIELDS = ("id", "case_name", "base_url", "script_content", "steps")
+# 模板随本文件变化，文件内容变了缓存自动失效
+TEMPLATE_HASH = hashlib.sha256(Path(__file__).read_bytes()).hexdigest()[:12]
+# 生成的模块从 app.core.browser_pool 导入浏览器池，子进程需要能找到 app 包
+BACKEND_ROOT = Path(__file__).resolve().parents[2]
 
 
 class UITestRunner:
     def __init__(self):
         self.report_base_dir = Path("reports/ui")
         self.report_base_dir.mkdir(parents=True, exist_ok=True)
-
-    def run_tests(self, test_cases):
+        self.module_cache = ModuleCache()
+
+    def run_tests(self, test_cases, report_id=None, pool_size=None, recycle_after=None,
+                  capture_policy=DEFAULT_CAPTURE_POLICY, setup=None, route_rules=None, on_report_dir=None):
+        """运行UI测试用例，pool_size / recycle_after 覆盖浏览器池的默认大小和回收次数，
+        capture_policy 控制截图和录制：always / on-failure / off；
+        setup 为登录用例配置（setup_case / project_id / storage_state_ttl / refresh_storage_state），
+        所有用例的 context 都用其缓存的 storage state 初始化；route_rules 为项目的请求路由规则；
+        on_report_dir 在报告目录创建后立即被调用，参数与返回值中的 report_path 相同
+        """
         # 创建测试目录
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        report_dir = self.report_base_dir / timestamp
-        report_dir.mkdir(parents=True, exist_ok=True)
+        report_dir = make_report_dir(self.report_base_dir)
+        if on_report_dir:
+            on_report_dir(str(report_dir / "allure-report"))
 
         # 生成测试文件
-        test_file = self.generate_test_file(test_cases, report_dir)
+        test_file, cached = self.generate_test_file(test_cases)
 
         # 运行 pytest 测试
         allure_results_dir = report_dir / "allure-results"
@@ -32,35 +50,156 @@ class UITestRunner:
             sys.executable, "-m", "pytest",
             str(test_file),
             f"--alluredir={allure_results_dir}",
-            "--tb=short"
+            "--tb=short",
+            "-p", "no:cacheprovider"
         ]
 
-        result = subprocess.run(cmd, capture_output=True, text=True)
+        # 输出逐行写入输出流：内存只保留最近的行，完整内容写入轮转日志
+        env = {
+            **os.environ,
+            "UI_REPORT_DIR": str(report_dir),
+            "UI_CAPTURE_POLICY": capture_policy,
+            "PYTHONPATH": os.pathsep.join(filter(None, [str(BACKEND_ROOT), os.environ.get("PYTHONPATH")]))
+        }
+        if pool_size:
+            env["UI_BROWSER_POOL_SIZE"] = str(pool_size)
+        if recycle_after:
+            env["UI_BROWSER_RECYCLE_AFTER"] = str(recycle_after)
+        if route_rules:
+            env["UI_ROUTE_RULES"] = json.dumps(route_rules)
+
+        stream = OutputStream(report_dir / "run.log")
+        register_stream(report_id, stream)
+        try:
+            if setup:
+                state_path = UIInlineExecutor(concurrency=1, browsers=1, route_rules=route_rules,
+                                              **setup).storage_state_for(stream)
+                env["UI_STORAGE_STATE"] = str(state_path.resolve())
+            exit_code = run_streaming(cmd, stream, env=ModuleCache.subprocess_env(env))
+        finally:
+            stream.close()
+            unregister_stream(report_id)
 
-        # 生成 allure 报告
+        # 只生成轻量摘要；allure HTML 报告在首次访问 /reports/... 时再生成
         allure_report_dir = report_dir / "allure-report"
-        subprocess.run([
-            "allure", "generate",
-            str(allure_results_dir),
-            "-o", str(allure_report_dir),
-            "--clean"
-        ])
+        summary = write_summary(report_dir, allure_results_dir)
 
         return {
             "report_path": str(allure_report_dir),
-            "exit_code": result.returncode,
-            "stdout": result.stdout,
-            "stderr": result.stderr
+            "results_dir": str(allure_results_dir),
+            "summary": summary,
+            "test_file": str(test_file),
+            "module_cache_hit": cached,
+            "exit_code": exit_code,
+            "stdout": stream.tail(),
+            "stderr": "",
+            "log_path": str(stream.log_path)
         }
 
-    def generate_test_file(self, test_cases, report_dir):
-        test_file = report_dir / "test_ui.py"
+    def run_inline(self, test_cases, report_id=None, concurrency=DEFAULT_CONCURRENCY, browsers=DEFAULT_BROWSERS,
+                   memory_limit_mb=None, recycle_after=None, capture_policy=DEFAULT_CAPTURE_POLICY, setup=None,
+                   route_rules=None, on_report_dir=None):
+        """在当前进程内并发执行UI用例，返回值与 run_tests 相同，另附实际使用的并发数和浏览器数"""
+        report_dir = make_report_dir(self.report_base_dir)
+        if on_report_dir:
+            on_report_dir(str(report_dir / "allure-report"))
+        allure_results_dir = report_dir / "allure-results"
+        allure_results_dir.mkdir(exist_ok=True)
+
+        executor = UIInlineExecutor(
+            concurrency=concurrency,
+            browsers=browsers,
+            memory_limit_mb=memory_limit_mb,
+            capture_policy=capture_policy,
+            route_rules=route_rules,
+            **(setup or {}),
+            **({"recycle_after": recycle_after} if recycle_after else {})
+        )
+
+        stream = OutputStream(report_dir / "run.log")
+        register_stream(report_id, stream)
+        try:
+            stats = executor.run(test_cases, report_dir, allure_results_dir, stream)
+        finally:
+            stream.close()
+            unregister_stream(report_id)
+
+        allure_report_dir = report_dir / "allure-report"
+        summary = write_summary(report_dir, allure_results_dir)
+
+        return {
+            "report_path": str(allure_report_dir),
+            "results_dir": str(allure_results_dir),
+            "summary": summary,
+            "exit_code": 0 if summary["passed"] == summary["total"] else 1,
+            "stdout": stream.tail(),
+            "stderr": "",
+            "log_path": str(stream.log_path),
+            **stats
+        }
+
+    def generate_test_file(self, test_cases):
+        """获取 pytest 测试文件，用例内容未变化时直接复用缓存中的模块，返回 (路径, 是否命中缓存)"""
+        key = ModuleCache.make_key("ui", test_cases, CACHE_KEY_FIELDS, TEMPLATE_HASH)
+        return self.module_cache.get_or_create(key, "test_ui.py", lambda: self.render_test_module(test_cases))
+
+    def render_test_module(self, test_cases):
+        """生成 pytest 测试模块源码，报告目录在运行时通过 UI_REPORT_DIR 环境变量传入
+
+        模块内所有用例共用一个事件循环和预热的浏览器池，每个用例只新建一个隔离的 BrowserContext
+        """
         test_content = """
 import pytest
 import allure
 import asyncio
-from playwright.async_api import async_playwright
+import json
 import os
+from app.core.browser_pool import BrowserPool
+from app.core.network_rules import RouteRules
+
+REPORT_DIR = os.environ.get("UI_REPORT_DIR", ".")
+SCREENSHOT_DIR = os.path.join(REPORT_DIR, "screenshots")
+# 截图和录制策略：always / on-failure / off
+CAPTURE_POLICY = os.environ.get("UI_CAPTURE_POLICY", "on-failure")
+# 登录用例缓存的 storage state，所有用例的 context 都用它初始化
+STORAGE_STATE = os.environ.get("UI_STORAGE_STATE")
+CONTEXT_OPTIONS = {"storage_state": STORAGE_STATE} if STORAGE_STATE else {}
+# 项目的请求路由规则：屏蔽资源、缓存静态资源，缓存在模块内所有用例之间共享
+ROUTE_RULES = RouteRules.from_config(json.loads(os.environ.get("UI_ROUTE_RULES") or "null"))
+if ROUTE_RULES:
+    CONTEXT_OPTIONS["service_workers"] = "block"
+
+_loop = asyncio.new_event_loop()
+
+
+async def capture(page, context, screenshot_name, trace_name):
+    # 保存截图和录制文件并附加到 allure 报告，文件名带用例ID
+    os.makedirs(SCREENSHOT_DIR, exist_ok=True)
+    screenshot = os.path.join(SCREENSHOT_DIR, screenshot_name)
+    trace = os.path.join(REPORT_DIR, trace_name)
+    try:
+        await page.screenshot(path=screenshot)
+        allure.attach.file(screenshot, name=screenshot_name, attachment_type=allure.attachment_type.PNG)
+        await context.tracing.stop(path=trace)
+        allure.attach.file(trace, name=trace_name, extension="zip")
+    except Exception as e:
+        print(f"capture failed: {e}")
+    finally:
+        # 附件已复制到 allure-results，删除原文件避免重复占用磁盘
+        for path in (screenshot, trace):
+            if os.path.exists(path):
+                os.remove(path)
+
+
+@pytest.fixture(scope="module")
+def browser_pool():
+    # 池大小和回收次数由 UI_BROWSER_POOL_SIZE / UI_BROWSER_RECYCLE_AFTER 环境变量控制
+    pool = _loop.run_until_complete(BrowserPool().start())
+    yield pool
+    _loop.run_until_complete(pool.close())
+    print(f"browser pool stats: {pool.stats}")
+    if ROUTE_RULES:
+        print(f"route rules: {ROUTE_RULES.stats}")
 
 """
 
@@ -68,54 +207,38 @@ import os
             test_content += f"""
 @allure.feature('UI Tests')
 @allure.story('{case.case_name}')
-async def test_case_{i}():
+@allure.id('{case.id}')
+def test_case_{i}(browser_pool):
     \"\"\"Test case: {case.case_name}\"\"\"
-    async with async_playwright() as playwright:
-        browser = await playwright.chromium.launch(headless=True)
-        context = await browser.new_context()
-        page = await context.new_page()
+    _loop.run_until_complete(_run_case_{i}(browser_pool))
 
-        try:
-            # 创建截图目录
-            screenshot_dir = "{report_dir / 'screenshots'}"
-            os.makedirs(screenshot_dir, exist_ok=True)
 
-            # 开始录制
+async def _run_case_{i}(browser_pool):
+    async with browser_pool.context(**CONTEXT_OPTIONS) as context:
+        if ROUTE_RULES:
+            await ROUTE_RULES.apply(context)
+        page = await context.new_page()
+        if CAPTURE_POLICY != "off":
+            # 开始录制；on-failure 时用例通过后丢弃，不写磁盘
             await context.tracing.start(screenshots=True, snapshots=True, sources=True)
 
+        try:
             # 动态执行UI脚本
-            {self.wrap_script_content(case.script_content, case.case_name, screenshot_dir)}
+{self.wrap_script_content(case.script_content, case.case_name)}
+        except Exception:
+            if CAPTURE_POLICY != "off":
+                await capture(page, context, "case_{case.id}_failure.png", "case_{case.id}_trace.zip")
+            raise
 
-            # 停止录制并保存
-            await context.tracing.stop(path="{report_dir / f'trace_{i}.zip'}")
-
-        except Exception as e:
-            # 出错时截图
-            await page.screenshot(path='{report_dir / f"screenshot_error_{i}.png"}')
-            raise e
-        finally:
-            await browser.close()
+        if CAPTURE_POLICY == "always":
+            await capture(page, context, "case_{case.id}_success.png", "case_{case.id}_trace.zip")
+        elif CAPTURE_POLICY == "on-failure":
+            await context.tracing.stop()
 
 """
 
-        with open(test_file, 'w', encoding='utf-8') as f:
-            f.write(test_content)
+        return test_content
 
-        return test_file
-
-    def wrap_script_content(self, script_content, case_name, screenshot_dir):
-        """包装脚本内容，添加错误处理和截图功能"""
-        wrapped_script = f"""
-            # 脚本开始执行
-            try:
-                {script_content}
-
-                # 成功时截图
-                await page.screenshot(path='{screenshot_dir}/{case_name}_success.png')
-
-            except Exception as e:
-                # 失败时截图
-                await page.screenshot(path='{screenshot_dir}/{case_name}_failure.png')
-                raise e
-        """
-        return wrapped_script
\ No newline at end of file
+    def wrap_script_content(self, script_content, case_name):
+        """把脚本内容缩进到生成的用例函数体中"""
+        return textwrap.indent(textwrap.dedent(script_content or "pass"), " " * 12)
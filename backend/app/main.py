@@ -2,15 +2,19 @@ from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
 from app.database import engine, Base
+from app.utils.file_utils import LazyReportStaticFiles
 import os
 
 # 导入模型以确保它们被注册
 from app.models.user import UserInfo
 from app.models.project import ProjectInfo
 from app.models.api_test import APIInfo
-from app.models.ui_test import UIInfo
+from app.models.ui_test import UIInfo, UIProjectSettings
 from app.models.business_flow import BusinessFlow
 from app.models.test_reports import TestReports
+from app.models.case_run_history import CaseRunHistory
+from app.models.job import Job
+from app.models.report_artifact import ReportArtifact
 
 
 # 创建数据库表
@@ -39,7 +43,7 @@ app.add_middleware(
 os.makedirs("static/avatars", exist_ok=True)
 os.makedirs("reports", exist_ok=True)
 app.mount("/static", StaticFiles(directory="static"), name="static")
-app.mount("/reports", StaticFiles(directory="reports"), name="reports")
+app.mount("/reports", LazyReportStaticFiles(directory="reports", html=True), name="reports")
 
 
 # 导入并注册路由
@@ -78,6 +82,41 @@ try:
 except Exception as e:
     print(f"✗ Error loading performance routes: {e}")
 
+try:
+    from app.api.case_history import router as case_history_router
+    app.include_router(case_history_router, prefix="/api/v1", tags=["case-history"])
+    print("✓ Case history routes loaded successfully")
+except Exception as e:
+    print(f"✗ Error loading case history routes: {e}")
+
+try:
+    from app.api.reports import router as reports_router
+    app.include_router(reports_router, prefix="/api/v1", tags=["reports"])
+    print("✓ Reports routes loaded successfully")
+except Exception as e:
+    print(f"✗ Error loading reports routes: {e}")
+
+try:
+    from app.api.jobs import router as jobs_router
+    app.include_router(jobs_router, prefix="/api/v1", tags=["jobs"])
+    print("✓ Jobs routes loaded successfully")
+except Exception as e:
+    print(f"✗ Error loading jobs routes: {e}")
+
+@app.on_event("startup")
+def start_job_workers():
+    from app.core.job_queue import start_workers
+    from app.core.report_retention import start_collector
+    start_workers()
+    start_collector()
+
+@app.on_event("shutdown")
+def stop_job_workers():
+    from app.core.job_queue import stop_workers
+    from app.core.report_retention import stop_collector
+    stop_workers()
+    stop_collector()
+
 @app.get("/")
 def read_root():
     return {"message": "Testing Platform API is running"}
@@ -1,9 +1,12 @@
 from .user import UserInfo
 from .project import ProjectInfo
 from .api_test import APIInfo,APIBusinessFlow,APIReport
-from .ui_test import UIInfo,UIBusinessFlow,UIReport
+from .ui_test import UIInfo,UIBusinessFlow,UIReport,UIProjectSettings
 from .business_flow import BusinessFlow
 from .test_reports import TestReports
+from .case_run_history import CaseRunHistory
+from .job import Job
+from .report_artifact import ReportArtifact
 
 # 导出所有模型
 __all__ = [
@@ -15,6 +18,10 @@ __all__ = [
     "UIInfo",
     "UIBusinessFlow",
     "UIReport",
+    "UIProjectSettings",
     "BusinessFlow",
-    "TestReports"
+    "TestReports",
+    "CaseRunHistory",
+    "Job",
+    "ReportArtifact"
 ]
\ No newline at end of file
@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, Float, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+class CaseRunHistory(Base):
+    __tablename__ = "case_run_history"
+
+    id = Column(Integer, primary_key=True, index=True)
+    case_type = Column(String(20), nullable=False)  # api / ui，对应 APIInfo.id 或 UIInfo.id
+    case_id = Column(Integer, nullable=False)
+    project_id = Column(Integer, ForeignKey("project_info.id"))
+    report_id = Column(Integer, ForeignKey("test_reports.id"), nullable=True)
+    status = Column(String(20))
+    duration = Column(Float)  # 毫秒
+    content_hash = Column(String(64))  # 运行时用例内容的哈希，用于判断用例是否被修改
+    created_at = Column(DateTime, default=func.now())
+
+    __table_args__ = (
+        Index("ix_case_run_history_case", "case_type", "case_id"),
+    )
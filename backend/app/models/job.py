@@ -0,0 +1,20 @@
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, JSON
+from sqlalchemy.sql import func
+from app.database import Base
+
+class Job(Base):
+    __tablename__ = "job_queue"
+
+    id = Column(Integer, primary_key=True, index=True)
+    job_type = Column(String(20), nullable=False)  # api / ui / performance
+    project_id = Column(Integer, ForeignKey("project_info.id"))
+    report_id = Column(Integer, ForeignKey("test_reports.id"), nullable=True)
+    payload = Column(JSON)
+    priority = Column(Integer, default=0)  # 数值越大越先执行
+    status = Column(String(20), default="queued", index=True)  # queued / running / cancelling / completed / failed / cancelled
+    error = Column(Text)
+    worker_id = Column(String(100))  # 领取任务的服务进程
+    heartbeat_at = Column(DateTime)  # 执行中由领取它的进程定时刷新，长时间未刷新说明进程已退出
+    created_at = Column(DateTime, default=func.now())
+    started_at = Column(DateTime)
+    finished_at = Column(DateTime)
@@ -0,0 +1,28 @@
+from sqlalchemy import Column, Integer, String, BigInteger, DateTime, ForeignKey, Index
+from sqlalchemy.sql import func
+from app.database import Base
+
+class ReportArtifact(Base):
+    __tablename__ = "report_artifact"
+
+    id = Column(Integer, primary_key=True, index=True)
+    report_id = Column(Integer, ForeignKey("test_reports.id"), nullable=False)
+    case_id = Column(Integer, nullable=True)  # 无法对应到用例的文件为空
+    name = Column(String(255))  # 附件的原始名称，如 trace_3.zip
+    path = Column(String(500), nullable=False)  # 相对 reports 目录的路径
+    artifact_type = Column(String(20))  # screenshot / trace / video / other
+    content_type = Column(String(100))
+    size = Column(BigInteger)  # 原始大小，字节
+    stored_size = Column(BigInteger)  # 附件存储中压缩后的大小，内容相同的附件共用同一份存储
+    encoding = Column(String(10))  # 存储编码：zst / gz / png（无损重新压缩的截图）/ raw
+    checksum = Column(String(64))  # 原始内容的 sha256，也是附件存储中的键
+    created_at = Column(DateTime, default=func.now())
+
+    @property
+    def url(self):
+        # 原文件已移入附件存储，通过下载接口解压读取
+        return f"/api/v1/reports/{self.report_id}/artifacts/{self.id}/download"
+
+    __table_args__ = (
+        Index("ix_report_artifact_report_case", "report_id", "case_id"),
+    )
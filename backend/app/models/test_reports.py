@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, TIMESTAMP, ForeignKey
+from sqlalchemy import Column, Integer, String, TIMESTAMP, ForeignKey, JSON
 from sqlalchemy.sql import func
 from app.database import Base
 
@@ -11,4 +11,8 @@ class TestReports(Base):
     test_type = Column(String(20))
     report_path = Column(String(255))
     status = Column(String(20))
+    summary = Column(JSON)  # 运行结束时从 allure-results 生成的摘要
+    progress = Column(JSON)  # 运行期间的进度：total / done 及各状态数量
+    started_at = Column(TIMESTAMP)
+    finished_at = Column(TIMESTAMP)
     created_at = Column(TIMESTAMP, server_default=func.now())
\ No newline at end of file
@@ -33,4 +33,14 @@ class UIReport(Base):
     project_id = Column(Integer, nullable=False)
     status = Column(String(50), default="pending")
     report_path = Column(String(500))
-    created_at = Column(DateTime, default=func.now())
\ No newline at end of file
+    created_at = Column(DateTime, default=func.now())
+class UIProjectSettings(Base):
+    __tablename__ = "ui_project_settings"
+
+    id = Column(Integer, primary_key=True, index=True)
+    project_id = Column(Integer, ForeignKey("project_info.id"), unique=True, nullable=False)
+    setup_case_id = Column(Integer, ForeignKey("ui_info.id", ondelete="SET NULL"), nullable=True)  # 登录等前置用例
+    storage_state_ttl = Column(Integer, default=3600)  # storage state 缓存有效期（秒）
+    route_rules = Column(JSON)  # 请求屏蔽和静态资源缓存规则，见 app.core.network_rules.RouteRules
+    created_at = Column(DateTime, default=func.now())
+    updated_at = Column(DateTime, default=func.now(), onupdate=func.now())
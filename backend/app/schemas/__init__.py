@@ -1,4 +1,4 @@
-from pydantic import BaseModel, EmailStr
+from pydantic import BaseModel, EmailStr, Field, StrictBool, StrictInt
 from typing import Optional, List, Dict, Any
 from datetime import datetime
 
@@ -96,6 +96,19 @@ class UITestCaseResponse(UITestCaseBase):
         from_attributes = True
         orm_mode = True
 
+class UIProjectSettingsUpdate(BaseModel):
+    setup_case_id: Optional[int] = None
+    storage_state_ttl: int = 3600
+    route_rules: Optional[Dict[str, Any]] = None
+
+class UIProjectSettingsResponse(UIProjectSettingsUpdate):
+    project_id: int
+    storage_state_cached: bool = False
+
+    class Config:
+        from_attributes = True
+        orm_mode = True
+
 # 业务流程相关的模式
 class BusinessFlowBase(BaseModel):
     flow_name: str
@@ -114,11 +127,24 @@ class BusinessFlowResponse(BusinessFlowBase):
         from_attributes = True
         orm_mode = True
 
+# 执行API测试的请求参数；未列出的字段（shard_strategy、mode 等）原样保留在任务选项中
+class APITestRunRequest(BaseModel):
+    test_case_ids: List[int] = []
+    executor: str = "pytest"
+    concurrency: StrictInt = Field(10, ge=1, le=1000)
+    pool_size: Optional[StrictInt] = Field(None, ge=1, le=1000)
+    keepalive: Optional[StrictBool] = None
+    http2: Optional[StrictBool] = None
+    priority: StrictInt = 0
+
+    class Config:
+        extra = "allow"
+
 # 测试报告相关的模式
 class TestReportBase(BaseModel):
     report_name: str
     test_type: str
-    report_path: str
+    report_path: Optional[str] = None
     status: str
 
 class TestReportCreate(TestReportBase):
@@ -127,7 +153,69 @@ class TestReportCreate(TestReportBase):
 class TestReportResponse(TestReportBase):
     id: int
     project_id: int
+    summary: Optional[Dict[str, Any]] = None
+    progress: Optional[Dict[str, Any]] = None
+    created_at: datetime
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+    class Config:
+        from_attributes = True
+        orm_mode = True
+
+# 用例耗时历史相关的模式
+class CaseRunHistoryResponse(BaseModel):
+    id: int
+    case_type: str
+    case_id: int
+    project_id: Optional[int]
+    report_id: Optional[int]
+    status: Optional[str]
+    duration: Optional[float]
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+        orm_mode = True
+
+class ReportArtifactResponse(BaseModel):
+    id: int
+    report_id: int
+    case_id: Optional[int]
+    name: Optional[str]
+    path: str
+    url: str
+    artifact_type: Optional[str]
+    content_type: Optional[str]
+    size: Optional[int]
+    stored_size: Optional[int]
+    encoding: Optional[str]
+    checksum: Optional[str]
+    created_at: datetime
+
+    class Config:
+        from_attributes = True
+        orm_mode = True
+
+class ReportArtifactPage(BaseModel):
+    total: int
+    skip: int
+    limit: int
+    items: List[ReportArtifactResponse]
+
+class JobResponse(BaseModel):
+    id: int
+    job_type: str
+    project_id: Optional[int]
+    report_id: Optional[int]
+    priority: int
+    status: str
+    error: Optional[str]
     created_at: datetime
+    started_at: Optional[datetime]
+    finished_at: Optional[datetime]
+    worker_id: Optional[str] = None
+    heartbeat_at: Optional[datetime] = None
 
     class Config:
         from_attributes = True
@@ -153,6 +241,8 @@ __all__ = [
     "BusinessFlowBase", "BusinessFlowCreate", "BusinessFlowResponse",
     # 测试报告相关
     "TestReportBase", "TestReportCreate", "TestReportResponse",
+    # 用例耗时历史相关
+    "CaseRunHistoryResponse",
     # 认证相关
     "Token"
 ]
\ No newline at end of file
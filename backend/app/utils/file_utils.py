@@ -0,0 +1,49 @@
+import os
+from datetime import datetime
+from pathlib import Path
+from fastapi.staticfiles import StaticFiles
+from starlette.concurrency import run_in_threadpool
+from app.core.allure_results import ensure_allure_report
+
+# 平台创建的报告目录中的标记文件，孤立目录清理只处理带有该标记的目录
+REPORT_DIR_MARKER = ".report"
+
+def report_dir_of(report_path):
+    """根据报告记录的 report_path 找到本次运行的报告目录
+
+    API/UI 报告记录的是其中的 allure-report 子目录，性能测试记录的就是报告目录本身。
+    """
+    if not report_path:
+        return None
+    path = Path(report_path)
+    return path.parent if path.name == "allure-report" else path
+
+
+def make_report_dir(base_dir) -> Path:
+    """在 base_dir 下创建以时间戳命名的报告目录，同一秒内有多个运行时追加 _1、_2 后缀，并写入标记文件"""
+    base_dir = Path(base_dir)
+    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+    name = timestamp
+    index = 0
+    while True:
+        report_dir = base_dir / name
+        try:
+            report_dir.mkdir(parents=True)
+            (report_dir / REPORT_DIR_MARKER).touch()
+            return report_dir
+        except FileExistsError:
+            index += 1
+            name = f"{timestamp}_{index}"
+
+
+class LazyReportStaticFiles(StaticFiles):
+    """报告静态文件：首次访问某次运行的 allure-report 时才调用 allure generate 生成 HTML"""
+
+    async def get_response(self, path, scope):
+        parts = Path(path).parts
+        if "allure-report" in parts:
+            report_dir = os.path.realpath(os.path.join(self.directory, *parts[:parts.index("allure-report")]))
+            root = os.path.realpath(self.directory)
+            if report_dir.startswith(root + os.sep):
+                await run_in_threadpool(ensure_allure_report, report_dir)
+        return await super().get_response(path, scope)
@@ -0,0 +1,45 @@
+from types import SimpleNamespace
+
+from app.core.case_history import content_hashes, record_case_runs, select_failed_or_changed
+
+
+def make_case(case_id, url="http://example.com"):
+    return SimpleNamespace(id=case_id, case_name=f"case{case_id}", method="GET", url=url, headers=None,
+                           params=None, body=None, expected_data=None)
+
+
+def record(db, cases, statuses):
+    hashes = content_hashes("api", cases)
+    results = [{"case_id": case.id, "status": status, "duration": 10.0} for case, status in zip(cases, statuses)]
+    record_case_runs(db, "api", 1, results, hashes=hashes)
+
+
+def test_empty_input(db):
+    assert select_failed_or_changed(db, "api", []) == []
+
+
+def test_never_run_cases_are_selected(db):
+    cases = [make_case(1), make_case(2)]
+    assert select_failed_or_changed(db, "api", cases) == cases
+
+
+def test_only_failed_or_changed_cases_are_selected(db):
+    cases = [make_case(1), make_case(2), make_case(3)]
+    record(db, cases, ["passed", "failed", "passed"])
+
+    changed = make_case(3, url="http://example.com/v2")
+    selected = select_failed_or_changed(db, "api", [cases[0], cases[1], changed])
+    assert [case.id for case in selected] == [2, 3]
+
+
+def test_latest_run_wins(db):
+    case = make_case(1)
+    record(db, [case], ["failed"])
+    record(db, [case], ["passed"])
+    assert select_failed_or_changed(db, "api", [case]) == []
+
+
+def test_history_is_per_case_type(db):
+    case = make_case(1)
+    record(db, [case], ["passed"])
+    assert select_failed_or_changed(db, "ui", [case]) == [case]
@@ -0,0 +1,74 @@
+import pytest
+
+from app.core.latency_histogram import HistogramLog, LatencyHistogram, query_histograms
+
+
+def filled(values):
+    histogram = LatencyHistogram()
+    for value in values:
+        histogram.record(value)
+    return histogram
+
+
+def test_percentiles_within_precision():
+    histogram = filled(range(1, 1001))
+    assert histogram.count == 1000
+    for p, expected in ((50, 500), (90, 900), (99, 990)):
+        assert histogram.value_at_percentile(p) == pytest.approx(expected, rel=0.01)
+    assert histogram.value_at_percentile(100) == 1000
+    assert histogram.percentiles()["min"] == 1
+    assert histogram.percentiles()["mean"] == pytest.approx(500.5)
+
+
+def test_empty_histogram():
+    histogram = LatencyHistogram()
+    assert histogram.value_at_percentile(50) is None
+    assert histogram.percentiles() == {}
+
+
+def test_invalid_precision():
+    with pytest.raises(ValueError):
+        LatencyHistogram(0)
+
+
+def test_encode_decode_round_trip():
+    histogram = filled([0.5, 1.25, 3, 3, 250, 12000.75])
+    decoded = LatencyHistogram.decode(histogram.encode())
+    assert decoded.counts == histogram.counts
+    assert (decoded.count, decoded.min, decoded.max, decoded.total) == \
+           (histogram.count, histogram.min, histogram.max, histogram.total)
+    assert decoded.percentiles() == histogram.percentiles()
+
+
+def test_encode_decode_empty():
+    decoded = LatencyHistogram.decode(LatencyHistogram().encode())
+    assert decoded.count == 0 and decoded.counts == {}
+
+
+def test_merge_equals_recording_all():
+    merged = filled(range(1, 501)).merge(filled(range(501, 1001)))
+    assert merged.counts == filled(range(1, 1001)).counts
+    assert merged.min == 1000 and merged.max == 1000 * 1000
+
+
+def test_merge_rejects_different_precision():
+    with pytest.raises(ValueError):
+        LatencyHistogram(2).merge(LatencyHistogram(3))
+
+
+def test_log_query(tmp_path):
+    path = tmp_path / "latency.hlog"
+    log = HistogramLog(path)
+    log.append(100, 1, {"GET a": filled([10, 20]), "GET b": filled([30])})
+    log.append(101, 1, {"GET a": filled([40])})
+    # 末尾写了一半的记录被忽略
+    with open(path, "ab") as f:
+        f.write(b"\x00\x01")
+
+    overall, by_endpoint, series = query_histograms([path], interval=1)
+    assert overall.count == 4
+    assert {name: h.count for name, h in by_endpoint.items()} == {"GET a": 3, "GET b": 1}
+    assert {start: h.count for start, h in series.items()} == {100: 3, 101: 1}
+
+    overall, _, _ = query_histograms([path], start=101, endpoints=["GET a"])
+    assert overall.count == 1 and overall.max == 40000
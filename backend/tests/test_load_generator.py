@@ -0,0 +1,64 @@
+import pytest
+
+from app.core.load_generator import ArrivalSchedule, parse_duration
+
+
+@pytest.mark.parametrize("value, seconds", [(30, 30.0), ("45", 45.0), ("30s", 30.0), ("1m", 60.0), ("1h30m", 5400.0)])
+def test_parse_duration(value, seconds):
+    assert parse_duration(value) == seconds
+
+
+@pytest.mark.parametrize("value", ["", "x", "10d", "1m x"])
+def test_parse_duration_rejects_invalid(value):
+    with pytest.raises(ValueError):
+        parse_duration(value)
+
+
+def test_constant_rate():
+    schedule = ArrivalSchedule.from_config({"rate": 10, "run_time": "2s"})
+    times = list(schedule.send_times())
+    assert schedule.duration == 2
+    assert schedule.expected_requests == 20
+    assert len(times) == 20
+    assert times[:3] == pytest.approx([0.0, 0.1, 0.2])
+
+
+def test_stages_without_ramp():
+    schedule = ArrivalSchedule.from_config({"stages": [{"duration": 1, "rate": 5}, {"duration": 1, "rate": 10}]})
+    times = list(schedule.send_times())
+    assert len(times) == 15
+    assert sum(1 for t in times if t < 1) == 5
+    assert times == sorted(times)
+
+
+def test_ramp_is_linear_between_stages():
+    schedule = ArrivalSchedule.from_config({"stages": [{"duration": 1, "rate": 0}, {"duration": 2, "rate": 100}],
+                                            "ramp": True})
+    times = list(schedule.send_times())
+    assert schedule.expected_requests == 100
+    assert len(times) == 100
+    # 线性升速：后半段发送的请求是前半段的 3 倍
+    first_half = sum(1 for t in times if 1 <= t < 2)
+    assert first_half == pytest.approx(25, abs=1)
+
+
+def test_zero_rate_sends_nothing():
+    assert list(ArrivalSchedule.from_config({"rate": 0, "run_time": 5}).send_times()) == []
+
+
+@pytest.mark.parametrize("config, error", [
+    ({}, "The open model engine needs a rate or stages"),
+    ({"stages": []}, "stages must be a non-empty list"),
+    ({"stages": [{"rate": 1}]}, "Each stage needs a duration and a rate"),
+    ({"stages": [{"duration": "x", "rate": 1}]}, "Invalid duration 'x'"),
+    ({"rate": -1}, "Stage rate must be non-negative and duration positive"),
+    ({"rate": True}, "Stage rate must be non-negative and duration positive"),
+    ({"rate": 10, "run_time": 0}, "Stage rate must be non-negative and duration positive"),
+])
+def test_validate_rejects(config, error):
+    assert ArrivalSchedule.validate(config) == error
+
+
+def test_validate_accepts():
+    assert ArrivalSchedule.validate({"rate": 10}) is None
+    assert ArrivalSchedule.validate({"stages": [{"duration": "30s", "rate": 50}], "ramp": True}) is None
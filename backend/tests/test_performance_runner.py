@@ -0,0 +1,36 @@
+import pytest
+
+from app.core.performance_runner import validate_load_profile
+
+
+@pytest.mark.parametrize("config", [
+    {},
+    {"weights": {"1": 3, 2: 1}, "names": {"1": "login"}},
+    {"workers": "auto"},
+    {"workers": 0},
+    {"think_time": {"min": 0.5, "max": 2}},
+    {"think_time": {"pacing": 1}},
+    {"engine": "open", "rate": 50, "run_time": "10s", "max_in_flight": 100, "pool_size": 10},
+])
+def test_valid_profiles(config):
+    assert validate_load_profile(config) is None
+
+
+@pytest.mark.parametrize("config, error", [
+    ({"weights": {"1": 0}}, "weights must map case ids to positive integers"),
+    ({"weights": {"a": 1}}, "weights must map case ids to positive integers"),
+    ({"weights": [1]}, "weights must map case ids to positive integers"),
+    ({"names": {"1": ""}}, "names must map case ids to non-empty strings"),
+    ({"engine": "jmeter"}, "Invalid engine"),
+    ({"workers": -1}, "workers must be \"auto\" or a non-negative integer"),
+    ({"workers": True}, "workers must be \"auto\" or a non-negative integer"),
+    ({"workers": "4"}, "workers must be \"auto\" or a non-negative integer"),
+    ({"think_time": 1}, "think_time must be an object"),
+    ({"think_time": {"pacing": -1}}, "think_time.pacing must be a non-negative number"),
+    ({"think_time": {"min": 2, "max": 1}}, "think_time needs 0 <= min <= max"),
+    ({"engine": "open", "rate": 10, "max_in_flight": 0}, "max_in_flight must be a positive integer"),
+    ({"engine": "open", "rate": 10, "pool_size": False}, "pool_size must be a positive integer"),
+    ({"engine": "open"}, "The open model engine needs a rate or stages"),
+])
+def test_invalid_profiles(config, error):
+    assert validate_load_profile(config) == error
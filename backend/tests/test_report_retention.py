@@ -0,0 +1,53 @@
+from datetime import datetime, timedelta
+
+from app.core.report_retention import RetentionPolicy
+from app import models
+
+
+def add_report(db, status="completed", project_id=1, test_type="api", age_days=0):
+    report = models.TestReports(report_name="report", project_id=project_id, test_type=test_type, status=status,
+                         created_at=datetime.now() - timedelta(days=age_days))
+    db.add(report)
+    db.commit()
+    return report.id
+
+
+def test_disabled_by_default_values():
+    policy = RetentionPolicy(keep_last=0, keep_days=0, disk_quota_mb=0)
+    assert not policy.enabled
+    assert RetentionPolicy(keep_last=-5, keep_days=0, disk_quota_mb=0).keep_last == 0
+    assert RetentionPolicy(keep_last=0, keep_days=0, disk_quota_mb=1).disk_quota_bytes == 1024 * 1024
+
+
+def test_keep_last_per_project_and_type(db):
+    api = [add_report(db) for _ in range(4)]
+    ui = [add_report(db, test_type="ui") for _ in range(2)]
+    other_project = [add_report(db, project_id=2) for _ in range(2)]
+
+    policy = RetentionPolicy(keep_last=2, keep_days=0, disk_quota_mb=0)
+    assert policy.expired_reports(db, limit=100) == api[:2]
+    assert not set(policy.expired_reports(db, limit=100)) & set(ui + other_project)
+
+
+def test_keep_days(db):
+    old = add_report(db, age_days=40)
+    add_report(db, age_days=1)
+    policy = RetentionPolicy(keep_last=0, keep_days=30, disk_quota_mb=0)
+    assert policy.expired_reports(db, limit=100) == [old]
+
+
+def test_active_reports_are_kept(db):
+    queued = add_report(db, status="queued", age_days=40)
+    running = add_report(db, status="running", age_days=40)
+    finished = add_report(db, status="failed", age_days=40)
+    add_report(db)
+    policy = RetentionPolicy(keep_last=1, keep_days=30, disk_quota_mb=0)
+    expired = policy.expired_reports(db, limit=100)
+    assert finished in expired
+    assert queued not in expired and running not in expired
+
+
+def test_limit(db):
+    ids = [add_report(db, age_days=40) for _ in range(5)]
+    policy = RetentionPolicy(keep_last=0, keep_days=30, disk_quota_mb=0)
+    assert policy.expired_reports(db, limit=3) == ids[:3]
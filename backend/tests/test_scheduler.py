@@ -0,0 +1,47 @@
+from types import SimpleNamespace
+
+import pytest
+
+from app.core.scheduler import shard_cases
+
+
+def make_cases(count):
+    return [SimpleNamespace(id=i) for i in range(1, count + 1)]
+
+
+def ids(shards):
+    return [[case.id for case in shard] for shard in shards]
+
+
+def test_round_robin():
+    assert ids(shard_cases(make_cases(5), 2)) == [[1, 3, 5], [2, 4]]
+
+
+def test_shards_limited_to_case_count():
+    assert ids(shard_cases(make_cases(2), 8)) == [[1], [2]]
+    assert shard_cases([], 4) == []
+
+
+def test_at_least_one_shard():
+    assert ids(shard_cases(make_cases(3), 0)) == [[1, 2, 3]]
+
+
+@pytest.mark.parametrize("shards", [True, 2.0, "2", None])
+def test_rejects_non_integer_shards(shards):
+    with pytest.raises(ValueError):
+        shard_cases(make_cases(3), shards)
+
+
+def test_duration_balances_load():
+    cases = make_cases(4)
+    durations = {1: 100.0, 2: 60.0, 3: 50.0, 4: 10.0}
+    shards = shard_cases(cases, 2, strategy="duration", durations=durations)
+    loads = sorted(sum(durations[case.id] for case in shard) for shard in shards)
+    assert loads == [110.0, 110.0]
+
+
+def test_duration_estimates_unknown_cases_with_median():
+    cases = make_cases(4)
+    # 用例 4 没有历史耗时，按已知耗时的中位数（20）估算
+    shards = shard_cases(cases, 2, strategy="duration", durations={1: 30.0, 2: 20.0, 3: 10.0})
+    assert ids(shards) == [[1, 3], [2, 4]]